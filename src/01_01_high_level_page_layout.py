@@ -17,16 +17,19 @@ very versatile document template available by default called SimpleDocTemplate.
 SimpleDocTemplate can infer its own page templates from the arguments supplied
 to its constructor.
 
-This file demonstrates the use of SimpleDocTemplate, and three built in flowable
-types; Paragraph, Spacer, and Image.
+This file demonstrates the use of SimpleDocTemplate, and three flowable types;
+Paragraph, Spacer, and CachedImage from rlextras.imagecache, which stands in for
+the built in Image flowable.
 """
 from os.path import join
 
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.styles import ParagraphStyle
 from reportlab.lib.units import mm
 from reportlab.lib.enums import TA_JUSTIFY, TA_CENTER
 
+from rlextras.imagecache import CachedImage
+
 # Create a couple of paragraph styles. These affects the font and formatting of
 # the paragraph you apply them to.
 body_style = ParagraphStyle(name="BodyStyle",
@@ -93,13 +96,16 @@ story.append(Spacer(1, 15*mm))
 # width that you need. For this example we will shrink the image down so that it
 # prints at 300dpi (a good printer-friendly resolution). The scale factor
 # required to achieve this is 72/300.
+#
+# CachedImage works like Image, but embeds the JPEG data as it is, without
+# decoding it or re-encoding it as ASCII85 text.
 orig_width, orig_height = 450, 500
 scale_factor = 72 / 300.
 new_width = orig_width * scale_factor
 new_height = orig_height * scale_factor
 
-story.append(Image(join("images", "025-detail-flaming-heart-q75-450x500.jpg"),
-                   width=new_width, height=new_height)
+story.append(CachedImage(join("images", "025-detail-flaming-heart-q75-450x500.jpg"),
+                         width=new_width, height=new_height)
              )
 
 doc.build(story)
@@ -19,9 +19,7 @@ from reportlab.lib.units import mm
 from reportlab.lib.enums import TA_CENTER
 from reportlab.lib import colors
 
-# a handy function which helps to blend smoothly between two colors, but
-# unfortunately it has a very long name.
-lerp = colors.linearlyInterpolatedColor
+from rlextras.heatmap import heatmap_commands
 
 title_style = ParagraphStyle(name="TitleStyle",
                              fontName="Times-Bold",
@@ -62,15 +60,16 @@ myTableStyle = TableStyle([('LINEABOVE', (0,0), (-1,0), 2, colors.green),
                            ('ALIGN', (1,1), (-1,-1), 'RIGHT')]
                           )
 
-# add some conditional formatting to the table style
-for i, data in enumerate(table_data):
-    if not i:
-        continue  # skip header row
-    for col in range(1,3):
-        mb = int(data[col]) # megabytes uploaded or downloaded
-        # color each cell from white at 0MB to a maximum of full red at 1000MB
-        myTableStyle.add('BACKGROUND', (col, i), (col, i),
-                         lerp(colors.white, colors.red, 0, 1000, min(mb, 1000)))
+# add some conditional formatting to the table style. Rather than adding a
+# BACKGROUND command for each cell, heatmap_commands works out the colours for
+# both columns in one go, and uses a single command for each run of cells which
+# share a colour. Each cell is coloured from white at 0MB to a maximum of full
+# red at 1000MB uploaded or downloaded.
+megabytes = [[int(data[1]), int(data[2])] for data in table_data[1:]]
+for command in heatmap_commands(megabytes, first_cell=(1, 1),
+                                low=colors.white, high=colors.red,
+                                vmin=0, vmax=1000):
+    myTableStyle.add(*command)
 
 # The table flowables. A couple of points to note:
 #  - repeatRows=1 means that 1 row (the header) will repeat at the top of each
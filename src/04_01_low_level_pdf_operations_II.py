@@ -21,6 +21,9 @@ from os.path import join
 from reportlab.pdfgen.canvas import Canvas
 from reportlab.lib.units import mm, cm
 
+from rlextras.stamp import Stamp
+from rlextras.imagecache import draw_image
+
 c = Canvas("04_03_low_level_pdf_operations_II.pdf", pagesize=(210*mm, 297*mm))
 text_file = open("04_02_The_Raven.txt")
 text = (l.strip() for l in text_file if l.strip())
@@ -79,16 +82,28 @@ text_lines = '\n'.join(text.next() for i in range(5))
 textobject.textLines(text_lines)
 
 # or perhaps a word at a time...
+#
+# We will mark the cursor position after each word with a red arrow. The
+# arrow is the same every time, so rather than drawing it over and over we
+# record it once as a Stamp (a Form XObject) and just place it at each
+# position. Note that the fill colour set while recording doesn't leak out of
+# the stamp; placing it saves and restores the canvas state. The stamp is
+# recorded on a canvas of its own, so it doesn't inherit our font size either
+# and has to set it.
+def draw_arrow(canvas):
+    canvas.setFont("Helvetica", 10)
+    canvas.setFillColorRGB(255, 0, 0)
+    canvas.drawCentredString(0, -10, '|')
+    canvas.drawCentredString(0, -10, '^')
+
+arrow = Stamp(draw_arrow, bbox=(-5, -13, 5, 0))
+
 text_words = text.next().split()
 for word in text_words:
     textobject.textOut(word + " ")
     # Draw a red arrow to mark the cursor position
     x, y = textobject.getCursor()
-    c.saveState()
-    c.setFillColorRGB(255, 0, 0)
-    c.drawCentredString(x, y-10, '|')
-    c.drawCentredString(x, y-10, '^')
-    c.restoreState()
+    arrow.place(c, x, y)
 
 # Finally render the text object
 c.drawText(textobject)
@@ -97,12 +112,13 @@ c.drawText(textobject)
 # corner of the page).
 c.restoreState()
 
-# Draw an image file to the page
-c.drawImage(join("images", "234-The-Raven-Corvus-Corax-q75-445x500.jpg"),
-            x=10*mm, y=10*mm, width=70*mm, height=100*mm,
-            preserveAspectRatio=True,
-            anchor='c'
-            )
+# Draw an image file to the page. draw_image() takes the same arguments as
+# c.drawImage(), but embeds the JPEG data as it is.
+draw_image(c, join("images", "234-The-Raven-Corvus-Corax-q75-445x500.jpg"),
+           x=10*mm, y=10*mm, width=70*mm, height=100*mm,
+           preserveAspectRatio=True,
+           anchor='c'
+           )
 
 text_file.close()
 c.showPage()
@@ -10,12 +10,18 @@ The PDFRW library is used to render PDFs, and a custom flowable is employed to
 add the PDF to the story stream.
 """
 import os
+import sys
+import hashlib
+import json
+import threading
+import Queue
 from os.path import join
 
 from reportlab.platypus.xpreformatted import PythonPreformatted, XPreformatted
 from reportlab.platypus import SimpleDocTemplate
-from reportlab.platypus import Paragraph, Image, Spacer
+from reportlab.platypus import Paragraph, Spacer
 from reportlab.platypus import Flowable, PageBreak
+from reportlab.pdfgen.canvas import Canvas
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import mm, inch
 from reportlab.lib import colors
@@ -23,34 +29,88 @@ from reportlab.rl_config import defaultPageSize
 from reportlab.lib.styles import ParagraphStyle as PS
 
 from pdfrw import PdfReader
-from pdfrw.buildxobj import pagexobj
+from pdfrw.buildxobj import pagexobj, CacheXObj
 from pdfrw.toreportlab import makerl
 
+from rlextras.imagecache import CachedImage
+
 PAGE_HEIGHT=defaultPageSize[1]; PAGE_WIDTH=defaultPageSize[0]
 styles = getSampleStyleSheet()
 
 pageinfo = "Introduction to Reportlab"
 
+class PdfLoader(object):
+    """Parses PDF files in a small pool of background threads, so that the
+    PDFs are being read while the rest of the story is built. Every file is
+    only parsed once, and all of the Form XObjects come from one CacheXObj."""
+    def __init__(self, threads=4):
+        self.cache = CacheXObj()
+        self.results = {}
+        self.queue = Queue.Queue()
+        for i in range(threads):
+            worker = threading.Thread(target=self.work)
+            worker.setDaemon(True)
+            worker.start()
+
+    def work(self):
+        while True:
+            pdf_filename, result = self.queue.get()
+            try:
+                result.append(self.cache.load(pdf_filename))
+            except Exception:
+                result.append(None)
+                result.append(sys.exc_info())
+            self.results[pdf_filename][0].set()
+
+    def preload(self, pdf_filenames):
+        # start parsing files which haven't been asked for yet
+        for pdf_filename in pdf_filenames:
+            if pdf_filename not in self.results:
+                result = []
+                self.results[pdf_filename] = threading.Event(), result
+                self.queue.put((pdf_filename, result))
+
+    def load(self, pdf_filename):
+        # wait for the file to be parsed, and return the Form XObject for
+        # its first page
+        self.preload([pdf_filename])
+        done, result = self.results[pdf_filename]
+        done.wait()
+        if len(result) > 1:
+            exc_type, exc_value, traceback = result[1]
+            raise exc_type, exc_value, traceback
+        return result[0]
+
+pdf_loader = PdfLoader()
+
 class PdfFlowable(Flowable):
     """A custom flowable which draws the first page of a pdf file
     into the frame at 75% scale"""
-    def __init__(self, pdf_filename, spaceBefore=12, spaceAfter=12):
+    def __init__(self, pdf_filename, spaceBefore=12, spaceAfter=12,
+                 loader=pdf_loader):
         self.spaceBefore = spaceBefore
         self.spaceAfter = spaceAfter
         
-        # Read the pdf file data
-        pdf_page = PdfReader(pdf_filename, decompress=False).pages[0]
-        
-        # Convert each page to a pagexobject. This is a special kind of
-        # self contained pdf object that can be reused in other pdf files.
-        self.xobj = pagexobj(pdf_page)
+        # Start reading the pdf file data in the background. We don't need
+        # it until the flowable is wrapped.
+        self.pdf_filename = pdf_filename
+        self.loader = loader
+        loader.preload([pdf_filename])
+        self.xobj = None
     
-        x, y, width, height = self.xobj.BBox
-        self.width = float(width)
-        self.height = float(height)
+    def load(self):
+        if self.xobj is None:
+            # Convert the first page to a pagexobject. This is a special kind
+            # of self contained pdf object that can be reused in other pdf
+            # files.
+            self.xobj = self.loader.load(self.pdf_filename)
+            x, y, width, height = self.xobj.BBox
+            self.width = float(width)
+            self.height = float(height)
 
     def wrap(self, *args):
         # returns the height of the object
+        self.load()
         return (0, float(self.height)*0.75 + self.spaceBefore + self.spaceAfter)
     
     def draw(self):
@@ -155,11 +215,17 @@ def pdfPage(file_data):
     # handler for pdf files
     return [PdfFlowable(file_data)]
 
-def go():
-    doc = SimpleDocTemplate("99_Self_Document.pdf",
-                            bottomMargin=20*mm)
+handlers = {"py":pythonCode,
+            "txt":plainText,
+            "csv":plainText,
+            "pdf":pdfPage,
+            }
+
+# Files (and folders) in this directory which are not part of the presentation
+skip_files = ("99_Self_Document.pdf", "pdfrw", "99_Self_Document_cache")
+
+def titleStory():
     Story = []
-    
     Story.append(Paragraph("Introduction to Reportlab", styles["Heading1"]))
     Story.append(Paragraph("Ian Witham, September 2011", styles["Heading2"]))
     Story.append(Paragraph("""Source available from
@@ -169,34 +235,125 @@ def go():
     Story.append(Spacer(1, 30*mm))
     width = 1039 * (72./200)
     height = 1167 * (72./200)
-    Story.append(Image(join("images", "0493-Printing-Press-q75-1039x1167.jpg"),
-                       width=width, height=height, ))
-    
+    Story.append(CachedImage(join("images", "0493-Printing-Press-q75-1039x1167.jpg"),
+                             width=width, height=height, ))
+    return Story
+
+def presentationFiles():
+    return [file_name for file_name in sorted(os.listdir('.'))
+            if file_name not in skip_files
+            and file_name.split(".")[-1] in handlers]
+
+def fileStory(file_name):
+    heading = Paragraph(file_name, title_style)
+    # get a list of new flowables
+    file_contents = handlers[file_name.split(".")[-1]](file_name)
+    return [heading] + file_contents
+
+def go():
+    doc = SimpleDocTemplate("99_Self_Document.pdf",
+                            bottomMargin=20*mm)
+    Story = titleStory()
     Story.append(PageBreak())
     
-    files = sorted(os.listdir('.'))
-    
-    handlers = {"py":pythonCode,
-                "txt":plainText,
-                "csv":plainText,
-                "pdf":pdfPage,
-                }
-    
-    for file_name in files:
-        if file_name in ("99_Self_Document.pdf", "pdfrw"):
-            continue
+    file_names = presentationFiles()
+    pdf_loader.preload([f for f in file_names if f.endswith(".pdf")])
+    for file_name in file_names:
         print file_name
-        file_extension = file_name.split(".")[-1]
-        if file_extension in handlers:
-            if file_extension == "pdf":
-                Story.append(PageBreak())
-            heading = Paragraph(file_name, title_style)
-            # get a list of new flowables
-            file_contents = handlers[file_extension](file_name)
-            # add the new flowables to the story
-            Story.extend([heading] + file_contents)
+        if file_name.endswith(".pdf"):
+            Story.append(PageBreak())
+        # add the new flowables to the story
+        Story.extend(fileStory(file_name))
     
     # invoke the PLATYPUS engine.
     doc.build(Story, onFirstPage=myFirstPage, onLaterPages=myLaterPages)
 
-go()
\ No newline at end of file
+# Incremental mode (python 99_Self_Document.py --incremental)
+#
+# Each section of the presentation (the title page, and one section per file)
+# is rendered to its own small PDF in the cache folder, named after a hash of
+# the file's contents (and of this script, since it decides how things look).
+# A manifest records the hash of every input. On the next run only the files
+# whose contents have changed are rendered again; everything else is reused,
+# and the cached sections are stitched together with pdfrw, which also adds
+# the page footers. Each section starts on a new page in this mode.
+
+cache_folder = "99_Self_Document_cache"
+manifest_name = join(cache_folder, "manifest.json")
+
+class PageCounter(object):
+    # stands in for the doc argument of myFirstPage and myLaterPages
+    page = 0
+
+def contentHash(name, file_names):
+    """Hash a section's name (which is its heading) and the names and
+    contents of its inputs."""
+    digest = hashlib.sha1()
+    digest.update(name + "\0")
+    for file_name in file_names:
+        digest.update(file_name + "\0")
+        digest.update(open(file_name, 'rb').read())
+    return digest.hexdigest()
+
+def renderSection(section_file, story):
+    doc = SimpleDocTemplate(section_file, bottomMargin=20*mm)
+    doc.build(story)
+
+def go_incremental():
+    if not os.path.isdir(cache_folder):
+        os.mkdir(cache_folder)
+    try:
+        old_manifest = json.load(open(manifest_name))
+    except (IOError, ValueError):
+        old_manifest = {}
+
+    # A section depends on its own input and on this script
+    sections = [("title page", titleStory,
+                 [join("images", "0493-Printing-Press-q75-1039x1167.jpg")])]
+    for file_name in presentationFiles():
+        sections.append((file_name, lambda f=file_name: fileStory(f),
+                         [file_name]))
+
+    manifest = {}
+    section_files = []
+    stale = []
+    for name, story, inputs in sections:
+        digest = contentHash(name, [__file__] + inputs)
+        manifest[name] = digest
+        section_file = join(cache_folder, digest + ".pdf")
+        section_files.append(section_file)
+        if old_manifest.get(name) != digest or not os.path.exists(section_file):
+            stale.append((name, story, inputs, section_file))
+
+    # Only the PDF files of sections which have changed are read
+    pdf_loader.preload([f for name, story, inputs, section_file in stale
+                        for f in inputs if f.endswith(".pdf")])
+    for name, story, inputs, section_file in stale:
+        print name
+        renderSection(section_file, story())
+
+    # Throw away sections which are no longer used
+    for file_name in os.listdir(cache_folder):
+        if (file_name.endswith(".pdf")
+                and join(cache_folder, file_name) not in section_files):
+            os.remove(join(cache_folder, file_name))
+    json.dump(manifest, open(manifest_name, "w"), indent=1)
+
+    # Stitch the sections together, drawing each cached page as a form
+    c = Canvas("99_Self_Document.pdf", pagesize=defaultPageSize)
+    counter = PageCounter()
+    for section_file in section_files:
+        for page in PdfReader(section_file, decompress=False).pages:
+            counter.page += 1
+            c.doForm(makerl(c, pagexobj(page)))
+            if counter.page == 1:
+                myFirstPage(c, counter)
+            else:
+                myLaterPages(c, counter)
+            c.showPage()
+    c.save()
+
+if "--incremental" in sys.argv:
+    go_incremental()
+else:
+    go()
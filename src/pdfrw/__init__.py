@@ -2,7 +2,7 @@
 # Copyright (C) 2006-2009 Patrick Maupin, Austin, Texas
 # MIT license -- See LICENSE.txt for details
 
-from pdfwriter import PdfWriter
+from pdfwriter import PdfWriter, PdfStreamWriter
 from pdfreader import PdfReader
 from pdfobjects import PdfObject, PdfName, PdfArray, PdfDict, IndirectPdfDict, PdfString
 from pdftokens import PdfTokens
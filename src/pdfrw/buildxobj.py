@@ -26,6 +26,7 @@ Reference for content:   Adobe PDF reference, sixth edition, version 1.7
 
 from pdfobjects import PdfDict, PdfArray, PdfName
 from pdfreader import PdfReader
+from pdfcompress import decodable, decodestream
 
 class ViewInfo(object):
     ''' Instantiate ViewInfo with a uri, and it will parse out
@@ -80,30 +81,60 @@ def getrects(inheritable, pageinfo):
         cbox = max(mleft, cleft), max(mbot, cbot), min(mright, cright), min(mtop, ctop)
     return mbox, cbox
 
+class JoinedContents(PdfDict):
+    ''' Stands in for a page's /Contents when that is an array of
+        streams.  The parts are only decompressed (into copies, so
+        the source page is left alone) and joined into a single
+        stream when the stream is first asked for -- typically when
+        the Form XObject is written out.  Every part must use filters
+        decodestream can undo; that is checked up front, so a part
+        which cannot be joined fails here rather than at write time.
+    '''
+    def __init__(self, parts, **kw):
+        for part in parts:
+            if not decodable(part):
+                raise ValueError('Cannot join page contents: no decoder '
+                                 'for filter %s with parameters %s' %
+                                 (part.Filter, part.DecodeParms))
+        PdfDict.__init__(self, **kw)
+        self.private.parts = parts
+
+    def stream(self):
+        result = self.__dict__.get('stream')
+        if result is None:
+            parts = [decodestream(x) for x in self.parts]
+            result = self.stream = '\n'.join(parts)
+        return result
+    stream = property(stream)
+
 def _cache_xobj(contents, resources, mbox, bbox):
     ''' Return a cached Form XObject, or create a new one and cache it.
     '''
-    cachedict = contents.xobj_cachedict
+    cachedict = getattr(contents, 'xobj_cachedict', None)
     if cachedict is None:
-        cachedict = contents.private.xobj_cachedict = {}
+        cachedict = {}
+        if isinstance(contents, PdfDict):
+            contents.private.xobj_cachedict = cachedict
+        else:
+            contents.xobj_cachedict = cachedict
     result = cachedict.get(bbox)
     if result is None:
         func = (_get_fullpage, _get_subpage)[mbox != bbox]
-        result = PdfDict(
-            func(contents, resources, mbox, bbox),
-            Type = PdfName.XObject,
-            Subtype = PdfName.Form,
-            FormType = 1,
-            BBox = PdfArray(bbox),
-        )
+        result = func(contents, resources, mbox, bbox)
+        result.Type = PdfName.XObject
+        result.Subtype = PdfName.Form
+        result.FormType = 1
+        result.BBox = PdfArray(bbox)
         cachedict[bbox] = result
     return result
 
 def _get_fullpage(contents, resources, mbox, bbox):
     ''' fullpage is easy.  Just copy the contents,
         set up the resources, and let _cache_xobj handle the
-        rest.
+        rest.  An array of content streams is joined lazily.
     '''
+    if isinstance(contents, PdfArray):
+        return JoinedContents(contents, Resources=resources)
     return PdfDict(contents, Resources=resources)
 
 def _get_subpage(contents, resources, mbox, bbox):
@@ -130,11 +161,14 @@ def pagexobj(page, viewinfo=ViewInfo(), allow_compressed=True):
     resources = inheritable.Resources
     mbox, bbox = getrects(inheritable, viewinfo)
     contents = page.Contents
-    # Make sure the only attribute is length
-    # All the filters must have been executed
-    assert int(contents.Length) == len(contents.stream)
-    if not allow_compressed:
-        assert len([x for x in contents.iteritems()]) == 1
+    if isinstance(contents, PdfArray) and len(contents) == 1:
+        contents = contents[0]
+    if not isinstance(contents, PdfArray):
+        # Make sure the only attribute is length
+        # All the filters must have been executed
+        assert int(contents.Length) == len(contents.stream)
+        if not allow_compressed:
+            assert len([x for x in contents.iteritems()]) == 1
 
     return _cache_xobj(contents, resources, mbox, bbox)
 
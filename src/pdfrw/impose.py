@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+
+# A part of pdfrw (pdfrw.googlecode.com)
+# Copyright (C) 2006-2009 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Imposition -- placing many source pages onto larger sheets.
+
+Each source page is turned into a Form XObject by
+buildxobj.pagexobj, which caches the XObject on the page's
+contents, so a page placed a thousand times is still only one
+object in the output.  A sheet is just a list of placements:
+
+    (xobj, (a, b, c, d, e, f))
+
+where the tuple is the transformation matrix used to draw the
+XObject.  Each sheet becomes a page whose content stream is one
+'q ... cm /Name Do Q' line per placement, and sheets are written
+with a PdfStreamWriter as they are generated, so time and memory
+are linear in the number of placements.
+
+Layout helpers:
+    cells()          -- the cell rectangles of a grid on a sheet
+    nup()            -- pages in order, filling each sheet's grid
+    booklet()        -- 2-up saddle-stitch order (front, back, ...)
+    stepandrepeat()  -- the same page in every cell, many times
+
+Usage:
+    python impose.py input.pdf output.pdf [rows cols]
+'''
+
+from pdfobjects import PdfDict, PdfArray, PdfName, PdfObject, IndirectPdfDict
+from pdfwriter import PdfStreamWriter
+from buildxobj import pagexobj
+
+LETTER = 612, 792
+
+def fmtnum(value):
+    ''' Format a number compactly for a content stream.
+    '''
+    result = ('%.4f' % value).rstrip('0').rstrip('.')
+    if result == '-0':
+        result = '0'
+    return result
+
+def cells(sheetsize=LETTER, rows=2, cols=2, margin=0, gap=0):
+    ''' Return the (x, y, width, height) cells of a grid on
+        a sheet, row by row from the top left.
+    '''
+    sheetwidth, sheetheight = sheetsize
+    width = (sheetwidth - 2 * margin - (cols - 1) * gap) / float(cols)
+    height = (sheetheight - 2 * margin - (rows - 1) * gap) / float(rows)
+    result = []
+    for row in range(rows):
+        y = sheetheight - margin - (row + 1) * height - row * gap
+        for col in range(cols):
+            result.append((margin + col * (width + gap), y, width, height))
+    return result
+
+def fit(xobj, cell):
+    ''' Return the matrix which scales xobj to fit in cell,
+        keeping its aspect ratio, and centres it.
+    '''
+    x0, y0, x1, y1 = [float(x) for x in xobj.BBox]
+    x, y, width, height = cell
+    scale = min(width / (x1 - x0), height / (y1 - y0))
+    e = x + (width - (x1 - x0) * scale) / 2 - x0 * scale
+    f = y + (height - (y1 - y0) * scale) / 2 - y0 * scale
+    return scale, 0, 0, scale, e, f
+
+def xobjects(pages):
+    ''' Lazily convert pages to (cached) Form XObjects.
+        None (a blank slot) is passed through.
+    '''
+    for page in pages:
+        yield page is not None and pagexobj(page) or None
+
+def place(xobjs, cellrects):
+    ''' Fill the cells of successive sheets with xobjs, fitting
+        each one into its cell.  Yields lists of placements.
+    '''
+    sheet = []
+    for xobj in xobjs:
+        cell = cellrects[len(sheet) % len(cellrects)]
+        sheet.append(xobj is not None and (xobj, fit(xobj, cell)) or None)
+        if len(sheet) == len(cellrects):
+            yield [x for x in sheet if x is not None]
+            sheet = []
+    sheet = [x for x in sheet if x is not None]
+    if sheet:
+        yield sheet
+
+def nup(pages, sheetsize=LETTER, rows=2, cols=2, margin=0, gap=0):
+    return place(xobjects(pages), cells(sheetsize, rows, cols, margin, gap))
+
+def booklet(pages, sheetsize=(LETTER[1], LETTER[0]), margin=0):
+    ''' Two pages side by side per sheet side, in the order needed
+        to fold the printed (duplex) sheets into a booklet.  The
+        page count is padded with blanks to a multiple of four.
+    '''
+    pages = list(pages)
+    pages.extend([None] * (-len(pages) % 4))
+    count = len(pages)
+    order = []
+    for i in range(0, count // 2, 2):
+        order.extend([pages[count - 1 - i], pages[i],
+                      pages[i + 1], pages[count - 2 - i]])
+    return place(xobjects(order), cells(sheetsize, 1, 2, margin))
+
+def stepandrepeat(page, count, sheetsize=LETTER, rows=2, cols=2,
+                  margin=0, gap=0):
+    ''' Place the same page count times, e.g. for labels.
+    '''
+    xobj = pagexobj(page)
+    return place((xobj for i in xrange(count)),
+                 cells(sheetsize, rows, cols, margin, gap))
+
+def sheetpage(placements, sheetsize=LETTER):
+    ''' Build a page dictionary drawing each placement.
+        Each distinct XObject gets one resource name.
+    '''
+    names = {}
+    xobjdict = PdfDict()
+    lines = []
+    for xobj, matrix in placements:
+        name = names.get(id(xobj))
+        if name is None:
+            name = names[id(xobj)] = 'Fx%d' % (len(names) + 1)
+            setattr(xobjdict, name, xobj)
+        lines.append('q %s cm /%s Do Q\n' %
+                     (' '.join([fmtnum(x) for x in matrix]), name))
+    return PdfDict(
+        Type = PdfName.Page,
+        MediaBox = PdfArray([PdfObject(fmtnum(x)) for x in (0, 0) + tuple(sheetsize)]),
+        Resources = PdfDict(XObject=xobjdict),
+        Contents = IndirectPdfDict(stream=''.join(lines)),
+    )
+
+def writesheets(sheets, output, sheetsize=LETTER, version='1.3', compress=True):
+    ''' Write an iterable of sheets (lists of placements) to output.
+    '''
+    writer = PdfStreamWriter(output, version, compress)
+    for placements in sheets:
+        writer.addpage(sheetpage(placements, sheetsize))
+    writer.close()
+    return output
+
+def main(args=None):
+    import sys
+    from pdfreader import PdfReader
+    args = args is None and sys.argv[1:] or args
+    if len(args) not in (2, 4):
+        sys.exit('usage: impose.py input.pdf output.pdf [rows cols]')
+    rows, cols = [int(x) for x in (args[2:] or [2, 2])]
+    pages = PdfReader(args[0], decompress=False).pages
+    writesheets(nup(pages, LETTER, rows, cols), args[1])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+# A part of pdfrw (pdfrw.googlecode.com)
+# Copyright (C) 2006-2009 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Stamps (overlays or underlays) a Form XObject onto every page
+of a document -- watermarks, letterheads, page numbers, etc.
+
+Each page's original content is wrapped in 'q ... Q' so that
+whatever graphics state it leaves behind cannot affect the stamp.
+Rather than rewriting the page's content, its /Contents becomes
+an array:
+
+    [<q> original contents... <Q q matrix cm /Stamp Do Q>]
+
+and the small prefix and suffix streams are shared by every
+page, so the per-page cost is one array and (at most) one
+resources dictionary.  The stamp is added to the page's XObject
+resources under a name that does not clash with the existing
+ones; merged resource dictionaries are cached per original
+resources dictionary, so pages which share resources also share
+the merged version.
+
+The stamp can be one XObject for every page, or a function of
+the page index (e.g. page numbers, see textstamp()).  Pages are
+stamped in place, and output is written through PdfStreamWriter.
+
+Usage:
+    python overlay.py input.pdf stamp.pdf output.pdf [under]
+'''
+
+from pdfobjects import PdfDict, PdfArray, PdfName, PdfString, IndirectPdfDict
+from pdfwriter import PdfStreamWriter
+from buildxobj import pagexobj
+from impose import fmtnum
+
+IDENTITY = 1, 0, 0, 1, 0, 0
+
+class Stamper(object):
+    ''' Applies stamps to pages, caching the shared streams and
+        merged resources.
+    '''
+
+    def __init__(self, stamp, matrix=IDENTITY, underneath=False):
+        self.stamp = stamp
+        self.matrix = ' '.join([fmtnum(x) for x in matrix])
+        self.underneath = underneath
+        self.resources = {}
+        self.streams = {}
+        self.push = IndirectPdfDict(stream='q\n')
+        self.pop = IndirectPdfDict(stream='\nQ\n')
+
+    def draw(self, name):
+        ''' Return the (cached) stream which draws the stamp.
+        '''
+        result = self.streams.get(name)
+        if result is None:
+            text = 'q %s cm %s Do Q\n' % (self.matrix, name)
+            if not self.underneath:
+                text = '\nQ\n' + text
+            result = self.streams[name] = IndirectPdfDict(stream=text)
+        return result
+
+    def mergeresources(self, resources, xobj):
+        ''' Return (name, resources) -- a resources dictionary
+            with xobj added under name.  Cached by resources
+            dictionary, for as long as the stamp stays the same.
+        '''
+        key = id(resources)
+        cached = self.resources.get(key)
+        if cached is not None and cached[3] is xobj:
+            return cached[:2]
+        if resources is None:
+            resources = PdfDict()
+        xobjects = resources.XObject or PdfDict()
+        name = base = PdfName.Stamp
+        count = 0
+        while name in xobjects and xobjects[name] is not xobj:
+            count += 1
+            name = '%s%d' % (base, count)
+        xobjects = PdfDict(xobjects)
+        xobjects[name] = xobj
+        merged = PdfDict(resources)
+        merged.XObject = xobjects
+        # Keep resources alive so its id cannot be reused
+        self.resources[key] = name, merged, resources, xobj
+        return name, merged
+
+    def __call__(self, page, index=0):
+        ''' Stamp page and return it.  The page is changed in place
+            rather than copied, so that anything which refers back to
+            it (such as each annotation's /P) still refers to the
+            stamped page, and not to an unstamped original which would
+            drag the whole source page tree into the output.
+        '''
+        xobj = self.stamp
+        if not isinstance(xobj, PdfDict):
+            xobj = xobj(index)
+        contents = page.Contents
+        if contents is None:
+            contents = []
+        elif not isinstance(contents, PdfArray):
+            contents = [contents]
+        name, resources = self.mergeresources(page.inheritable.Resources, xobj)
+        draw = self.draw(name)
+        if self.underneath:
+            contents = [draw, self.push] + contents + [self.pop]
+        else:
+            contents = [self.push] + contents + [draw]
+        page.Contents = PdfArray(contents)
+        page.Resources = resources
+        return page
+
+_fonts = {}
+
+def textstamp(text, x, y, size=9, font='Helvetica'):
+    ''' Build a small Form XObject which shows a line of text in
+        one of the standard fonts, e.g. for page numbers:
+
+            stamper = Stamper(lambda i: textstamp('Page %d' % (i+1), 72, 36))
+    '''
+    fontdict = _fonts.get(font)
+    if fontdict is None:
+        fontdict = _fonts[font] = IndirectPdfDict(
+            Type = PdfName.Font,
+            Subtype = PdfName.Type1,
+            BaseFont = PdfName(font),
+            Encoding = PdfName.WinAnsiEncoding,
+        )
+    return IndirectPdfDict(
+        Type = PdfName.XObject,
+        Subtype = PdfName.Form,
+        FormType = 1,
+        BBox = PdfArray(['0', '0', fmtnum(x + size * len(text)),
+                         fmtnum(y + 2 * size)]),
+        Resources = PdfDict(Font=PdfDict(F1=fontdict)),
+        stream = 'BT /F1 %s Tf %s %s Td %s Tj ET' % (fmtnum(size),
+                    fmtnum(x), fmtnum(y), PdfString.encode(text)),
+    )
+
+def stamppages(pages, stamp, output, matrix=IDENTITY, underneath=False,
+               version='1.3', compress=True):
+    ''' Stamp every page in pages and write the result to output.
+        stamp is a Form XObject, a page (converted with pagexobj),
+        or a function of the page index returning an XObject.
+    '''
+    if isinstance(stamp, PdfDict) and stamp.Type == PdfName.Page:
+        stamp = pagexobj(stamp)
+    stamper = Stamper(stamp, matrix, underneath)
+    writer = PdfStreamWriter(output, version, compress)
+    for index, page in enumerate(pages):
+        writer.addpage(stamper(page, index))
+    writer.close()
+    return output
+
+def main(args=None):
+    import sys
+    from pdfreader import PdfReader
+    args = args is None and sys.argv[1:] or args
+    if len(args) not in (3, 4):
+        sys.exit('usage: overlay.py input.pdf stamp.pdf output.pdf [under]')
+    pages = PdfReader(args[0], decompress=False).pages
+    stamp = PdfReader(args[1], decompress=False).pages[0]
+    stamppages(pages, stamp, args[2], underneath=args[3:] == ['under'])
+
+if __name__ == '__main__':
+    main()
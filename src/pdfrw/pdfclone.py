@@ -0,0 +1,159 @@
+# A part of pdfrw (pdfrw.googlecode.com)
+# Copyright (C) 2006-2009 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Copy-on-write cloning of object graphs.
+
+Filling in one template (e.g. a form) for many recipients needs a
+separate copy of the template's pages for each of them, but nearly
+everything those pages reference -- content streams, fonts, images,
+appearance streams -- is the same in every copy.
+
+A Template indexes the dicts and arrays reachable from its root
+once, recording which objects refer to each of them.  A Clone of
+the template starts out as the template itself.  The first time the
+clone needs to change an object, writable() makes a shallow copy of
+it, and of every object in the template which refers to it (and so
+on, up to the root), so that the clone's graph is the template's
+graph with just those objects replaced.  Everything else, including
+every stream, is shared with the template and with other clones.
+
+References back up the graph count too: a widget annotation's /P
+refers to its page, so once the page has been copied, so are the
+widgets on it (but not their appearance streams).  The /Parent of
+a page is not followed, so a template made from one page of a
+document does not take in the rest of the document.
+
+The writers write each indirect object once per output file, however
+many pages refer to it, so objects that clones share are only
+written once when several clones are written to the same file.
+
+Usage:
+    template = Template(PdfReader('form.pdf').pages[0])
+    for name in names:
+        clone = template.clone()
+        clone.set(['/Annots', 0, '/V'], PdfString.encode(name))
+        writer.addpage(clone.root)
+'''
+
+try:
+    set
+except NameError:
+    from sets import Set as set
+
+from pdfobjects import PdfDict, PdfArray, PdfName
+
+class Template(object):
+    ''' The dicts and arrays reachable from root (a dict, or a
+        list of them), indexed for cloning.  The template must
+        not be changed once clones have been made from it.
+    '''
+
+    pagetypes = PdfName.Page, PdfName.Pages
+
+    def __init__(self, root):
+        if not isinstance(root, (PdfDict, PdfArray)):
+            root = PdfArray(root)
+        self.root = root
+        self.objects = {id(root): root}     # id(obj) -> obj
+        self.referrers = {}     # id(obj) -> [(referrer, key), ...]
+        self.index()
+
+    def index(self):
+        objects = self.objects
+        referrers = self.referrers
+        pending = [self.root]
+        while pending:
+            obj = pending.pop()
+            if isinstance(obj, PdfDict):
+                items = obj.iteritems()
+                if obj.Type in self.pagetypes:
+                    items = [x for x in items if x[0] != PdfName.Parent]
+            else:
+                items = enumerate(obj)
+            for key, value in items:
+                if not isinstance(value, (PdfDict, PdfArray)):
+                    continue
+                referrers.setdefault(id(value), []).append((obj, key))
+                if id(value) not in objects:
+                    objects[id(value)] = value
+                    pending.append(value)
+
+    def clone(self):
+        return Clone(self)
+
+class Clone(object):
+    ''' A copy-on-write copy of a Template.
+    '''
+
+    def __init__(self, template):
+        self.template = template
+        self.copies = {}        # id(original) -> copy
+        self.owned = set()      # ids of the copies
+
+    def root(self):
+        root = self.template.root
+        return self.copies.get(id(root), root)
+    root = property(root)
+
+    def get(self, path):
+        ''' Follow a list of keys and indices from the root.
+        '''
+        obj = self.root
+        for key in path:
+            obj = obj[key]
+        return obj
+
+    def set(self, path, value):
+        ''' Set the value at the end of a path from the root,
+            copying whatever is needed.
+        '''
+        self.writable(self.get(path[:-1]))[path[-1]] = value
+
+    def writable(self, obj):
+        ''' Return this clone's own copy of obj, which is an
+            object in the template (or an object that writable()
+            has already returned).  The copy may be changed freely.
+        '''
+        if id(obj) in self.owned:
+            return obj
+        copies = self.copies
+        copy = copies.get(id(obj))
+        if copy is not None:
+            return copy
+        template = self.template
+        if template.objects.get(id(obj)) is not obj:
+            raise ValueError('Object is not part of the template')
+        referrers = template.referrers
+
+        # Copy obj and everything that refers to it ...
+        copied = []
+        pending = [obj]
+        while pending:
+            original = pending.pop()
+            if id(original) in copies:
+                continue
+            if isinstance(original, PdfDict):
+                copy = PdfDict(original)
+            else:
+                copy = PdfArray(original)
+                copy.indirect = original.indirect
+            copies[id(original)] = copy
+            self.owned.add(id(copy))
+            copied.append(original)
+            pending.extend([x[0] for x in referrers.get(id(original), ())])
+
+        # ... and point the copies of the referrers at the new copies
+        # (unless the clone has already put something else there).
+        for original in copied:
+            copy = copies[id(original)]
+            for referrer, key in referrers.get(id(original), ()):
+                target = copies[id(referrer)]
+                if isinstance(target, PdfDict):
+                    if dict.get(target, key) is original:
+                        dict.__setitem__(target, key, copy)
+                elif (key < len(target) and
+                        list.__getitem__(target, key) is original):
+                    list.__setitem__(target, key, copy)
+        return copies[id(obj)]
@@ -3,9 +3,14 @@
 # MIT license -- See LICENSE.txt for details
 
 '''
-Currently, this sad little file only knows how to decompress
-using the flate (zlib) algorithm.  Maybe more later, but it's
-not a priority for me...
+Stream compression and decompression.
+
+Streams can be decoded if every filter in their /Filter chain is
+FlateDecode (zlib) or ASCII85Decode, and they have no
+/DecodeParms.  decodestream() returns a stream's decoded data
+without changing it, and uncompress() decodes streams in place.
+compress() flate compresses streams which have no filter, when
+that makes them smaller.
 '''
 
 from __future__ import generators
@@ -15,6 +20,7 @@ try:
 except NameError:
     from sets import Set as set
 
+import struct
 import zlib
 from pdfobjects import PdfDict, PdfName
 
@@ -24,23 +30,75 @@ def streamobjects(mylist):
         if isinstance(obj, PdfDict) and obj.stream is not None:
             yield obj
 
+def a85decode(data):
+    ''' Decode ASCII85 data (as written by e.g. reportlab).
+    '''
+    data = ''.join(data.split())
+    if data.startswith('<~'):
+        data = data[2:]
+    end = data.find('~>')
+    if end >= 0:
+        data = data[:end]
+    data = data.replace('z', '!!!!!')
+    padding = -len(data) % 5
+    data += 'u' * padding
+    result = []
+    pack = struct.pack
+    for i in range(0, len(data), 5):
+        value = 0
+        for ch in data[i:i+5]:
+            value = value * 85 + (ord(ch) - 33)
+        result.append(pack('>L', value))
+    result = ''.join(result)
+    if padding:
+        result = result[:-padding]
+    return result
+
+decoders = {
+    PdfName.FlateDecode: zlib.decompress,
+    PdfName.ASCII85Decode: a85decode,
+}
+
+def decodable(obj):
+    ''' Return True if decodestream can decode a stream object.
+    '''
+    ftype = obj.Filter
+    if ftype is None:
+        return True
+    if not isinstance(ftype, list):
+        ftype = [ftype]
+    return obj.DecodeParms is None and None not in [decoders.get(x) for x in ftype]
+
+def decodestream(obj, warnings=set()):
+    ''' Return the decompressed data of a stream object without
+        changing the object, or None if it uses a filter we
+        cannot decode.
+    '''
+    ftype = obj.Filter
+    if ftype is None:
+        return obj.stream
+    if not isinstance(ftype, list):
+        ftype = [ftype]
+    parms = obj.DecodeParms
+    funcs = [decoders.get(x) for x in ftype]
+    if None in funcs or parms is not None:
+        msg = 'Not decompressing: cannot use filter %s with parameters %s' % (repr(obj.Filter), repr(parms))
+        if msg not in warnings:
+            warnings.add(msg)
+            print msg
+        return None
+    stream = obj.stream
+    for func in funcs:
+        stream = func(stream)
+    return stream
+
 def uncompress(mylist, warnings=set()):
-    flate = PdfName.FlateDecode
     for obj in streamobjects(mylist):
-        ftype = obj.Filter
-        if ftype is None:
+        if obj.Filter is None:
             continue
-        if isinstance(ftype, list) and len(ftype) == 1:
-            # todo: multiple filters
-            ftype = ftype[0]
-        parms = obj.DecodeParms
-        if ftype != flate or parms is not None:
-            msg = 'Not decompressing: cannot use filter %s with parameters %s' % (repr(ftype), repr(parms))
-            if msg not in warnings:
-                warnings.add(msg)
-                print msg
-        else:
-            obj.stream = zlib.decompress(obj.stream)
+        stream = decodestream(obj, warnings)
+        if stream is not None:
+            obj.stream = stream
             obj.Filter = None
 
 def compress(mylist):
@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+
+# A part of pdfrw (pdfrw.googlecode.com)
+# Copyright (C) 2006-2009 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Downsamples oversized images.
+
+Scanned documents often embed 600 dpi images where 150 dpi would do.
+This module finds where each image XObject is drawn (by following
+the current transformation matrix through the content streams of
+the pages and of any Form XObjects they draw), works out its
+effective resolution at its largest placement, and shrinks images
+which are at least twice as fine as the target resolution.
+
+Images are shrunk by a whole number factor, averaging each block of
+pixels with NumPy, so the result is never coarser than the target.
+They are then re-encoded with zlib, or optionally as JPEG (which
+needs PIL, and is only used for gray and RGB images).  Decoding,
+resampling and encoding are done by a pool of worker processes.
+
+Only images this module can decode losslessly are touched: 8 bit
+gray, RGB, CMYK or ICC based images, uncompressed or compressed
+with filters pdfcompress can decode and without DecodeParms, and
+without a soft mask or colour key mask.  Images which are drawn by
+a stream that cannot be scanned (it cannot be decompressed, or it
+holds an inline image) are left alone, as are images which are
+drawn (even if only in part) by annotations or patterns, whose
+placements are not followed.  Images whose data cannot be decoded,
+or is shorter than their size says, are skipped with a warning.
+
+Usage:
+    python pdfdownsample.py [-d dpi] [--jpeg quality] [-j processes] input.pdf output.pdf
+
+or from Python:
+    doc = PdfReader('scan.pdf', decompress=False)
+    downsample(doc.pages, dpi=150)
+'''
+
+try:
+    set
+except NameError:
+    from sets import Set as set
+
+import math
+import re
+import multiprocessing
+import zlib
+from cStringIO import StringIO
+from itertools import imap, izip
+
+import numpy
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from pdfobjects import PdfDict, PdfArray, PdfName, PdfObject
+from pdfcompress import decoders, decodestream
+from pdfoptimize import operations
+from log import log
+
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+colorspaces = {
+    PdfName.DeviceGray: 1,
+    PdfName.DeviceRGB: 3,
+    PdfName.DeviceCMYK: 4,
+}
+
+def multiply(m1, m2):
+    ''' Return the matrix m1 x m2 (m1 applied first).
+    '''
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (a1 * a2 + b1 * c2, a1 * b2 + b1 * d2,
+            c1 * a2 + d1 * c2, c1 * b2 + d1 * d2,
+            e1 * a2 + f1 * c2 + e2, e1 * b2 + f1 * d2 + f2)
+
+def components(image):
+    ''' Return the number of colour components of an image
+        we are able to resample, or None.
+    '''
+    if (image.ImageMask is not None or image.SMask is not None or
+            image.Mask is not None or image.DecodeParms is not None or
+            image.BitsPerComponent != '8'):
+        return None
+    colorspace = image.ColorSpace
+    if isinstance(colorspace, PdfArray):
+        if (len(colorspace) == 2 and colorspace[0] == PdfName.ICCBased
+                and isinstance(colorspace[1], PdfDict)):
+            n = colorspace[1].N
+            return n in ('1', '3', '4') and int(n) or None
+        return None
+    return colorspaces.get(colorspace)
+
+def filters(image):
+    ''' Return the list of filters of an image, if we can
+        decode all of them, or None.
+    '''
+    ftype = image.Filter
+    if ftype is None:
+        return []
+    if not isinstance(ftype, PdfArray):
+        ftype = [ftype]
+    for x in ftype:
+        if x not in decoders:
+            return None
+    return list(ftype)
+
+class Placements(object):
+    ''' Records the largest size (in points) at which each image
+        is drawn, and which images are drawn by streams that could
+        not be scanned, or by annotations or patterns.
+    '''
+
+    def __init__(self):
+        self.sizes = {}      # id(image) -> [image, width, height]
+        self.unknown = {}    # id(image) -> image
+        self.forgotten = {}  # id(obj) -> obj, for objects forget() has seen
+
+    def addpage(self, page):
+        contents = page.Contents
+        if contents is None:
+            contents = []
+        elif not isinstance(contents, PdfArray):
+            contents = [contents]
+        self.scan(contents, page.inheritable.Resources, IDENTITY, [])
+        for annot in page.Annots or []:
+            appearances = isinstance(annot, PdfDict) and annot.AP
+            if not isinstance(appearances, PdfDict):
+                continue
+            for appearance in appearances.itervalues():
+                # Either a stream, or a dict of streams for each state
+                if isinstance(appearance, PdfDict) and appearance.stream is None:
+                    self.forget(appearance.itervalues())
+                else:
+                    self.forget([appearance])
+
+    def forget(self, objs):
+        ''' Mark the images drawn by some Form XObjects, annotation
+            appearance streams or patterns (and by the forms and
+            patterns they use) as unknown.
+        '''
+        forgotten = self.forgotten
+        pending = list(objs)
+        while pending:
+            obj = pending.pop()
+            if not isinstance(obj, PdfDict) or id(obj) in forgotten:
+                continue
+            forgotten[id(obj)] = obj
+            if obj.Subtype == PdfName.Image:
+                self.unknown[id(obj)] = obj
+                continue
+            resources = obj.Resources
+            if not isinstance(resources, PdfDict):
+                continue
+            for category in PdfName.XObject, PdfName.Pattern:
+                entries = resources.get(category)
+                if isinstance(entries, PdfDict):
+                    pending.extend(entries.itervalues())
+
+    def scan(self, streams, resources, ctm, active):
+        patterns = resources and resources.Pattern
+        if isinstance(patterns, PdfDict):
+            self.forget(patterns.itervalues())
+        xobjects = resources and resources.XObject
+        if not isinstance(xobjects, PdfDict):
+            return
+        data = []
+        for obj in streams:
+            stream = None
+            if obj.stream is not None:
+                stream = decodestream(obj)
+            if stream is None:
+                data = None
+                break
+            data.append(stream)
+        if data is not None:
+            data = '\n'.join(data)
+            if 'BI' in data and re.search(r'(^|\s)BI\s', data):
+                data = None
+        if data is None:
+            for xobj in xobjects.itervalues():
+                if isinstance(xobj, PdfDict):
+                    self.unknown[id(xobj)] = xobj
+            self.forget(xobjects.itervalues())
+            return
+        stack = []
+        for operands, operator in operations(data):
+            if operator == 'q':
+                stack.append(ctm)
+            elif operator == 'Q':
+                if stack:
+                    ctm = stack.pop()
+            elif operator == 'cm' and len(operands) == 6:
+                try:
+                    ctm = multiply([float(x) for x in operands], ctm)
+                except ValueError:
+                    pass
+            elif operator == 'Do' and operands:
+                self.draw(xobjects.get(operands[-1]), resources, ctm, active)
+
+    def draw(self, xobj, resources, ctm, active):
+        if not isinstance(xobj, PdfDict):
+            return
+        if xobj.Subtype == PdfName.Image:
+            a, b, c, d, e, f = ctm
+            width = math.sqrt(a * a + b * b)
+            height = math.sqrt(c * c + d * d)
+            info = self.sizes.setdefault(id(xobj), [xobj, 0.0, 0.0])
+            info[1] = max(info[1], width)
+            info[2] = max(info[2], height)
+        elif xobj.Subtype == PdfName.Form and id(xobj) not in active:
+            matrix = xobj.Matrix
+            if matrix is not None:
+                try:
+                    ctm = multiply([float(x) for x in matrix], ctm)
+                except ValueError:
+                    pass
+            self.scan([xobj], xobj.Resources or resources, ctm,
+                      active + [id(xobj)])
+
+    def images(self):
+        ''' Yield (image, width, height) for each image whose
+            placements are all known.
+        '''
+        unknown = self.unknown
+        for key, (image, width, height) in self.sizes.iteritems():
+            if key not in unknown:
+                yield image, width, height
+
+def resample(args):
+    ''' Worker function: decode, shrink and re-encode one image.
+        Returns (stream, filter, width, height), None if the
+        result would not be smaller, or an error message if the
+        image cannot be decoded.
+    '''
+    stream, ftype, width, height, ncomp, factor, quality = args
+    oldsize = len(stream)
+    try:
+        for x in ftype:
+            stream = decoders[x](stream)
+    except Exception, s:
+        return '%s: %s' % (type(s).__name__, s)
+    size = width * height * ncomp
+    if len(stream) < size:
+        return 'image data is %d bytes, not %d' % (len(stream), size)
+    pixels = numpy.fromstring(stream, numpy.uint8)
+    pixels = pixels[:width * height * ncomp].reshape(height, width, ncomp)
+    newwidth = -(-width // factor)
+    newheight = -(-height // factor)
+    padx = newwidth * factor - width
+    pady = newheight * factor - height
+    if padx or pady:
+        pixels = numpy.pad(pixels, ((0, pady), (0, padx), (0, 0)), 'edge')
+    pixels = pixels.reshape(newheight, factor, newwidth, factor, ncomp)
+    pixels = pixels.sum(axis=3, dtype=numpy.uint32).sum(axis=1)
+    area = factor * factor
+    pixels = ((pixels + area // 2) // area).astype(numpy.uint8)
+    if quality and ncomp in (1, 3):
+        if ncomp == 1:
+            pixels = pixels[:, :, 0]
+        f = StringIO()
+        Image.fromarray(pixels).save(f, 'JPEG', quality=quality)
+        result = f.getvalue(), PdfName.DCTDecode
+    else:
+        result = zlib.compress(pixels.tostring(), 9), PdfName.FlateDecode
+    if len(result[0]) >= oldsize:
+        return None
+    return result + (newwidth, newheight)
+
+def downsample(pages, dpi=150, quality=None, processes=None):
+    ''' Shrink the images drawn on pages to (no less than) dpi
+        dots per inch, in place.  If quality is given, gray and
+        RGB images are re-encoded as JPEGs of that quality.
+        processes is the size of the worker pool (default: one
+        per CPU); processes=1 does all the work in this process.
+        Returns a list of (image, oldlength, newlength).
+    '''
+    if quality and Image is None:
+        raise ImportError('JPEG encoding needs PIL')
+    placements = Placements()
+    for page in pages:
+        placements.addpage(page)
+    todo = []
+    jobs = []
+    for image, width, height in placements.images():
+        ncomp = components(image)
+        ftype = filters(image)
+        if ncomp is None or ftype is None or not width or not height:
+            continue
+        pixelwidth = int(image.Width)
+        pixelheight = int(image.Height)
+        imagedpi = min(pixelwidth / width, pixelheight / height) * 72
+        factor = int(imagedpi / dpi)
+        if factor < 2:
+            continue
+        todo.append(image)
+        jobs.append((image.stream, ftype, pixelwidth, pixelheight, ncomp,
+                     factor, quality))
+    if processes == 1 or len(jobs) < 2:
+        pool = None
+        results = imap(resample, jobs)
+    else:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap(resample, jobs)
+    changed = []
+    try:
+        for image, result in izip(todo, results):
+            if result is None:
+                continue
+            if isinstance(result, str):
+                log.warning('Not downsampling %sx%s image (%s)',
+                            image.Width, image.Height, result)
+                continue
+            stream, ftype, width, height = result
+            oldlength = len(image.stream)
+            image.stream = stream
+            image.Filter = ftype
+            image.Width = PdfObject(width)
+            image.Height = PdfObject(height)
+            changed.append((image, oldlength, len(stream)))
+    finally:
+        if pool is not None:
+            pool.terminate()
+    return changed
+
+def main(args=None):
+    from optparse import OptionParser
+    from pdfreader import PdfReader
+    from pdfwriter import PdfStreamWriter
+    parser = OptionParser(usage='%prog [options] input.pdf output.pdf')
+    parser.add_option('-d', '--dpi', type='float', default=150,
+                      help='target resolution (default: 150)')
+    parser.add_option('--jpeg', type='int', default=None, metavar='QUALITY',
+                      help='re-encode gray and RGB images as JPEG')
+    parser.add_option('-j', '--processes', type='int', default=None,
+                      help='number of worker processes (default: CPU count)')
+    options, args = parser.parse_args(args)
+    if len(args) != 2:
+        parser.error('need an input file and an output file')
+    pages = PdfReader(args[0], decompress=False).pages
+    changed = downsample(pages, options.dpi, options.jpeg, options.processes)
+    before = sum([x[1] for x in changed])
+    after = sum([x[2] for x in changed])
+    print 'Downsampled %d images: %d bytes -> %d bytes' % (len(changed),
+                                                           before, after)
+    PdfStreamWriter(args[1]).addpages(pages).close()
+
+if __name__ == '__main__':
+    main()
@@ -16,21 +16,23 @@ PDF_ERROR_CONTEXT = 10
 
 class PdfInputError(PdfError):
     "Base class for PDF input errors"
+    # Offset of fdata in the file, when fdata is only part of it
+    base = 0
     def __init__(self, fdata, loc, msg=''):
         self.fdata = fdata
         self.loc = loc
-        self.msg = ''
+        self.msg = msg
     def __str__(self):
         show = repr(self.fdata[self.loc-PDF_ERROR_CONTEXT:self.loc+PDF_ERROR_CONTEXT])
         sep = ' ' if self.msg else ''
-        return "%s%snear byte %d, after %s: %s" % (self.msg, sep, self.loc,
-            repr(self.fdata[self.loc-PDF_ERROR_CONTEXT:self.loc]),
+        return "%s%snear byte %d, after %s: %s" % (self.msg, sep,
+            self.base + self.loc,
+            repr(self.fdata[max(self.loc-PDF_ERROR_CONTEXT, 0):self.loc]),
             repr(self.fdata[self.loc:self.loc+PDF_ERROR_CONTEXT]))
 
 class PdfStructureError(PdfInputError):
     def __init__(self, fdata, loc, msg, what):
         PdfInputError.__init__(self, fdata, loc, msg + ': ' + repr(what))
-        self.msg = msg
         self.what = what
 
 class PdfInvalidCharacterError(PdfInputError):
@@ -50,7 +52,7 @@ class PdfUnexpectedEOFError(PdfInputError):
 class PdfOutputError(PdfError):
     "Base class for PDF output errors"
     def __init__(self, msg):
-        self.msg = ''
+        self.msg = msg
     def __str__(self):
         return self.msg
 
@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+
+# A part of pdfrw (pdfrw.googlecode.com)
+# Copyright (C) 2006-2009 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Fills in the AcroForm fields of a template, once per row of data.
+
+The template is read and its fields are indexed by fully qualified
+name (e.g. 'address.city') once.  Each row then only makes a
+copy-on-write clone of the template (see pdfclone) and sets the
+values of its fields, so everything the rows do not change -- page
+content, fonts, images, field borders -- is shared, and written
+once per output file by a PdfStreamWriter.
+
+Rows are dicts of field name to value, such as those read by a
+csv.DictReader.  The output is either one file per row, or a single
+file with every row's pages.  In a single file, the fields of each
+row are put under a parent field named 'row1', 'row2', etc., so
+that rows do not share values.
+
+Text and choice fields get a new appearance stream: the template's
+appearance (background and border) with the value drawn in the
+field's default appearance (/DA), left aligned on one line.  A /DA
+font size of 0 means auto size; a /DA which sets no font at all gets
+one from the form's resources (or Helvetica).
+NeedAppearances is set, so viewers which can lay out fields
+properly (comb fields, multiline fields, alignment) redo it.
+Check boxes and radio buttons are set to the appearance state
+named by the value (any other value than '', 'Off', '0', 'no' or
+'false' turns a check box on).
+
+Usage:
+    python pdfform.py template.pdf data.csv output.pdf
+    python pdfform.py --each template.pdf data.csv output%04d.pdf
+    python pdfform.py --list template.pdf
+
+or from Python:
+    filler = FormFiller('template.pdf')
+    filler.write(csv.DictReader(open('data.csv', 'rb')), 'output.pdf')
+'''
+
+import re
+
+from pdfreader import PdfReader
+from pdfwriter import PdfStreamWriter
+from pdfobjects import PdfDict, PdfArray, PdfName, PdfObject, PdfString, \
+                       IndirectPdfDict
+from pdfcompress import decodestream
+from pdfclone import Template
+from impose import fmtnum
+
+offvalues = set(['', 'off', '0', 'no', 'false'])
+
+findsize = re.compile(r'([\d.]+)(\s+Tf)').search
+
+def fieldname(field):
+    ''' Return the partial name of a field as a (UTF-8) string.
+    '''
+    name = field.T.decode()
+    if name.startswith('\xfe\xff'):
+        name = name[2:].decode('utf-16-be').encode('utf-8')
+    return name
+
+def defaultfont(resources):
+    ''' Return (name, resources) for a font to show a value in when
+        the field's /DA does not set one: /Helv or the first font in
+        resources, or else Helvetica, added to a copy of resources.
+    '''
+    fonts = isinstance(resources, PdfDict) and resources.Font
+    if isinstance(fonts, PdfDict) and fonts:
+        if PdfName.Helv in fonts:
+            return PdfName.Helv, resources
+        return sorted(fonts)[0], resources
+    resources = isinstance(resources, PdfDict) and PdfDict(resources) or PdfDict()
+    resources.Font = PdfDict(Helv=IndirectPdfDict(
+        Type = PdfName.Font,
+        Subtype = PdfName.Type1,
+        BaseFont = PdfName.Helvetica,
+        Encoding = PdfName.WinAnsiEncoding,
+    ))
+    return PdfName.Helv, resources
+
+class TextAppearance(object):
+    ''' Makes appearance streams showing a value in one text
+        widget, based on the widget's appearance in the template.
+    '''
+
+    def __init__(self, widget, da, resources):
+        x1, y1, x2, y2 = [float(x) for x in widget.Rect]
+        width, height = abs(x2 - x1), abs(y2 - y1)
+        ap = widget.AP and widget.AP.N
+        prefix, suffix = '/Tx BMC\n', 'EMC\n'
+        if isinstance(ap, PdfDict) and ap.stream is not None:
+            # Keep whatever the template draws around the text
+            stream = decodestream(ap)
+            if stream is not None and '/Tx BMC' in stream:
+                start = stream.index('/Tx BMC') + len('/Tx BMC')
+                end = stream.rfind('EMC')
+                if end > start:
+                    prefix = stream[:start] + '\n'
+                    suffix = stream[end:]
+            resources = ap.Resources or resources
+        match = findsize(da)
+        if match is None:
+            # No font set; auto size a default one
+            font, resources = defaultfont(resources)
+            da = ('%s %s 0 Tf' % (da.strip(), font)).strip()
+            match = findsize(da)
+        if isinstance(resources, PdfDict) and not resources.indirect:
+            # Write it once, not in every new appearance stream
+            # (IndirectPdfDict(x) would copy x's indirect flag)
+            resources = PdfDict(resources, indirect=True)
+        size = float(match.group(1))
+        if not size:
+            # Auto size
+            size = max(min(height - 4, 12), 1)
+            da = '%s%s%s' % (da[:match.start()], fmtnum(size),
+                             da[match.end(1):])
+        self.template = '%sq 1 1 %s %s re W n BT %s 2 %s Td %%s Tj ET Q\n%s' % (
+            prefix, fmtnum(width - 2), fmtnum(height - 2), da,
+            fmtnum((height - size) / 2.0 + 0.3 * size), suffix)
+        self.bbox = PdfArray([PdfObject(0), PdfObject(0),
+                              PdfObject(fmtnum(width)),
+                              PdfObject(fmtnum(height))])
+        self.resources = resources
+
+    def __call__(self, value):
+        return IndirectPdfDict(
+            Type = PdfName.XObject,
+            Subtype = PdfName.Form,
+            BBox = self.bbox,
+            Resources = self.resources,
+            stream = self.template % PdfString.encode(value),
+        )
+
+class FormFiller(object):
+    ''' Fills in the fields of a template (a filename or a
+        PdfReader).  fields maps each fully qualified field name
+        to its field dictionary in the template.
+    '''
+
+    def __init__(self, template):
+        if not isinstance(template, PdfReader):
+            template = PdfReader(template, decompress=False)
+        acroform = template.Root.AcroForm
+        if acroform is None or not acroform.Fields:
+            raise ValueError('The template has no form fields')
+        self.acroform = acroform
+        self.pages = list(template.pages)
+        self.template = Template(PdfArray([acroform] + self.pages))
+        # Direct objects the writers may cache the formatting of
+        self.frozen = set(self.template.objects)
+        self.fields = {}
+        self.setters = {}
+        da = acroform.DA
+        self.addfields(acroform.Fields, '', da and da.decode() or '')
+
+    def addfields(self, fields, prefix, da):
+        for field in fields:
+            name = prefix + fieldname(field)
+            fieldda = field.DA and field.DA.decode() or da
+            kids = field.Kids or []
+            if [x for x in kids if x.T is not None]:
+                self.addfields(kids, name + '.', fieldda)
+                continue
+            self.fields[name] = field
+            self.setters[name] = self.setter(field, kids or [field], fieldda)
+
+    def setter(self, field, widgets, da):
+        ''' Return a function which sets the value of a terminal
+            field (and its widgets) in a clone.
+        '''
+        ftype = field.inheritable.FT
+        flags = int(field.inheritable.Ff or 0)
+        if ftype in (PdfName.Tx, PdfName.Ch):
+            resources = self.acroform.DR
+            appearances = [(x, TextAppearance(x, x.DA and x.DA.decode()
+                                              or da, resources))
+                           for x in widgets]
+            self.frozen.update([id(x[1].bbox) for x in appearances])
+            def settext(clone, value):
+                clone.writable(field).V = PdfString.encode(value)
+                for widget, appearance in appearances:
+                    clone.writable(widget).AP = PdfDict(N=appearance(value))
+            return settext
+        if ftype == PdfName.Btn and not flags & (1 << 16):
+            states = []
+            for widget in widgets:
+                ap = widget.AP and widget.AP.N
+                names = isinstance(ap, PdfDict) and ap.keys() or []
+                states.append((widget, [x for x in names if x != PdfName.Off]))
+            def setbutton(clone, value):
+                if value.lower() in offvalues:
+                    state = PdfName.Off
+                else:
+                    state = PdfName(value)
+                    if len(states) == 1 and states[0][1] and \
+                            state not in states[0][1]:
+                        # A check box: any true value turns it on
+                        state = states[0][1][0]
+                clone.writable(field).V = state
+                for widget, names in states:
+                    clone.writable(widget).AS = \
+                        state in names and state or PdfName.Off
+            return setbutton
+        return None
+
+    def fill(self, values):
+        ''' Return a clone of the template with the fields named
+            in values set.  Values of None are skipped.
+        '''
+        clone = self.template.clone()
+        setters = self.setters
+        for name, value in values.iteritems():
+            if value is None:
+                continue
+            if name not in setters:
+                raise KeyError('No field named %r' % name)
+            setter = setters[name]
+            if setter is None:
+                raise ValueError('Cannot fill field %r' % name)
+            setter(clone, value)
+        return clone
+
+    def formdict(self, fields):
+        result = IndirectPdfDict(self.acroform)
+        result.Fields = fields
+        result.NeedAppearances = PdfObject('true')
+        return result
+
+    def write(self, rows, output, compress=True):
+        ''' Write the filled pages for every row to one file.
+            Returns the number of rows.
+        '''
+        writer = PdfStreamWriter(output, compress=compress,
+                                 frozen=self.frozen)
+        rowfields = PdfArray()
+        for index, values in enumerate(rows):
+            clone = self.fill(values)
+            rowfield = IndirectPdfDict(T=PdfString.encode('row%d' % (index + 1)))
+            kids = PdfArray()
+            for field in clone.root[0].Fields:
+                field = clone.writable(field)
+                field.Parent = rowfield
+                kids.append(field)
+            rowfield.Kids = kids
+            rowfields.append(rowfield)
+            writer.addpages(clone.root[1:])
+        writer.close(AcroForm=self.formdict(rowfields))
+        return len(rowfields)
+
+    def writeeach(self, rows, output, compress=True):
+        ''' Write the filled pages for each row to a file of its
+            own.  output is a format string, which is given the
+            row number (counting from 1), or a function of the
+            row number and the row.  Returns the number of rows.
+        '''
+        count = 0
+        for index, values in enumerate(rows):
+            count = index + 1
+            if callable(output):
+                fname = output(count, values)
+            else:
+                fname = output % count
+            clone = self.fill(values)
+            writer = PdfStreamWriter(fname, compress=compress,
+                                     frozen=self.frozen)
+            writer.addpages(clone.root[1:])
+            writer.close(AcroForm=self.formdict(clone.root[0].Fields))
+        return count
+
+def main(args=None):
+    import csv
+    from optparse import OptionParser
+    parser = OptionParser(
+        usage='%prog [options] template.pdf data.csv output.pdf')
+    parser.add_option('-e', '--each', action='store_true', default=False,
+                      help='write a file per row; output is a pattern '
+                           'such as out%04d.pdf')
+    parser.add_option('-l', '--list', action='store_true', default=False,
+                      help='list the fields of the template')
+    options, args = parser.parse_args(args)
+    if options.list:
+        if len(args) != 1:
+            parser.error('need a template')
+        filler = FormFiller(args[0])
+        names = filler.fields.keys()
+        names.sort()
+        for name in names:
+            print name, filler.fields[name].inheritable.FT
+        return
+    if len(args) != 3:
+        parser.error('need a template, a CSV file and an output file')
+    filler = FormFiller(args[0])
+    f = open(args[1], 'rb')
+    try:
+        rows = csv.DictReader(f)
+        if options.each:
+            count = filler.writeeach(rows, args[2])
+        else:
+            count = filler.write(rows, args[2])
+    finally:
+        f.close()
+    print 'Filled %d forms' % count
+
+if __name__ == '__main__':
+    main()
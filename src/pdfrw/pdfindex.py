@@ -0,0 +1,132 @@
+# A part of pdfrw (pdfrw.googlecode.com)
+# Copyright (C) 2006-2009 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+A compact cross-reference index which can be shared between
+processes.
+
+Worker processes which each open the same PDF with PdfReader each
+re-read and re-parse its cross-reference tables, and build their own
+dictionary of every object in the file.  An XrefIndex is built once,
+from a PdfReader which has read the tables, and holds the offset,
+length and generation of every object in a flat array of fixed size
+records, along with the offset of the trailer.  Looking an object up
+is a single struct.unpack_from(), so the index can live in memory
+that is not copied into each process:
+
+    - XrefIndex.shared() copies it into multiprocessing shared memory,
+      which workers inherit when they are forked
+    - save() writes it to a file, and XrefIndex.open() memory maps
+      such a file
+
+A PdfReader created with a source and an index skips the xref tables
+entirely, and only reads the objects it needs.  (If the source is not
+the size the index was built for, the index is out of date, and the
+reader warns and reads the xref tables instead.)  With an MmapSource,
+those reads come straight from the operating system's page cache, so
+no worker copies the file:
+
+    index = XrefIndex.build(PdfReader(source=MmapSource('big.pdf')))
+    pool = multiprocessing.Pool(8, setindex, (index.shared(),))
+
+    def setindex(index):
+        global doc
+        doc = PdfReader(source=MmapSource('big.pdf'), index=index)
+'''
+
+import mmap
+import multiprocessing
+import struct
+from bisect import bisect_right
+
+class XrefIndex(object):
+    ''' Offsets, lengths and generations of the objects in a PDF
+        file, by object number, in a buffer (a string, mmap or
+        shared array).
+    '''
+
+    magic = 'PDFRWX01'
+    header = struct.Struct('<8sqqq')    # magic, count, trailer, size
+    record = struct.Struct('<qIH2x')    # offset (-1 if free), length, gen
+
+    def __init__(self, data):
+        self.data = data
+        magic, self.count, self.traileroffset, self.size = \
+            self.header.unpack_from(data, 0)
+        if magic != self.magic:
+            raise ValueError('Not an xref index')
+
+    def __len__(self):
+        return self.count
+
+    def lookup(self, objnum):
+        ''' Return (offset, length, generation) for an object
+            number, or None if it is not in use.
+        '''
+        if not 0 <= objnum < self.count:
+            return None
+        offset, length, generation = self.record.unpack_from(self.data,
+                        self.header.size + objnum * self.record.size)
+        if offset < 0:
+            return None
+        return offset, length, generation
+
+    def build(cls, reader):
+        ''' Build an index from a PdfReader.  Each object's length
+            runs to the next object or xref table.
+        '''
+        if reader.lazy:
+            size = reader.source.size
+        else:
+            size = len(reader.fdata)
+        entries = {}
+        for (fdata, objnum, generation), record in \
+                reader.indirect_objects.iteritems():
+            # Keep the highest generation of each object
+            if entries.get(objnum, (0, -1))[1] < generation:
+                entries[objnum] = record[0], generation
+        boundaries = [x[0] for x in entries.itervalues()]
+        boundaries.extend(reader.xrefoffsets)
+        boundaries.append(size)
+        boundaries.sort()
+
+        count = max(entries.keys() + [0]) + 1
+        free = cls.record.pack(-1, 0, 0)
+        records = [free] * count
+        for objnum, (offset, generation) in entries.iteritems():
+            index = min(bisect_right(boundaries, offset), len(boundaries) - 1)
+            length = boundaries[index] - offset
+            records[objnum] = cls.record.pack(offset, length, generation)
+        header = cls.header.pack(cls.magic, count, reader.traileroffset, size)
+        return cls(header + ''.join(records))
+    build = classmethod(build)
+
+    def tostring(self):
+        return self.data[:]
+
+    def save(self, fname):
+        f = open(fname, 'wb')
+        try:
+            f.write(self.tostring())
+        finally:
+            f.close()
+
+    def open(cls, fname):
+        ''' Memory map an index written by save().
+        '''
+        f = open(fname, 'rb')
+        try:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        finally:
+            f.close()
+    open = classmethod(open)
+
+    def shared(self):
+        ''' Return a copy of the index in shared memory, for
+            passing to worker processes when they are created.
+        '''
+        data = self.tostring()
+        buf = multiprocessing.RawArray('c', len(data))
+        buf[:] = data
+        return XrefIndex(buf)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+# A part of pdfrw (pdfrw.googlecode.com)
+# Copyright (C) 2006-2009 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Concatenates many PDF files into one.
+
+Parsing is the expensive part of merging, so the inputs are
+read in a pool of worker processes.  Each worker parses one
+file with PdfReader and returns its pages as a compact payload
+of already-formatted objects (see pdfwriter.serialise).  The
+parent process only renumbers the objects in each payload and
+streams them into the output with a PdfStreamWriter, so its
+memory use does not grow with the number of inputs.
+
+Usage:
+    python pdfmerge.py [-j processes] output.pdf input.pdf ...
+
+or from Python:
+    mergepdfs(['a.pdf', 'b.pdf'], 'merged.pdf')
+'''
+
+import multiprocessing
+from itertools import imap
+
+from pdfreader import PdfReader
+from pdfwriter import PdfStreamWriter, serialise
+from pdfobjects import PdfObject
+
+def _loadpayload(args):
+    ''' Worker function: parse one input and serialise its pages.
+    '''
+    fname, pagesref, compress, prune = args
+    doc = PdfReader(fname, decompress=False)
+    return serialise(doc.pages, compress, prune, Parent=PdfObject(pagesref))
+
+def mergepdfs(fnames, output, processes=None, version='1.3',
+              compress=True, chunksize=1, prune=False):
+    ''' Write the pages of every file in fnames, in order, to output
+        (a filename or file object).  processes is the size of the
+        worker pool (default: one per CPU); processes=1 does all
+        the work in this process.  If prune is set, each page only
+        keeps the resources its content streams use.
+    '''
+    writer = PdfStreamWriter(output, version, compress)
+    jobs = [(fname, writer.pagesref, compress, prune) for fname in fnames]
+    if processes == 1:
+        pool = None
+        payloads = imap(_loadpayload, jobs)
+    else:
+        pool = multiprocessing.Pool(processes)
+        payloads = pool.imap(_loadpayload, jobs, chunksize)
+    try:
+        for payload in payloads:
+            writer.addpayload(payload)
+    finally:
+        if pool is not None:
+            pool.terminate()
+    writer.close()
+    return output
+
+def main(args=None):
+    from optparse import OptionParser
+    parser = OptionParser(usage='%prog [options] output.pdf input.pdf ...')
+    parser.add_option('-j', '--processes', type='int', default=None,
+                      help='number of worker processes (default: CPU count)')
+    parser.add_option('--no-compress', dest='compress', action='store_false',
+                      default=True, help='do not compress uncompressed streams')
+    parser.add_option('--prune', action='store_true', default=False,
+                      help='drop page resources which are never used')
+    options, args = parser.parse_args(args)
+    if len(args) < 2:
+        parser.error('need an output file and at least one input file')
+    mergepdfs(args[1:], args[0], options.processes, compress=options.compress,
+              prune=options.prune)
+
+if __name__ == '__main__':
+    main()
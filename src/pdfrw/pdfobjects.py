@@ -16,6 +16,7 @@ except NameError:
     from sets import Set as set
 
 import re
+from binascii import unhexlify
 
 class PdfObject(str):
     indirect = False
@@ -23,6 +24,38 @@ class PdfObject(str):
 class PdfArray(list):
     indirect = False
 
+class PdfIndirect(tuple):
+    ''' An (objnum, gennum) reference to an indirect object that
+        has not been read yet.  A PdfReader reading from a source
+        (rather than a string) leaves these in the dicts and arrays
+        it builds, and PdfDict and PdfLazyArray replace them with
+        the objects they refer to when they are looked at.
+    '''
+    def real_value(self):
+        return self._loader(self)
+
+class PdfLazyArray(PdfArray):
+    ''' A PdfArray which holds PdfIndirect references.  The first
+        time its contents are looked at, the references are read
+        and the array turns into an ordinary PdfArray.
+    '''
+    def _resolve(self):
+        for index, value in enumerate(list.__iter__(self)):
+            if isinstance(value, PdfIndirect):
+                list.__setitem__(self, index, value.real_value())
+        self.__class__ = PdfArray
+
+def _resolving(name):
+    def method(self, *args):
+        self._resolve()
+        return getattr(self, name)(*args)
+    return method
+
+for name in ('__getitem__ __getslice__ __iter__ __reversed__ __contains__ '
+             '__eq__ __ne__ __add__ pop index count remove sort').split():
+    setattr(PdfLazyArray, name, _resolving(name))
+del name
+
 class PdfName(object):
     def __getattr__(self, name):
         return self(name)
@@ -70,6 +103,13 @@ class PdfString(str):
 
     def decode_hex(self, remap=chr, twobytes=False):
         data = ''.join(self.split())
+        if remap is chr and not twobytes and not len(data) % 2:
+            # Plain bytes: let binascii do the work
+            try:
+                if data[0] == '<' and data[-1] == '>':
+                    return unhexlify(data[1:-1])
+            except TypeError:
+                pass    # (not hex -- complain below)
         data = self.hex_funcs[twobytes](data)
         chars = data[1::2]
         other = data[0::2]
@@ -136,12 +176,38 @@ class PdfDict(dict):
                 notnone = value is not None
                 self.Length = notnone and PdfObject(len(value)) or None
 
+    def __getitem__(self, name):
+        value = dict.__getitem__(self, name)
+        if isinstance(value, PdfIndirect):
+            value = value.real_value()
+            dict.__setitem__(self, name, value)
+        return value
+
+    def get(self, name, default=None):
+        value = dict.get(self, name, default)
+        if isinstance(value, PdfIndirect):
+            value = value.real_value()
+            dict.__setitem__(self, name, value)
+        return value
+
     def iteritems(self):
         for key, value in dict.iteritems(self):
             if value is not None:
                 assert key.startswith('/'), (key, value)
+                if isinstance(value, PdfIndirect):
+                    value = self[key]
                 yield key, value
 
+    def itervalues(self):
+        for key, value in self.iteritems():
+            yield value
+
+    def items(self):
+        return list(self.iteritems())
+
+    def values(self):
+        return list(self.itervalues())
+
     def inheritable(self):
         ''' Search through ancestors as needed for inheritable
             dictionary items
@@ -0,0 +1,195 @@
+# A part of pdfrw (pdfrw.googlecode.com)
+# Copyright (C) 2006-2009 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Content stream optimiser.
+
+Content streams written by canvas-style libraries are often full of
+redundant operators: empty 'q Q' pairs, colours and fonts which are
+set to what they already are, and numbers with far more digits than
+any device can show.  This module tokenizes content streams with
+PdfTokens and re-serialises them compactly:
+
+    - 'q ... Q' groups which draw nothing (they are empty, or only
+      change the graphics state) are removed
+    - identity 'cm' operators are removed
+    - colour, font, line style and text state operators which set
+      a value that is already in effect are removed.  Values are
+      tracked through the q/Q graphics state stack, and start out
+      unknown, since a stream may inherit state from a previous
+      stream or from whatever draws a Form XObject.
+    - numbers are rounded to a fixed number of decimal places
+      (matrix operands, which may be tiny scale factors, keep
+      more digits)
+    - the result is written one operator per line with single spaces
+
+Streams containing inline images (BI ... ID ... EI) hold raw binary
+data which the tokenizer cannot handle, and are left alone, as are
+streams which cannot be decompressed.
+
+The optimiser is used by PdfWriter and PdfStreamWriter when they are
+created with optimize=True.  It runs before compression.
+'''
+
+try:
+    set
+except NameError:
+    from sets import Set as set
+
+import re
+from pdftokens import PdfTokens
+from pdfobjects import PdfDict, PdfArray, PdfName, PdfString
+from pdfcompress import uncompress
+
+number_match = re.compile(r'^[+-]?(\d+\.?\d*|\.\d+)$').match
+
+# Operators which set a piece of graphics state, and which piece.
+statekeys = dict(
+    rg='fill', g='fill', k='fill', sc='fill', scn='fill',
+    RG='stroke', G='stroke', K='stroke', SC='stroke', SCN='stroke',
+    Tf='Tf', Tc='Tc', Tw='Tw', Tz='Tz', TL='TL', Tr='Tr', Ts='Ts',
+    w='w', J='J', j='j', M='M', d='d', ri='ri', i='i',
+)
+
+# Operators which change state in ways we don't track
+forgets = dict(cs=('fill',), CS=('stroke',), gs=None)
+
+# Operators whose operands are matrix entries
+matrixops = set(['cm', 'Tm'])
+
+identity = '1 0 0 1 0 0'.split()
+
+notoperators = set(['[', ']', '<<', '>>', 'true', 'false', 'null'])
+
+def fmtnumber(token, precision):
+    result = ('%.*f' % (precision, float(token))).rstrip('0').rstrip('.')
+    if result in ('-0', ''):
+        result = '0'
+    return result
+
+def operations(stream):
+    ''' Yield (operands, operator) tuples for a content stream.
+    '''
+    operands = []
+    # (the tokenizer needs whitespace after the last token)
+    for token in PdfTokens(stream + '\n'):
+        if (isinstance(token, PdfString) or token.startswith('/') or
+                token in notoperators or number_match(token)):
+            operands.append(token)
+        else:
+            yield operands, token
+            operands = []
+    if operands:
+        yield operands, None
+
+def optimize_stream(stream, precision=3):
+    ''' Return an optimised copy of a (decompressed) content stream.
+    '''
+    if 'BI' in stream and re.search(r'(^|\s)BI\s', stream):
+        return stream
+    state = {}
+    # One entry per open q: [saved state, index of q in output, whether
+    # anything has been drawn since]
+    stack = []
+    output = []
+    for operands, operator in operations(stream):
+        digits = precision
+        if operator in matrixops:
+            digits = precision + 3
+        operands = [number_match(x) and fmtnumber(x, digits) or x
+                    for x in operands]
+        if operator == 'cm' and operands == identity:
+            continue
+        elif operator == 'q':
+            stack.append([state.copy(), len(output), False])
+        elif operator == 'Q':
+            if not stack:
+                state = {}
+            else:
+                state, start, drawn = stack.pop()
+                if not drawn:
+                    # Nothing but state changes since the q
+                    del output[start:]
+                    continue
+                if stack:
+                    stack[-1][2] = True
+        elif operator in statekeys:
+            key = statekeys[operator]
+            value = operator, tuple(operands)
+            if state.get(key) == value:
+                continue
+            state[key] = value
+        elif operator == 'TD' or operator == '"':
+            # These also set the leading, or the word and character
+            # spacing, which a later TL, Tw or Tc may set back.
+            try:
+                if operator == 'TD':
+                    leading = fmtnumber(-float(operands[1]), precision)
+                    state['TL'] = 'TL', (leading,)
+                else:
+                    state['Tw'] = 'Tw', (operands[0],)
+                    state['Tc'] = 'Tc', (operands[1],)
+            except (IndexError, ValueError):
+                for key in 'TL', 'Tw', 'Tc':
+                    state.pop(key, None)
+            if stack:
+                stack[-1][2] = True
+        elif operator in forgets:
+            keys = forgets[operator]
+            if keys is None:
+                state = {}
+            else:
+                for key in keys:
+                    state.pop(key, None)
+        elif operator not in matrixops and stack:
+            stack[-1][2] = True
+        if operator is not None:
+            operands.append(operator)
+        output.append(' '.join(operands))
+    output.append('')
+    return '\n'.join(output)
+
+def contentstreams(page):
+    ''' Yield the content streams of a page (or Form XObject),
+        and of the Form XObjects it uses, recursively.
+    '''
+    visited = set()
+    pending = [page]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in visited:
+            continue
+        visited.add(id(obj))
+        if obj.Type == PdfName.Page:
+            contents = obj.Contents
+            if isinstance(contents, PdfArray):
+                for item in contents:
+                    yield item
+            elif contents is not None:
+                yield contents
+            resources = obj.inheritable.Resources
+        else:
+            yield obj
+            resources = obj.Resources
+        xobjects = resources and resources.XObject
+        for xobj in (xobjects or PdfDict()).itervalues():
+            if isinstance(xobj, PdfDict) and xobj.Subtype == PdfName.Form:
+                pending.append(xobj)
+
+def optimize(mylist, precision=3):
+    ''' Optimise a list of content stream objects in place.
+        Each object is only optimised once.
+    '''
+    for obj in mylist:
+        if obj.optimized or obj.stream is None:
+            continue
+        obj.private.optimized = True
+        if obj.Filter is not None:
+            uncompress([obj])
+            if obj.Filter is not None:
+                continue
+        obj.stream = optimize_stream(obj.stream, precision)
+
+def optimize_page(page, precision=3):
+    optimize(contentstreams(page), precision)
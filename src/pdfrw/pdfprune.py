@@ -0,0 +1,167 @@
+# A part of pdfrw (pdfrw.googlecode.com)
+# Copyright (C) 2006-2009 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Unused resource pruning.
+
+Many PDF producers give every page the same /Resources dictionary,
+listing every font, image and graphics state in the document.  When
+pages are copied into a new file, that dictionary (and everything it
+references) is copied with them, so a single page split out of a
+large document can carry hundreds of unrelated fonts and images.
+
+ResourcePruner scans the content streams of a page for the resource
+names they use, and builds a resource dictionary containing only
+those names.  Form XObjects which are kept are copied, and the
+copies have their own resources pruned the same way (the source
+forms are left alone, since other pages may need more of them);
+Form XObjects without resources of their own draw with the page's
+resources, so their names are added to the page's.  Names are
+compared with any #xx escapes decoded, so /F#31 in a stream keeps
+/F1.  The scan is conservative: any name token in a stream
+(including one inside a string or an inline image) keeps the
+resource of that name, and resources are left alone entirely if a
+stream cannot be decompressed.
+
+Scans are cached per stream object, and pruned dictionaries are
+cached per shared resource dictionary and set of names used, so
+pages which share resources and draw with the same names share a
+single pruned dictionary in the output.
+'''
+
+try:
+    set
+except NameError:
+    from sets import Set as set
+
+import re
+from pdfobjects import PdfDict, PdfArray, PdfName
+from pdfcompress import decodestream
+
+# Resource categories which map names used in content streams to
+# objects.  Anything else (e.g. /ProcSet) is copied as is.
+categories = [PdfName.Font, PdfName.XObject, PdfName.ExtGState,
+              PdfName.ColorSpace, PdfName.Pattern, PdfName.Shading,
+              PdfName.Properties]
+
+findnames = re.compile(r'/[^\x00\t\n\x0c\r ()<>\[\]{}/%]*').findall
+unescape = re.compile(r'#([0-9A-Fa-f]{2})').sub
+
+def normname(name):
+    ''' Return a name with its #xx escapes decoded.
+    '''
+    if '#' not in name:
+        return name
+    return unescape(lambda m: chr(int(m.group(1), 16)), name)
+
+class ResourcePruner(object):
+    ''' Callable which returns pruned resources for a page.
+        Keep one pruner per output file, so that pruned
+        dictionaries are shared between its pages.
+    '''
+
+    def __init__(self):
+        self.streamcache = {}   # id(stream) -> (stream, names)
+        self.prunecache = {}    # (id(resources), names) -> (resources, pruned)
+        self.forms = {}         # id(form) -> (form, pruned copy)
+
+    def streamnames(self, obj):
+        ''' Return the set of names in a stream object, or None
+            if it cannot be decompressed.
+        '''
+        cached = self.streamcache.get(id(obj))
+        if cached is not None and cached[0] is obj:
+            return cached[1]
+        names = None
+        if obj.stream is not None:
+            stream = decodestream(obj)
+            if stream is not None:
+                names = frozenset([normname(x) for x in findnames(stream)])
+        self.streamcache[id(obj)] = obj, names
+        return names
+
+    def usednames(self, streams, resources):
+        ''' Return the set of resource names used by a list of
+            streams drawn with the given resources, or None if
+            that cannot be determined.
+        '''
+        names = set()
+        pending = list(streams)
+        visited = set()
+        xobjects = resources.XObject
+        if isinstance(xobjects, PdfDict):
+            xobjects = dict([(normname(x), y) for x, y in xobjects.iteritems()])
+        while pending:
+            obj = pending.pop()
+            if id(obj) in visited:
+                continue
+            visited.add(id(obj))
+            streamnames = self.streamnames(obj)
+            if streamnames is None:
+                return None
+            names.update(streamnames)
+            if xobjects is None:
+                continue
+            for name in streamnames:
+                xobj = xobjects.get(name)
+                if (isinstance(xobj, PdfDict) and
+                        xobj.Subtype == PdfName.Form and
+                        xobj.Resources is None):
+                    pending.append(xobj)
+        return frozenset(names)
+
+    def prune(self, resources, streams):
+        ''' Return a copy of resources which only holds the
+            entries used by streams.
+        '''
+        if not isinstance(resources, PdfDict):
+            return resources
+        names = self.usednames(streams, resources)
+        if names is None:
+            return resources
+        key = id(resources), names
+        cached = self.prunecache.get(key)
+        if cached is not None and cached[0] is resources:
+            return cached[1]
+        pruned = PdfDict(resources)
+        for category in categories:
+            entries = resources.get(category)
+            if not isinstance(entries, PdfDict):
+                continue
+            kept = PdfDict()
+            for name, value in entries.iteritems():
+                if normname(name) in names:
+                    kept[name] = value
+            pruned[category] = kept or None
+        xobjects = pruned.XObject
+        if xobjects is not None:
+            for name, xobj in xobjects.items():
+                if isinstance(xobj, PdfDict) and xobj.Subtype == PdfName.Form:
+                    xobjects[name] = self.pruneform(xobj)
+        self.prunecache[key] = resources, pruned
+        return pruned
+
+    def pruneform(self, form):
+        ''' Return a copy of a Form XObject with pruned resources,
+            or the form itself if it has no resources of its own.
+            One copy is made per form, however often it is used.
+        '''
+        if form.Resources is None:
+            return form
+        cached = self.forms.get(id(form))
+        if cached is not None and cached[0] is form:
+            return cached[1]
+        copy = PdfDict(form)
+        # Cache the copy first, in case the form draws itself
+        self.forms[id(form)] = form, copy
+        copy.Resources = self.prune(form.Resources, [form])
+        return copy
+
+    def __call__(self, page):
+        contents = page.Contents
+        if contents is None:
+            contents = []
+        elif not isinstance(contents, PdfArray):
+            contents = [contents]
+        return self.prune(page.inheritable.Resources, contents)
@@ -8,11 +8,106 @@ parses the top-level container objects.  (It does not parse
 into streams.)  The object subclasses PdfDict, and the
 document pages are stored in a list in the pages attribute
 of the object.
+
+A PdfReader can instead be given a source (see pdfsource), in
+which case it only reads the cross-reference tables and trailer
+when it is created.  Indirect objects are then read the first time
+they are looked at, and pages is a PageList, which only reads the
+page tree nodes above the pages that are looked at.
+
+A PdfReader created with recover=True copes with damaged files: if
+the cross-reference tables cannot be read, or do not lead to the
+document, it rebuilds the object table by scanning the whole file
+for object headers (see recover()).
+
+By default, the structure of the file is checked with assertions.
+Two other modes may be chosen when a PdfReader is created:
+
+    - trusted=True is for files written by PdfWriter (or
+      PdfStreamWriter).  It relies on the exact layout the writer
+      uses (fixed width xref entries, 'N 0 obj' headers, correct
+      stream lengths) to skip tokens and checks, and may misread
+      files from other producers.
+    - strict=True checks the structure of everything it reads, and
+      raises pdferrors exceptions, which give the byte offset of
+      the problem (and which, unlike assertions, python -O does
+      not remove).
+
+Running this module times reading files in each mode:
+
+    python pdfreader.py [-n repeat] [-m mode] file.pdf ...
+
+A PdfReader may be shared between threads.  A reader without a
+source has read everything before its constructor returns.  A
+reader with a source builds each object privately and only then
+publishes it, so other threads never see a partly read object;
+threads which race to read the same object all get the first copy
+to be published.
 '''
 
+import re
+import threading
+from bisect import bisect_right
+
 from pdftokens import PdfTokens
-from pdfobjects import PdfDict, PdfArray, PdfName
+from pdferrors import PdfError, PdfStructureError, \
+                      PdfUnexpectedTokenError, PdfUnexpectedEOFError
+from pdfobjects import PdfDict, PdfArray, PdfName, PdfObject, PdfIndirect, \
+                       PdfLazyArray
 from pdfcompress import uncompress
+from pdfsource import BlockCache
+from log import log
+
+def resolve(value):
+    if isinstance(value, PdfIndirect):
+        value = value.real_value()
+    return value
+
+class PageList(object):
+    ''' The pages of a document read from a source.  A page is
+        found by following the /Count entries down the page tree,
+        so looking at one page only reads the nodes above it.
+    '''
+
+    def __init__(self, root):
+        self.root = root
+        self.count = int(root.Count)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for index in xrange(self.count):
+            yield self[index]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[x] for x in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        node = self.root
+        while node.Type == PdfName.Pages:
+            kids = node.Kids
+            if len(kids) == int(node.Count):
+                # Usually means every kid is a page
+                kid = resolve(list.__getitem__(kids, index))
+                if kid.Type != PdfName.Pages:
+                    return kid
+            for kid in list.__iter__(kids):
+                kid = resolve(kid)
+                if kid.Type == PdfName.Pages:
+                    count = int(kid.Count)
+                else:
+                    count = 1
+                if index < count:
+                    node = kid
+                    break
+                index -= count
+            else:
+                raise IndexError(index)
+        return node
 
 class PdfReader(PdfDict):
 
@@ -27,34 +122,120 @@ class PdfReader(PdfDict):
 
         def setobj(obj):
             # Store the new object in the dictionary
-            # once we have its value
-            record[1] = obj
+            # once we have its value (so that circular
+            # references find it).  Lazy readers don't
+            # follow references while reading, so they
+            # publish the object when it is complete.
+            if not lazy:
+                record[1] = obj
 
         def ordinary(source, setobj, obj):
             # Deal with an ordinary (non-array, non-dict) object
             setobj(obj)
             return obj
 
-        fdata, objnum, gennum = self.fdata, int(objnum), int(gennum)
-        record = self.indirect_objects[fdata, objnum, gennum]
+        objnum, gennum = int(objnum), int(gennum)
+        record = self.getrecord(objnum, gennum)
+        if record is None:
+            raise KeyError((objnum, gennum))
         if record[1] is not self.unresolved:
             return record[1]
+        lazy = self.lazy
 
         # Read the object header and validate it
-        source = PdfTokens(fdata, record[0])
-        objid = source.multiple(3)
-        assert int(objid[0]) == objnum, objid
-        assert int(objid[1]) == gennum, objid
-        assert objid[2] == 'obj', objid
+        fdata, floc = self.objectdata(record)
+        if self.trusted:
+            # PdfWriter always writes 'N 0 obj\n', so skip it
+            source = PdfTokens(fdata, fdata.index('obj', floc) + 3)
+        else:
+            source = PdfTokens(fdata, floc)
+            if lazy:
+                source.base = record[0]
+            objid = source.multiple(3)
+            if self.strict:
+                self.checkheader(source, objid, objnum, gennum)
+            else:
+                assert int(objid[0]) == objnum, objid
+                assert int(objid[1]) == gennum, objid
+                assert objid[2] == 'obj', objid
 
         # Read the object, and call special code if it starts
         # an array or dictionary
         obj = source.next()
         obj = self.special.get(obj, ordinary)(source, setobj, obj)
-        self.readstream(obj, source)
+        if self.trusted:
+            self.trustedstream(obj, source)
+        elif self.strict:
+            self.strictstream(obj, source)
+        else:
+            self.readstream(obj, source)
         obj.indirect = True
+        if lazy:
+            if self.decompress:
+                uncompress([obj])
+            # Several threads may have read the object at once;
+            # they all get the first copy to be published.
+            lock = self.publishlock
+            lock.acquire()
+            try:
+                if record[1] is self.unresolved:
+                    record[1] = obj
+                else:
+                    obj = record[1]
+            finally:
+                lock.release()
         return obj
 
+    def makeref(self, objnum, gennum):
+        ''' Return an indirect object if it has already been read,
+            or a PdfIndirect which will read it when it is needed.
+        '''
+        objnum, gennum = int(objnum), int(gennum)
+        record = self.getrecord(objnum, gennum)
+        if record is not None and record[1] is not self.unresolved:
+            return record[1]
+        ref = PdfIndirect((objnum, gennum))
+        ref._loader = self.loadref
+        return ref
+
+    def loadref(self, ref):
+        return self.readindirect(*ref)
+
+    def getrecord(self, objnum, gennum):
+        ''' Return the [offset, object] record of an indirect
+            object, or None.  Records for objects in an xref index
+            are made as they are needed, and also hold the length.
+        '''
+        key = self.fdata, objnum, gennum
+        record = self.indirect_objects.get(key)
+        if record is None and self.index is not None:
+            entry = self.index.lookup(objnum)
+            if entry is not None and entry[2] == gennum:
+                record = [entry[0], self.unresolved, entry[1]]
+                record = self.indirect_objects.setdefault(key, record)
+        return record
+
+    def objectdata(self, record):
+        ''' Return (data, start) for tokenizing the object in a
+            record.  When reading from a source, data is just the
+            object, which ends at the next object or xref table.
+        '''
+        offset = record[0]
+        if not self.lazy:
+            return self.fdata, offset
+        if len(record) > 2:
+            return self.source.read(offset, record[2]), 0
+        boundaries = self.boundaries
+        if boundaries is None:
+            boundaries = [x[0] for x in self.indirect_objects.itervalues()]
+            boundaries.extend(self.xrefoffsets)
+            boundaries.append(self.source.size)
+            boundaries.sort()
+            self.private.boundaries = boundaries
+        index = bisect_right(boundaries, offset)
+        end = boundaries[min(index, len(boundaries) - 1)]
+        return self.source.read(offset, end - offset), 0
+
     def readstream(obj, source):
         ''' Read optional stream following a dictionary
             object.
@@ -98,6 +279,7 @@ class PdfReader(PdfDict):
         special = self.special
         result = PdfArray()
         setobj(result)
+        lazy = False
 
         for value in source:
             if value == ']':
@@ -106,8 +288,12 @@ class PdfReader(PdfDict):
                 value = special[value](source)
             elif value == 'R':
                 generation = result.pop()
-                value = self.readindirect(result.pop(), generation)
+                value = self.reference(result.pop(), generation)
+                if isinstance(value, PdfIndirect):
+                    lazy = True
             result.append(value)
+        if lazy:
+            result.__class__ = PdfLazyArray
         return result
 
     def readdict(self, source, setobj=lambda x:None, original=None):
@@ -126,24 +312,249 @@ class PdfReader(PdfDict):
             else:
                 tok = source.next()
                 if value.isdigit() and tok.isdigit():
-                    assert source.next() == 'R'
-                    value = self.readindirect(value, tok)
+                    r = source.next()
+                    assert r == 'R', r
+                    value = self.reference(value, tok)
                     tok = source.next()
             result[key] = value
 
         return result
 
-    def readxref(fdata):
+    def trusteddict(self, source, setobj=lambda x:None, original=None):
+        ''' readdict for files written by PdfWriter, without the
+            checks.  (readarray makes none, so trusted mode uses it
+            as it is.)
+        '''
+        special = self.special
+        next = source.next
+        result = PdfDict()
+        setobj(result)
+
+        tok = next()
+        while tok != '>>':
+            key = tok
+            value = next()
+            if value in special:
+                value = special[value](source)
+                tok = next()
+            else:
+                tok = next()
+                if value.isdigit() and tok.isdigit():
+                    next()      # 'R'
+                    value = self.reference(value, tok)
+                    tok = next()
+            result[key] = value
+
+        return result
+
+    def trustedstream(self, obj, source):
+        ''' readstream for files written by PdfWriter, which
+            always writes 'stream\n' and a correct /Length.
+        '''
+        if source.next() == 'stream':
+            fdata = source.fdata
+            startstream = fdata.rindex('stream', 0, source.floc) + 7
+            obj._stream = fdata[startstream:startstream + int(obj.Length)]
+
+    # Strict mode.  These replace the methods above, and raise
+    # pdferrors exceptions (which python -O does not remove)
+    # instead of making assertions.
+
+    badtokens = set('] >> { } R obj endobj stream endstream xref trailer '
+                    'startxref'.split())
+
+    def fail(self, source, cls, *args):
+        raise source.error(cls, *args)
+
+    def strictnext(self, source):
+        try:
+            return source.next()
+        except StopIteration:
+            self.fail(source, PdfUnexpectedEOFError)
+
+    def expect(self, source, expected, msg):
+        tok = self.strictnext(source)
+        if tok != expected:
+            self.fail(source, PdfStructureError, msg, tok)
+
+    def isint(value):
+        return isinstance(value, str) and value.isdigit()
+    isint = staticmethod(isint)
+
+    def checkheader(self, source, objid, objnum, gennum):
+        if (len(objid) != 3 or objid[2] != 'obj' or
+                objid[:2] != [str(objnum), str(gennum)]):
+            self.fail(source, PdfStructureError,
+                      'Expected object header %s %s obj' % (objnum, gennum),
+                      objid)
+
+    def strictarray(self, source, setobj=lambda x:None, original=None):
+        special = self.special
+        badtokens = self.badtokens
+        isint = self.isint
+        result = PdfArray()
+        setobj(result)
+        lazy = False
+
+        while 1:
+            value = self.strictnext(source)
+            if value == ']':
+                break
+            if value in special:
+                value = special[value](source)
+            elif value == 'R':
+                if len(result) < 2 or not (isint(result[-2]) and
+                                           isint(result[-1])):
+                    self.fail(source, PdfUnexpectedTokenError, value)
+                generation = result.pop()
+                value = self.reference(result.pop(), generation)
+                if isinstance(value, PdfIndirect):
+                    lazy = True
+            elif value in badtokens:
+                self.fail(source, PdfUnexpectedTokenError, value)
+            result.append(value)
+        if lazy:
+            result.__class__ = PdfLazyArray
+        return result
+
+    def strictdict(self, source, setobj=lambda x:None, original=None):
+        special = self.special
+        badtokens = self.badtokens
+        next = self.strictnext
+        result = PdfDict()
+        setobj(result)
+
+        tok = next(source)
+        while tok != '>>':
+            if not tok.startswith('/'):
+                self.fail(source, PdfUnexpectedTokenError, tok)
+            key = tok
+            value = next(source)
+            if value in special:
+                value = special[value](source)
+                tok = next(source)
+            elif value in badtokens:
+                self.fail(source, PdfUnexpectedTokenError, value)
+            else:
+                tok = next(source)
+                if value.isdigit() and tok.isdigit():
+                    self.expect(source, 'R', 'Expected R after %s %s' %
+                                             (value, tok))
+                    value = self.reference(value, tok)
+                    tok = next(source)
+            result[key] = value
+
+        return result
+
+    def strictstream(self, obj, source):
+        tok = self.strictnext(source)
+        if tok == 'endobj':
+            return
+        if tok != 'stream' or not isinstance(obj, PdfDict):
+            self.fail(source, PdfStructureError,
+                      'Expected endobj or stream', tok)
+        fdata = source.fdata
+        floc = fdata.rindex(tok, 0, source.floc) + len(tok)
+        eol = fdata[floc:floc+2]
+        if eol.startswith('\n'):
+            startstream = floc + 1
+        elif eol == '\r\n':
+            startstream = floc + 2
+        else:
+            self.fail(source, PdfStructureError,
+                      'Expected end of line after', 'stream')
+        length = obj.Length
+        if not self.isint(length):
+            self.fail(source, PdfStructureError, 'Bad stream /Length', length)
+        endstream = startstream + int(length)
+        obj._stream = fdata[startstream:endstream]
+        end = PdfTokens(fdata, endstream)
+        end.base = source.base
+        try:
+            endit = [self.strictnext(end), self.strictnext(end)]
+        except PdfError:
+            endit = None
+        if endit != ['endstream', 'endobj']:
+            end.setstart(endstream)
+            self.fail(end, PdfStructureError,
+                      'Stream does not match /Length', length)
+
+    def findxref(fdata):
         startloc = fdata.rindex('startxref')
         xrefinfo = list(PdfTokens(fdata, startloc, False))
         assert len(xrefinfo) == 3, xrefinfo
         assert xrefinfo[0] == 'startxref', xrefinfo[0]
         assert xrefinfo[1].isdigit(), xrefinfo[1]
         assert xrefinfo[2].rstrip() == '%%EOF', repr(xrefinfo[2])
-        return startloc, PdfTokens(fdata, int(xrefinfo[1]))
+        return startloc, int(xrefinfo[1])
+    findxref = staticmethod(findxref)
+
+    def strictfindxref(self, fdata, base=0):
+        startloc = fdata.rfind('startxref')
+        source = PdfTokens(fdata, max(startloc, 0), False)
+        source.base = base
+        if startloc < 0:
+            self.fail(source, PdfStructureError, 'Cannot find', 'startxref')
+        xrefinfo = list(source)
+        if (len(xrefinfo) != 3 or not xrefinfo[1].isdigit() or
+                xrefinfo[2].rstrip() != '%%EOF'):
+            self.fail(source, PdfStructureError, 'Bad file trailer', xrefinfo)
+        offset = int(xrefinfo[1])
+        if offset >= base + len(fdata):
+            self.fail(source, PdfStructureError,
+                      'startxref beyond end of file', offset)
+        return startloc, offset
+
+    def readtrailer(self, source):
+        ''' Read the trailer dictionary that source is positioned at.
+        '''
+        if self.strict:
+            self.expect(source, '<<', 'Expected trailer dictionary')
+            self.update(self.strictdict(source))
+            self.expect(source, 'startxref', 'Expected after trailer')
+            if self.Root is None:
+                self.fail(source, PdfStructureError, 'Trailer has no', '/Root')
+        elif self.trusted:
+            source.next()       # '<<'
+            self.update(self.trusteddict(source))
+            source.next()       # 'startxref'
+        else:
+            tok = source.next()
+            assert tok == '<<', tok
+            self.update(self.readdict(source))
+            # (a linearized file's trailer is at the start of the file)
+            tok = source.next()
+            assert tok == 'startxref', tok
+
+    def readxref(fdata):
+        startloc, offset = PdfReader.findxref(fdata)
+        return startloc, PdfTokens(fdata, offset)
     readxref = staticmethod(readxref)
 
+    def xreftokens(self, offset):
+        ''' Return tokens for the xref table (or trailer) at
+            offset.  When reading from a source, the table and its
+            trailer are read into a buffer of their own.
+        '''
+        self.xrefoffsets.append(offset)
+        if not self.lazy:
+            return PdfTokens(self.fdata, offset)
+        source = self.source
+        data = source.read(offset, 16384)
+        while data.find('startxref') < 0:
+            more = source.read(offset + len(data), len(data))
+            if not more:
+                break
+            data += more
+        source = PdfTokens(data)
+        source.base = offset
+        return source
+
     def parsexref(self, source):
+        if self.trusted:
+            return self.trustedxref(source)
+        if self.strict:
+            return self.strictxref(source)
         tok = source.next()
         assert tok == 'xref', tok
         while 1:
@@ -159,6 +570,84 @@ class PdfReader(PdfDict):
                     objval = [offset, self.unresolved]
                     self.indirect_objects.setdefault(objid, objval)
 
+    def trustedxref(self, source):
+        ''' parsexref for files written by PdfWriter, whose xref
+            entries are always exactly 20 bytes long.
+        '''
+        fdata = source.fdata
+        key = self.fdata
+        unresolved = self.unresolved
+        indirect_objects = self.indirect_objects
+        source.next()
+        while 1:
+            tok = source.next()
+            if tok == 'trailer':
+                break
+            startobj = int(tok)
+            count = int(source.next())
+            start = source.floc
+            for objnum in xrange(startobj, startobj + count):
+                if fdata[start + 17] == 'n':
+                    objid = key, objnum, int(fdata[start + 11:start + 16])
+                    objval = [int(fdata[start:start + 10]), unresolved]
+                    indirect_objects.setdefault(objid, objval)
+                start += 20
+            source.setstart(start)
+
+    def strictxref(self, source):
+        isint = self.isint
+        next = self.strictnext
+        if self.lazy:
+            size = self.source.size
+        else:
+            size = len(self.fdata)
+        self.expect(source, 'xref', 'Expected')
+        while 1:
+            tok = next(source)
+            if tok == 'trailer':
+                break
+            count = next(source)
+            if not (isint(tok) and isint(count)):
+                self.fail(source, PdfStructureError,
+                          'Bad xref subsection header', (tok, count))
+            startobj = int(tok)
+            for objnum in range(startobj, startobj + int(count)):
+                entry = [next(source), next(source), next(source)]
+                offset, generation, kind = entry
+                if not (isint(offset) and isint(generation) and
+                        kind in ('n', 'f')):
+                    self.fail(source, PdfStructureError, 'Bad xref entry',
+                              entry)
+                offset, generation = int(offset), int(generation)
+                if kind == 'n':
+                    if offset >= size:
+                        self.fail(source, PdfStructureError,
+                                  'Object offset beyond end of file', entry)
+                    objid = self.fdata, objnum, generation
+                    objval = [offset, self.unresolved]
+                    self.indirect_objects.setdefault(objid, objval)
+
+    prevsearch = re.compile(r'/Prev\s+(\d+)').search
+
+    def readprevxrefs(self, source):
+        ''' Follow the /Prev chain of cross-reference tables (as
+            written by incremental updates and by linearization)
+            from the trailer that source is positioned at.  Entries
+            that have already been read take precedence.
+        '''
+        visited = set()
+        while 1:
+            fdata, floc = source.fdata, source.floc
+            match = self.prevsearch(fdata, floc, fdata.find('startxref', floc))
+            if match is None:
+                return
+            offset = int(match.group(1))
+            if offset in visited:
+                return
+            visited.add(offset)
+            source = self.xreftokens(offset)
+            self.parsexref(source)
+
     pagename = PdfName.Page
     pagesname = PdfName.Pages
 
@@ -173,7 +662,31 @@ class PdfReader(PdfDict):
             result.extend(self.readpages(node))
         return result
 
-    def __init__(self, fname=None, fdata=None, decompress=True):
+    def __init__(self, fname=None, fdata=None, decompress=True, source=None,
+                 index=None, recover=False, trusted=False, strict=False):
+
+        assert not (trusted and strict)
+        self.private.lazy = source is not None
+        self.private.decompress = decompress
+        self.private.trusted = trusted
+        self.private.strict = strict
+        self.private.indirect_objects = {}
+        if strict:
+            self.private.special = {'<<': self.strictdict,
+                                    '[': self.strictarray}
+        elif trusted:
+            self.private.special = {'<<': self.trusteddict,
+                                    '[': self.readarray}
+        else:
+            self.private.special = {'<<': self.readdict, '[': self.readarray}
+        self.private.xrefoffsets = []
+        self.private.index = index
+        if recover and source is not None:
+            raise ValueError('Recovery needs the whole file, not a source')
+        if source is not None:
+            self.readsource(source)
+            return
+        assert index is None, 'An xref index needs a source'
 
         if fname is not None:
             assert fdata is None
@@ -188,16 +701,25 @@ class PdfReader(PdfDict):
         assert fdata is not None
         fdata = fdata.rstrip('\00')
         self.private.fdata = fdata
+        self.private.reference = self.readindirect
 
-        self.private.indirect_objects = {}
-        self.private.special = {'<<': self.readdict, '[': self.readarray}
-
-        startloc, source = self.readxref(fdata)
-        self.parsexref(source)
-        assert source.next() == '<<'
-        self.update(self.readdict(source))
-        assert source.next() == 'startxref' and source.floc > startloc
-        self.private.pages = self.readpages(self.Root.Pages)
+        try:
+            if strict:
+                startloc, offset = self.strictfindxref(fdata)
+            else:
+                startloc, offset = self.findxref(fdata)
+            source = self.xreftokens(offset)
+            self.parsexref(source)
+            self.private.traileroffset = source.floc
+            self.readprevxrefs(source)
+            self.readtrailer(source)
+            self.private.pages = self.readpages(self.Root.Pages)
+        except Exception, e:
+            if not recover:
+                raise
+            log.warning('Rebuilding cross-reference table (%s: %s)',
+                        e.__class__.__name__, e)
+            self.recover()
         if decompress:
             self.uncompress()
 
@@ -205,9 +727,163 @@ class PdfReader(PdfDict):
         self.private.numPages = len(self.pages)
 
 
+    def readsource(self, source):
+        ''' Read the xref tables and trailer from a source, leaving
+            everything else to be read as it is needed.
+        '''
+        if getattr(source, 'cache', True) and not isinstance(source, BlockCache):
+            source = BlockCache(source)
+        self.private.source = source
+        self.private.publishlock = threading.Lock()
+        # Objects are keyed on the source rather than the file data
+        self.private.fdata = source
+        self.private.reference = self.makeref
+        self.private.boundaries = None
+
+        index = self.index
+        if index is not None and index.size != source.size:
+            # Built for another file, or the file has changed since
+            log.warning('Ignoring xref index built for a %d byte file '
+                        '(this one is %d bytes)', index.size, source.size)
+            index = self.private.index = None
+        if index is not None:
+            # The index replaces the xref tables
+            self.private.traileroffset = index.traileroffset
+            source = self.xreftokens(index.traileroffset)
+        else:
+            tailsize = min(source.size, 1024)
+            tail = source.read(source.size - tailsize, tailsize).rstrip('\00')
+            if self.strict:
+                startloc, offset = self.strictfindxref(tail,
+                                                       source.size - tailsize)
+            else:
+                startloc, offset = self.findxref(tail)
+            source = self.xreftokens(offset)
+            self.parsexref(source)
+            self.private.traileroffset = offset + source.floc
+            self.readprevxrefs(source)
+        self.readtrailer(source)
+        self.private.pages = PageList(self.Root.Pages)
+        self.private.numPages = len(self.pages)
+
+    # One compiled pass finds every 'obj' keyword; objheader then
+    # checks the few bytes before each one for an 'N G obj' header.
+    findobj = re.compile(r'obj(?![A-Za-z0-9])').finditer
+    objheader = re.compile(r'(?<![0-9])(\d+)[\x00\t\n\x0c\r ]+(\d+)'
+                           r'[\x00\t\n\x0c\r ]+obj$').search
+    findroot = re.compile(r'/Root[\x00\t\n\x0c\r ]*(\d+)'
+                          r'[\x00\t\n\x0c\r ]+(\d+)[\x00\t\n\x0c\r ]+R').finditer
+    findcatalog = re.compile(r'/Type[\x00\t\n\x0c\r ]*/Catalog\b').finditer
+
+    def scanobjects(self):
+        ''' Find every object header in the file, and return a
+            dict of objnum: (offset, gennum).  Later definitions
+            replace earlier ones, as in an incremental update.
+        '''
+        fdata = self.fdata
+        objheader = self.objheader
+        whitespace = '\x00\t\n\x0c\r '
+        found = {}
+        for match in self.findobj(fdata):
+            end = match.end()
+            if fdata[end-4:end-3] not in whitespace:
+                continue    # e.g. endobj
+            header = objheader(fdata, max(end - 40, 0), end)
+            if header is not None:
+                found[int(header.group(1))] = (header.start(),
+                                                int(header.group(2)))
+        return found
+
+    def recover(self):
+        ''' Rebuild the object table of a damaged file by scanning
+            it for object headers, find the catalog, and read the
+            document from there.  Objects which still cannot be
+            read are replaced with null.
+        '''
+        fdata = self.fdata
+        unresolved = self.unresolved
+        self.clear()
+        found = self.scanobjects()
+        self.private.indirect_objects = dict(
+            [((fdata, objnum, gennum), [offset, unresolved])
+                for objnum, (offset, gennum) in found.iteritems()])
+        self.private.reference = self.readrecovering
+
+        # Use the last /Root that names a real object, or else
+        # the last object that looks like a catalog.
+        root = None
+        for match in self.findroot(fdata):
+            objnum, gennum = int(match.group(1)), int(match.group(2))
+            if found.get(objnum, (0, None))[1] == gennum:
+                root = objnum, gennum
+        if root is None:
+            offsets = [(offset, objnum) for objnum, (offset, gennum)
+                            in found.iteritems()]
+            offsets.sort()
+            for match in self.findcatalog(fdata):
+                index = bisect_right(offsets, (match.start(), ())) - 1
+                if index >= 0:
+                    objnum = offsets[index][1]
+                    root = objnum, found[objnum][1]
+        assert root is not None, 'Cannot find the document catalog'
+        self.Root = self.readrecovering(*root)
+        self.private.pages = self.recoverpages(self.Root.Pages, set())
+
+    def recoverpages(self, node, visited):
+        # Like readpages, but skips broken parts of the page tree
+        if not isinstance(node, PdfDict) or id(node) in visited:
+            return []
+        visited.add(id(node))
+        if node.Type == self.pagename:
+            return [node]
+        result = []
+        for node in node.Kids or []:
+            result.extend(self.recoverpages(node, visited))
+        return result
+
+    def readrecovering(self, objnum, gennum):
+        try:
+            return self.readindirect(objnum, gennum)
+        except Exception, e:
+            log.warning('Cannot read object %s %s (%s: %s)', objnum, gennum,
+                        e.__class__.__name__, e)
+            return PdfObject('null')
+
     # For compatibility with pyPdf
     def getPage(self, pagenum):
         return self.pages[pagenum]
 
     def uncompress(self):
         uncompress([x[1] for x in self.indirect_objects.itervalues()])
+
+def main(args=None):
+    import time
+    from optparse import OptionParser
+    parser = OptionParser(usage='%prog [options] file.pdf ...')
+    parser.add_option('-n', '--repeat', type='int', default=3,
+                      help='number of reads of each file (default: 3)')
+    parser.add_option('-m', '--mode', action='append',
+                      choices=['default', 'trusted', 'strict'],
+                      help='mode to time (default: all of them)')
+    options, args = parser.parse_args(args)
+    if not args:
+        parser.error('need at least one file')
+    modes = options.mode or ['default', 'trusted', 'strict']
+    for fname in args:
+        f = open(fname, 'rb')
+        fdata = f.read()
+        f.close()
+        for mode in modes:
+            kwargs = {}
+            if mode != 'default':
+                kwargs[mode] = True
+            best = None
+            for i in range(options.repeat):
+                start = time.time()
+                PdfReader(fdata=fdata, decompress=False, **kwargs)
+                elapsed = time.time() - start
+                best = min(best or elapsed, elapsed)
+            print '%s: %s %.3fs' % (fname, mode, best)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,671 @@
+#!/usr/bin/env python
+
+# A part of pdfrw (pdfrw.googlecode.com)
+# Copyright (C) 2006-2009 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+A full-text index of a collection of PDF files.
+
+The text of each page is extracted with pdftext by a pool of worker
+processes, and split into lower cased words.  The index records, for
+each word, every document and page it is on, and its positions on
+the page, so that searches can look for words on the same page or
+for phrases.
+
+An index is a directory.  Each add() writes the documents it indexes
+to new segments, so adding files never rewrites what is already in
+the index, and files whose size and modification time have not
+changed since they were indexed are not opened at all.  A file that
+has changed is indexed again, and its old entry is marked as deleted.
+Segments are merged, a few at a time, as they accumulate (and
+deleted entries are dropped when they are), so the number of
+segments a search looks in stays small.
+
+Each segment is three files:
+
+    - NAME.docs lists its documents: their numbers, sizes,
+      modification times, page counts and paths
+    - NAME.terms holds the sorted words of the segment, with fixed
+      size records locating the postings of each word, and is
+      searched in place (with a binary search of a memory map)
+    - NAME.post holds the postings.  Each word's postings start with
+      the numbers of its documents (as differences) and the lengths
+      of their entries, so that a search can find the documents
+      with a word without decoding where it is on their pages.
+      Each entry is the page numbers and positions of the word
+      in one document, as differences.  All numbers are varints.
+
+The file named 'index' lists the live segments and the numbers of
+deleted documents, and is replaced (by a rename) whenever they
+change, so an interrupted add() or merge() leaves the index as it
+was before the last segment it was writing.
+
+Usage:
+    python pdfsearch.py [-j processes] index add file.pdf directory ...
+    python pdfsearch.py index remove file.pdf ...
+    python pdfsearch.py [--phrase] index search word ...
+    python pdfsearch.py index merge
+
+or from Python:
+    index = SearchIndex('index')
+    index.add(['a.pdf', 'b.pdf'])
+    for path, pagenum in index.search(u'copy-on-write clone'):
+        print path, pagenum
+'''
+
+try:
+    set
+except NameError:
+    from sets import Set as set
+
+import heapq
+import mmap
+import multiprocessing
+import os
+import re
+import struct
+from array import array
+from itertools import imap, groupby
+
+from pdfreader import PdfReader
+from pdftext import pagetext
+from log import log
+
+findwords = re.compile(r'\w+', re.UNICODE).findall
+
+def words(text):
+    ''' Return the (unicode) words of some text, lower cased.
+    '''
+    if not isinstance(text, unicode):
+        text = text.decode('utf-8')
+    return findwords(text.lower())
+
+def varints(numbers):
+    ''' Encode a list of non-negative integers.
+    '''
+    if not numbers or max(numbers) < 128:
+        return array('B', numbers).tostring()
+    result = []
+    append = result.append
+    for n in numbers:
+        while n > 127:
+            append(n & 127 | 128)
+            n >>= 7
+        append(n)
+    return array('B', result).tostring()
+
+def unvarints(data):
+    ''' Decode a string of varints.
+    '''
+    if not data or max(data) < '\x80':
+        return array('B', data).tolist()
+    result = []
+    append = result.append
+    n = shift = 0
+    for byte in array('B', data):
+        if byte & 128:
+            n |= (byte & 127) << shift
+            shift += 7
+        else:
+            append(n | byte << shift)
+            n = shift = 0
+    return result
+
+def pagepositions(entry):
+    ''' Decode the entry of one word in one document into a dict
+        of (0 based) page number -> list of positions.
+    '''
+    numbers = unvarints(entry)
+    result = {}
+    page = -1
+    i = 1
+    for count in range(numbers[0]):
+        page += numbers[i] + 1
+        npos = numbers[i + 1]
+        positions = numbers[i + 2:i + 2 + npos]
+        for j in range(1, npos):
+            positions[j] += positions[j - 1]
+        result[page] = positions
+        i += 2 + npos
+    return result
+
+def extract(path):
+    ''' Worker function: index one file.  Returns (path, size,
+        mtime, pages, entries, error), where entries maps each word
+        (as UTF-8) to its encoded entry.  size and mtime are None
+        if the file cannot be found.
+    '''
+    try:
+        st = os.stat(path)
+    except OSError, s:
+        return path, None, None, 0, {}, '%s: %s' % (type(s).__name__, s)
+    found = {}      # word -> [page, positions, page, positions ...]
+    npages = 0
+    try:
+        doc = PdfReader(path, decompress=False)
+        for page, obj in enumerate(doc.pages):
+            npages += 1
+            onpage = {}
+            for position, word in enumerate(findwords(pagetext(obj).lower())):
+                positions = onpage.get(word)
+                if positions is None:
+                    onpage[word] = [position]
+                else:
+                    positions.append(position)
+            for word, positions in onpage.iteritems():
+                found.setdefault(word, []).extend((page, positions))
+    except Exception, s:
+        return path, st.st_size, st.st_mtime, 0, {}, '%s: %s' % (
+                type(s).__name__, s)
+    entries = {}
+    for word, pages in found.iteritems():
+        numbers = [len(pages) // 2]
+        lastpage = -1
+        for i in range(0, len(pages), 2):
+            page, positions = pages[i:i + 2]
+            numbers.append(page - lastpage - 1)
+            numbers.append(len(positions))
+            last = 0
+            for position in positions:
+                numbers.append(position - last)
+                last = position
+            lastpage = page
+        entries[word.encode('utf-8')] = varints(numbers)
+    return path, st.st_size, st.st_mtime, npages, entries, None
+
+def mapfile(fname):
+    f = open(fname, 'rb')
+    try:
+        if not os.fstat(f.fileno()).st_size:
+            return ''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        f.close()
+
+class Segment(object):
+    ''' One segment of an index.  docs is a list of
+        (docnum, size, mtime, pages, path).
+    '''
+
+    magic = 'PDFRWT01'
+    header = struct.Struct('<8sI')      # magic, number of words
+    # word offset, word length, postings offset, length of the
+    # document list, length of the postings, number of documents
+    record = struct.Struct('<IIqIII')
+
+    def __init__(self, dirname, name):
+        self.name = name
+        base = os.path.join(dirname, name)
+        self.docs = readdocs(base + '.docs')
+        self.terms = terms = mapfile(base + '.terms')
+        magic, self.count = self.header.unpack_from(terms, 0)
+        if magic != self.magic:
+            raise ValueError('%s is not an index segment' % name)
+        self.textstart = self.header.size + self.count * self.record.size
+        self.postings = mapfile(base + '.post')
+
+    def close(self):
+        for data in self.terms, self.postings:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+    def getrecord(self, index):
+        ''' Return (word, record) for the index'th word.
+        '''
+        record = self.record.unpack_from(self.terms,
+                        self.header.size + index * self.record.size)
+        start = self.textstart + record[0]
+        return self.terms[start:start + record[1]], record
+
+    def find(self, word):
+        ''' Return the record of a (UTF-8) word, or None.
+        '''
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.getrecord(mid)[0] < word:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count:
+            found, record = self.getrecord(lo)
+            if found == word:
+                return record
+        return None
+
+    def iterterms(self):
+        for index in xrange(self.count):
+            yield self.getrecord(index)
+
+    def entries(self, record):
+        ''' Return a list of (docnum, start, end) locating the
+            entry of each document in a word's postings.
+        '''
+        offset, listlength = record[2], record[3]
+        numbers = unvarints(self.postings[offset:offset + listlength])
+        result = []
+        docnum = 0
+        start = offset + listlength
+        for i in xrange(0, len(numbers), 2):
+            docnum += numbers[i]
+            end = start + numbers[i + 1]
+            result.append((docnum, start, end))
+            start = end
+        return result
+
+def readdocs(fname):
+    docs = []
+    f = open(fname, 'rb')
+    try:
+        for line in f:
+            docnum, size, mtime, pages, path = line.rstrip('\n').split('\t', 4)
+            docs.append((int(docnum), int(size), float(mtime), int(pages),
+                         path.decode('string_escape')))
+    finally:
+        f.close()
+    return docs
+
+def writesegment(dirname, name, docs, terms):
+    ''' Write a segment.  terms is a sequence of (word, docnums,
+        entries), sorted by word.
+    '''
+    base = os.path.join(dirname, name)
+    records = []
+    text = []
+    textlength = 0
+    offset = 0
+    f = open(base + '.post', 'wb')
+    try:
+        for word, docnums, entries in terms:
+            numbers = []
+            last = 0
+            for docnum, entry in zip(docnums, entries):
+                numbers.append(docnum - last)
+                numbers.append(len(entry))
+                last = docnum
+            doclist = varints(numbers)
+            entries = ''.join(entries)
+            f.write(doclist)
+            f.write(entries)
+            length = len(doclist) + len(entries)
+            records.append(Segment.record.pack(textlength, len(word), offset,
+                                len(doclist), length, len(docnums)))
+            text.append(word)
+            textlength += len(word)
+            offset += length
+    finally:
+        f.close()
+    f = open(base + '.terms', 'wb')
+    try:
+        f.write(Segment.header.pack(Segment.magic, len(records)))
+        f.write(''.join(records))
+        f.write(''.join(text))
+    finally:
+        f.close()
+    f = open(base + '.docs', 'wb')
+    try:
+        for docnum, size, mtime, pages, path in docs:
+            f.write('%d\t%d\t%r\t%d\t%s\n' % (docnum, size, mtime, pages,
+                                             path.encode('string_escape')))
+    finally:
+        f.close()
+
+def mergeterms(segments, deleted):
+    ''' Yield (word, docnums, entries) for the words of several
+        segments (in document number order), leaving out deleted
+        documents.
+    '''
+    iterators = [imap(lambda x, i=i: (x[0], i, x[1]), segment.iterterms())
+                 for i, segment in enumerate(segments)]
+    for word, group in groupby(heapq.merge(*iterators), lambda x: x[0]):
+        docnums = []
+        entries = []
+        for word, i, record in group:
+            postings = segments[i].postings
+            for docnum, start, end in segments[i].entries(record):
+                if docnum not in deleted:
+                    docnums.append(docnum)
+                    entries.append(postings[start:end])
+        if docnums:
+            yield word, docnums, entries
+
+class SearchIndex(object):
+    ''' A full-text index, stored in a directory (which is
+        created if need be).
+    '''
+
+    magic = 'PDFRWS01'
+    segmentdocs = 1000      # documents per segment written by add()
+    mergefactor = 8         # segments of a size merged into one
+
+    def __init__(self, dirname):
+        self.dirname = dirname
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        self.segments = []
+        self.deleted = set()
+        self.nextdoc = 0
+        self.nextsegment = 0
+        fname = os.path.join(dirname, 'index')
+        if os.path.exists(fname):
+            self.readmanifest(fname)
+        self.documents = {}     # docnum -> (path, size, mtime, pages)
+        self.paths = {}         # path -> docnum
+        for segment in self.segments:
+            self.adddocs(segment)
+
+    def readmanifest(self, fname):
+        f = open(fname, 'rb')
+        try:
+            lines = f.read().split('\n')
+        finally:
+            f.close()
+        if lines[0] != self.magic:
+            raise ValueError('%s is not a search index' % self.dirname)
+        for line in lines[1:]:
+            if not line:
+                continue
+            key, value = line.split(' ', 1)
+            if key == 'next':
+                self.nextdoc, self.nextsegment = [int(x) for x in value.split()]
+            elif key == 'segment':
+                self.segments.append(Segment(self.dirname, value))
+            elif key == 'deleted':
+                self.deleted.update([int(x) for x in value.split()])
+
+    def writemanifest(self):
+        lines = [self.magic, 'next %d %d' % (self.nextdoc, self.nextsegment)]
+        lines.extend(['segment ' + x.name for x in self.segments])
+        deleted = list(self.deleted)
+        deleted.sort()
+        for i in range(0, len(deleted), 20):
+            lines.append('deleted ' + ' '.join([str(x) for x in deleted[i:i+20]]))
+        fname = os.path.join(self.dirname, 'index')
+        f = open(fname + '.new', 'wb')
+        try:
+            f.write('\n'.join(lines) + '\n')
+        finally:
+            f.close()
+        if os.name == 'nt' and os.path.exists(fname):
+            os.remove(fname)
+        os.rename(fname + '.new', fname)
+
+    def adddocs(self, segment):
+        documents = self.documents
+        paths = self.paths
+        deleted = self.deleted
+        for docnum, size, mtime, pages, path in segment.docs:
+            if docnum not in deleted:
+                documents[docnum] = path, size, mtime, pages
+                paths[path] = docnum
+
+    def newsegment(self):
+        name = 'seg%06d' % self.nextsegment
+        self.nextsegment += 1
+        return name
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+
+    def changed(self, path):
+        ''' Return True if a file is not in the index, or has
+            changed (or gone) since it was indexed.
+        '''
+        docnum = self.paths.get(path)
+        if docnum is None:
+            return True
+        try:
+            st = os.stat(path)
+        except OSError:
+            return True
+        path, size, mtime, pages = self.documents[docnum]
+        return size != st.st_size or mtime != st.st_mtime
+
+    def add(self, paths, processes=None):
+        ''' Index the files in paths which are new or have changed.
+            processes is the size of the worker pool (default: one
+            per CPU); processes=1 does all the work in this process.
+            Files which cannot be found are removed from the index.
+            Returns the number of files indexed.
+        '''
+        todo = []
+        seen = set()
+        for path in paths:
+            path = os.path.abspath(path)
+            if path not in seen and self.changed(path):
+                todo.append(path)
+            seen.add(path)
+        if processes == 1 or len(todo) < 2:
+            pool = None
+            results = imap(extract, todo)
+        else:
+            pool = multiprocessing.Pool(processes)
+            results = pool.imap_unordered(extract, todo, 4)
+        docs = []
+        terms = {}      # word -> (docnums, entries)
+        gone = []
+        try:
+            for path, size, mtime, pages, entries, error in results:
+                if error is not None:
+                    log.warning('Cannot index %s (%s)', path, error)
+                if size is None:
+                    gone.append(path)
+                    continue
+                docnum = self.nextdoc
+                self.nextdoc += 1
+                docs.append((docnum, size, mtime, pages, path))
+                for word, entry in entries.iteritems():
+                    found = terms.get(word)
+                    if found is None:
+                        found = terms[word] = [], []
+                    found[0].append(docnum)
+                    found[1].append(entry)
+                if len(docs) >= self.segmentdocs:
+                    self.flush(docs, terms)
+                    docs = []
+                    terms = {}
+            if docs:
+                self.flush(docs, terms)
+        finally:
+            if pool is not None:
+                pool.terminate()
+        self.remove(gone)
+        return len(todo) - len(gone)
+
+    def flush(self, docs, terms):
+        ''' Write the documents indexed by add() to a new segment.
+        '''
+        words = terms.keys()
+        words.sort()
+        name = self.newsegment()
+        writesegment(self.dirname, name, docs,
+                     [(x,) + terms[x] for x in words])
+        segment = Segment(self.dirname, name)
+        # Documents indexed again replace their old entries
+        for docnum, size, mtime, pages, path in docs:
+            old = self.paths.get(path)
+            if old is not None:
+                self.deleted.add(old)
+                del self.documents[old]
+        self.segments.append(segment)
+        self.adddocs(segment)
+        self.writemanifest()
+        self.automerge()
+
+    def level(self, segment):
+        level = 0
+        size = self.segmentdocs * self.mergefactor
+        while len(segment.docs) >= size:
+            level += 1
+            size *= self.mergefactor
+        return level
+
+    def automerge(self):
+        ''' Merge the newest segments while there are mergefactor
+            of them of about the same size.
+        '''
+        factor = self.mergefactor
+        while len(self.segments) >= factor:
+            newest = self.segments[-factor:]
+            levels = set([self.level(x) for x in newest])
+            if len(levels) > 1:
+                break
+            self.merge(newest)
+
+    def merge(self, segments=None):
+        ''' Merge a run of consecutive segments (by default, all of
+            them) into one, leaving out deleted documents.
+        '''
+        if segments is None:
+            segments = self.segments[:]
+        if not segments:
+            return
+        deleted = self.deleted
+        docnums = set()
+        for segment in segments:
+            docnums.update([x[0] for x in segment.docs])
+        if len(segments) == 1 and not docnums & deleted:
+            return
+        docs = []
+        for segment in segments:
+            docs.extend([x for x in segment.docs if x[0] not in deleted])
+        name = self.newsegment()
+        writesegment(self.dirname, name, docs, mergeterms(segments, deleted))
+        start = self.segments.index(segments[0])
+        self.segments[start:start + len(segments)] = \
+                [Segment(self.dirname, name)]
+        self.deleted = deleted - docnums
+        self.writemanifest()
+        for segment in segments:
+            segment.close()
+            for ext in '.docs', '.terms', '.post':
+                os.remove(os.path.join(self.dirname, segment.name + ext))
+
+    def remove(self, paths):
+        ''' Remove files from the index.  Returns the number of
+            files that were in it.
+        '''
+        count = 0
+        for path in paths:
+            docnum = self.paths.pop(os.path.abspath(path), None)
+            if docnum is not None:
+                self.deleted.add(docnum)
+                del self.documents[docnum]
+                count += 1
+        if count:
+            self.writemanifest()
+        return count
+
+    def postings(self, word):
+        ''' Return a dict of docnum -> (segment, start, end)
+            locating the entries of a (UTF-8) word.
+        '''
+        result = {}
+        deleted = self.deleted
+        for segment in self.segments:
+            record = segment.find(word)
+            if record is not None:
+                for docnum, start, end in segment.entries(record):
+                    if docnum not in deleted:
+                        result[docnum] = segment, start, end
+        return result
+
+    def search(self, query, phrase=False):
+        ''' Return a list of (path, pagenum) for the pages which
+            have all the words of query on them, or (if phrase is
+            true) which have them in order, in the order the files
+            were indexed.  Page numbers count from 1.
+        '''
+        query = [x.encode('utf-8') for x in words(query)]
+        if not query:
+            return []
+        unique = list(set(query))
+        found = {}
+        candidates = None
+        for word in unique:
+            found[word] = postings = self.postings(word)
+            if candidates is None:
+                candidates = set(postings)
+            else:
+                candidates.intersection_update(postings)
+            if not candidates:
+                return []
+        result = []
+        for docnum in candidates:
+            pages = {}
+            for word in unique:
+                segment, start, end = found[word][docnum]
+                pages[word] = pagepositions(segment.postings[start:end])
+            common = set(pages[unique[0]])
+            for word in unique[1:]:
+                common.intersection_update(pages[word])
+            for page in common:
+                if phrase and not self.isphrase(query, pages, page):
+                    continue
+                result.append((docnum, page))
+        result.sort()
+        return [(self.documents[x][0], y + 1) for x, y in result]
+
+    def isphrase(self, query, pages, page):
+        starts = set(pages[query[0]][page])
+        for offset, word in enumerate(query[1:]):
+            positions = set(pages[word][page])
+            starts = set([x for x in starts if x + offset + 1 in positions])
+            if not starts:
+                return False
+        return True
+
+def pdffiles(paths):
+    ''' Yield the files named in paths, and the PDF files in the
+        directories named in paths.
+    '''
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for dirpath, dirnames, fnames in os.walk(path):
+            dirnames.sort()
+            fnames.sort()
+            for fname in fnames:
+                if fname.lower().endswith('.pdf'):
+                    yield os.path.join(dirpath, fname)
+
+def main(args=None):
+    import time
+    from optparse import OptionParser
+    parser = OptionParser(usage='%prog [options] index add file.pdf ...\n'
+                          '       %prog [options] index remove file.pdf ...\n'
+                          '       %prog [options] index search word ...\n'
+                          '       %prog [options] index merge')
+    parser.add_option('-j', '--processes', type='int', default=None,
+                      help='number of worker processes (default: CPU count)')
+    parser.add_option('-p', '--phrase', action='store_true', default=False,
+                      help='search for the words as a phrase')
+    options, args = parser.parse_args(args)
+    if len(args) < 2:
+        parser.error('need an index and a command')
+    index = SearchIndex(args[0])
+    command, args = args[1], args[2:]
+    start = time.time()
+    if command == 'add':
+        count = index.add(pdffiles(args), options.processes)
+        print 'Indexed %d files in %.2f seconds' % (count, time.time() - start)
+    elif command == 'remove':
+        print 'Removed %d files' % index.remove(args)
+    elif command == 'search':
+        results = index.search(' '.join(args).decode('utf-8'), options.phrase)
+        for path, pagenum in results:
+            print path, pagenum
+        print '%d pages found in %.1f ms' % (len(results),
+                                             (time.time() - start) * 1000)
+    elif command == 'merge':
+        index.merge()
+    else:
+        parser.error('unknown command %r' % command)
+    index.close()
+
+if __name__ == '__main__':
+    main()
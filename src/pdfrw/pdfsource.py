@@ -0,0 +1,214 @@
+# A part of pdfrw (pdfrw.googlecode.com)
+# Copyright (C) 2006-2009 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Random access byte sources for PdfReader.
+
+Normally PdfReader reads a whole file into memory.  A PdfReader
+created with a source instead only reads the parts of the file it
+needs: the end of the file (to find the cross-reference table), the
+cross-reference tables and trailers, and each object as it is
+first used.  A source is anything with a size attribute and a
+read(offset, length) method; this module provides sources for
+local files (read or memory mapped), strings and HTTP servers which
+honour Range requests (e.g. most blob stores).
+
+PdfReader wraps its source in a BlockCache, which reads whole
+blocks, keeps the most recently used ones, and reads a little
+ahead, since the objects a reader needs next are usually close to
+the ones it has just read.
+
+Sources and BlockCache may be used from several threads at once.
+BlockCache does not hold its lock while it reads from its source,
+so threads waiting on different parts of a slow source overlap.
+
+Usage:
+    doc = PdfReader(source=HttpSource('http://example.com/big.pdf'))
+    page = doc.pages[1234]
+    print doc.source.requests, doc.source.transferred
+'''
+
+import mmap
+import threading
+import urllib2
+
+class FileSource(object):
+    ''' Reads byte ranges of a local file.
+    '''
+
+    def __init__(self, fname):
+        self.f = open(fname, 'rb')
+        self.f.seek(0, 2)
+        self.size = self.f.tell()
+        self.lock = threading.Lock()
+
+    def read(self, offset, length):
+        self.lock.acquire()
+        try:
+            self.f.seek(offset)
+            return self.f.read(length)
+        finally:
+            self.lock.release()
+
+    def close(self):
+        self.f.close()
+
+class MmapSource(object):
+    ''' Reads byte ranges of a memory mapped local file.  The
+        operating system already caches the file, so PdfReader
+        does not wrap this source in a BlockCache, and processes
+        forked after it is made share the mapping.
+    '''
+
+    cache = False
+
+    def __init__(self, fname):
+        f = open(fname, 'rb')
+        try:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+        self.size = len(self.map)
+
+    def read(self, offset, length):
+        return self.map[offset:offset+length]
+
+    def close(self):
+        self.map.close()
+
+class StringSource(object):
+    ''' Reads byte ranges of a string (mostly for testing).
+    '''
+
+    def __init__(self, data):
+        self.data = data
+        self.size = len(data)
+
+    def read(self, offset, length):
+        return self.data[offset:offset+length]
+
+class HttpSource(object):
+    ''' Reads byte ranges of a URL with HTTP Range requests.
+        The size is found with a HEAD request.
+    '''
+
+    def __init__(self, url, opener=None):
+        self.url = url
+        self.opener = opener = opener or urllib2.build_opener()
+        request = urllib2.Request(url)
+        request.get_method = lambda: 'HEAD'
+        response = opener.open(request)
+        self.size = int(response.info()['Content-Length'])
+        response.close()
+
+    def read(self, offset, length):
+        end = min(offset + length, self.size)
+        if offset >= end:
+            return ''
+        request = urllib2.Request(self.url,
+                    headers={'Range': 'bytes=%d-%d' % (offset, end - 1)})
+        response = self.opener.open(request)
+        data = response.read()
+        response.close()
+        if response.code != 206:
+            # The server ignored the Range header
+            data = data[offset:end]
+        return data
+
+class BlockCache(object):
+    ''' Wraps a source, reading it in aligned blocks and keeping
+        the maxblocks most recently used blocks.  Blocks which are
+        not cached are read together, along with up to readahead
+        blocks after them, in a single request to the source.
+        Reads bigger than the cache bypass it.
+
+        requests and transferred count the requests made to the
+        source and the bytes they returned.
+    '''
+
+    def __init__(self, source, blocksize=65536, maxblocks=256, readahead=1):
+        self.source = source
+        self.size = source.size
+        self.blocksize = blocksize
+        self.maxblocks = maxblocks
+        self.readahead = readahead
+        self.blocks = {}        # block number -> data
+        self.lastused = {}      # block number -> clock value
+        self.clock = 0
+        self.requests = 0
+        self.transferred = 0
+        self.lock = threading.Lock()
+
+    def fetch(self, offset, length):
+        data = self.source.read(offset, length)
+        self.lock.acquire()
+        self.requests += 1
+        self.transferred += len(data)
+        self.lock.release()
+        return data
+
+    def read(self, offset, length):
+        end = min(offset + length, self.size)
+        if offset >= end:
+            return ''
+        blocksize = self.blocksize
+        first, last = offset // blocksize, (end - 1) // blocksize
+        if last - first >= self.maxblocks:
+            return self.fetch(offset, end - offset)
+
+        blocks = self.blocks
+        lock = self.lock
+        lock.acquire()
+        try:
+            found = dict([(i, blocks[i]) for i in range(first, last + 1)
+                          if i in blocks])
+        finally:
+            lock.release()
+
+        fetched = {}
+        missing = [i for i in range(first, last + 1) if i not in found]
+        if missing:
+            # Read each run of missing blocks with one request,
+            # reading ahead after the last one.
+            lastblock = (self.size - 1) // blocksize
+            runs = []
+            for i in missing:
+                if runs and runs[-1][1] == i - 1:
+                    runs[-1][1] = i
+                else:
+                    runs.append([i, i])
+            runs[-1][1] = min(runs[-1][1] + self.readahead, lastblock)
+            for start, stop in runs:
+                # (don't read ahead into blocks we already have)
+                while stop > max(start, last) and stop in blocks:
+                    stop -= 1
+                data = self.fetch(start * blocksize,
+                                  (stop - start + 1) * blocksize)
+                for i in range(start, stop + 1):
+                    pos = (i - start) * blocksize
+                    fetched[i] = data[pos:pos + blocksize]
+            found.update(fetched)
+
+        lock.acquire()
+        try:
+            lastused = self.lastused
+            for i in fetched:
+                blocks[i] = fetched[i]
+                lastused[i] = self.clock
+            for i in range(first, last + 1):
+                if i in blocks:
+                    self.clock += 1
+                    lastused[i] = self.clock
+            excess = len(blocks) - self.maxblocks
+            if excess > 0:
+                victims = lastused.keys()
+                victims.sort(key=lastused.get)
+                for i in victims[:excess]:
+                    del blocks[i], lastused[i]
+        finally:
+            lock.release()
+
+        data = ''.join([found[i] for i in range(first, last + 1)])
+        start = offset - first * blocksize
+        return data[start:start + end - offset]
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+
+# A part of pdfrw (pdfrw.googlecode.com)
+# Copyright (C) 2006-2009 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Splits one PDF file into many.
+
+Writing each output with PdfWriter re-resolves the inherited
+page attributes and re-formats every shared object once per
+output.  Instead, a SplitIndex formats every page of the source
+document (and everything the pages reference) exactly once, and
+records which objects each object refers to.  The objects needed
+by any range of pages are then found by walking that reference
+graph, and are renumbered and streamed straight into the output,
+so each output contains exactly the objects its pages reference.
+By default each page's resources are pruned (see pdfprune) before
+it is formatted, so pages which share a large /Resources dictionary
+do not drag every font and image in it into every output.
+
+Outputs can be written from a pool of worker processes; the
+index is sent to each worker once.
+
+Usage:
+    python pdfsplit.py [-j processes] [-n pages] [--no-prune] input.pdf out%d.pdf [range ...]
+
+where each range is a page number or a first-last pair (1-based),
+and -n (default 1) splits the whole document into chunks of that
+many pages when no ranges are given.
+
+or from Python:
+    splitpdf('batch.pdf', [('cust1.pdf', [0, 1]), ('cust2.pdf', [2])])
+'''
+
+import multiprocessing
+from itertools import imap
+
+from pdfreader import PdfReader
+from pdfwriter import PdfStreamWriter, serialise
+from pdfobjects import PdfObject
+
+class SplitIndex(object):
+    ''' Formats the pages of a document once, and extracts
+        self-contained payloads for any subset of the pages.
+    '''
+
+    # PdfStreamWriter always reserves the first object number
+    # for its page tree, so every output can share one Parent.
+    pagesref = '1 0 R'
+
+    def __init__(self, doc, compress=True, prune=True):
+        if not isinstance(doc, PdfReader):
+            doc = PdfReader(doc, decompress=False)
+        self.objects, self.pagenums = serialise(doc.pages, compress, prune,
+                                            Parent=PdfObject(self.pagesref))
+        self.refs = [tuple(set(parts[1::2])) for parts, stream in self.objects]
+        self.reachable = {}
+
+    def pagereach(self, pageindex):
+        ''' Return the (cached) set of local object numbers
+            needed by one page.
+        '''
+        result = self.reachable.get(pageindex)
+        if result is None:
+            refs = self.refs
+            result = set()
+            stack = [self.pagenums[pageindex]]
+            while stack:
+                objnum = stack.pop()
+                if objnum not in result:
+                    result.add(objnum)
+                    stack.extend(refs[objnum-1])
+            result = self.reachable[pageindex] = frozenset(result)
+        return result
+
+    def payload(self, pageindices):
+        ''' Return a payload for PdfStreamWriter.addpayload()
+            containing the given (0-based) pages, and only the
+            objects they reference.
+        '''
+        needed = set()
+        for index in pageindices:
+            needed.update(self.pagereach(index))
+        needed = sorted(needed)
+        renumber = dict([(x, i+1) for i, x in enumerate(needed)])
+        objects = []
+        for objnum in needed:
+            parts, stream = self.objects[objnum-1]
+            parts = parts[:]
+            parts[1::2] = [renumber[x] for x in parts[1::2]]
+            objects.append((parts, stream))
+        pagenums = [renumber[self.pagenums[x]] for x in pageindices]
+        return objects, pagenums
+
+    def write(self, output, pageindices, version='1.3'):
+        writer = PdfStreamWriter(output, version)
+        assert writer.pagesref == self.pagesref, writer.pagesref
+        writer.addpayload(self.payload(pageindices))
+        writer.close()
+        return output
+
+_index = None
+
+def _setindex(index):
+    global _index
+    _index = index
+
+def _writejob(args):
+    output, pageindices, version = args
+    return _index.write(output, pageindices, version)
+
+def splitpdf(source, jobs, processes=1, version='1.3', compress=True,
+             prune=True):
+    ''' source is a filename, file object, PdfReader or SplitIndex.
+        jobs is a sequence of (output, pageindices) pairs, with
+        0-based page indices.  Returns the list of outputs.
+    '''
+    index = source
+    if not isinstance(index, SplitIndex):
+        index = SplitIndex(source, compress, prune)
+    jobs = [(output, list(pages), version) for output, pages in jobs]
+    if processes == 1:
+        _setindex(index)
+        return list(imap(_writejob, jobs))
+    pool = multiprocessing.Pool(processes, _setindex, (index,))
+    try:
+        return pool.map(_writejob, jobs)
+    finally:
+        pool.terminate()
+
+def parseranges(ranges, numpages, chunk=1):
+    ''' Convert 1-based range strings ('3', '4-7') into lists of
+        0-based page indices.  No ranges means the whole document
+        in chunks of chunk pages.
+    '''
+    if not ranges:
+        return [range(i, min(i + chunk, numpages))
+                    for i in range(0, numpages, chunk)]
+    result = []
+    for item in ranges:
+        first, last = (item.split('-', 1) + [item])[:2]
+        result.append(range(int(first) - 1, int(last)))
+    return result
+
+def main(args=None):
+    from optparse import OptionParser
+    parser = OptionParser(
+        usage='%prog [options] input.pdf output%d.pdf [range ...]')
+    parser.add_option('-j', '--processes', type='int', default=1,
+                      help='number of worker processes (default: 1)')
+    parser.add_option('-n', '--pages', type='int', default=1,
+                      help='pages per output when no ranges are given')
+    parser.add_option('--no-prune', dest='prune', action='store_false',
+                      default=True, help='keep unused page resources')
+    options, args = parser.parse_args(args)
+    if len(args) < 2:
+        parser.error('need an input file and an output file pattern')
+    index = SplitIndex(args[0], prune=options.prune)
+    ranges = parseranges(args[2:], len(index.pagenums), options.pages)
+    jobs = [(args[1] % (i + 1), pages) for i, pages in enumerate(ranges)]
+    splitpdf(index, jobs, options.processes)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,545 @@
+#!/usr/bin/env python
+
+# A part of pdfrw (pdfrw.googlecode.com)
+# Copyright (C) 2006-2009 Patrick Maupin, Austin, Texas
+# MIT license -- See LICENSE.txt for details
+
+'''
+Extracts the text of pages.
+
+The text operators of a page's content streams (and of the Form
+XObjects they draw) are interpreted, and the strings they show are
+mapped from character codes to unicode with the font's /ToUnicode
+CMap, or failing that with its /Encoding.  Each font's mapping is
+worked out the first time the font is used, and kept with the font
+object (and each CMap with its stream), so a document whose pages
+share fonts only parses each CMap once.  One byte codes are then
+mapped with a C level charmap decode, and hex strings are unpacked
+with binascii.
+
+Layout is not analysed: text is kept in content stream order, with a
+line break wherever text is shown on a different line from the text
+before it, and a space where it is shown further along the same line,
+or where a TJ adjustment is at least tjspace thousandths of an em.
+That is the order most generators write text in, and is good enough
+for search indexing.
+
+Content streams are scanned with a single regular expression rather
+than PdfTokens; extracting the text of a page takes about a quarter
+of the time it takes PdfTokens just to tokenize its content stream.
+Inline images are skipped.
+
+Usage:
+    python pdftext.py input.pdf [page ...]
+
+or from Python:
+    for page in PdfReader('input.pdf').pages:
+        print pagetext(page).encode('utf-8')
+'''
+
+try:
+    set
+except NameError:
+    from sets import Set as set
+
+import codecs
+import re
+import unicodedata
+from binascii import unhexlify
+
+from pdfobjects import PdfDict, PdfArray, PdfName
+from pdfcompress import decodestream
+
+whitespace = r'\x00\t\n\f\r '
+delimiters = r'()<>\[\]{}/%'
+
+# Literal strings, with up to three levels of nested parentheses
+string_pattern = r'\((?:[^\\()]|\\.)*\)'
+for _ in range(2):
+    string_pattern = r'\((?:[^\\()]|\\.|%s)*\)' % string_pattern
+del _
+
+findtokens = re.compile(r'%s|<<|>>|<[0-9A-Fa-f%s]*>|/?[^%s%s]+|%%[^\r\n]*|[%s]' %
+        (string_pattern, whitespace, whitespace, delimiters, delimiters),
+        re.S).findall
+
+inline_image = re.compile(r'(?:^|(?<=[%s]))BI[%s].*?[%s]ID[%s].*?[%s]EI(?=[%s]|$)'
+        % ((whitespace,) * 6), re.S)
+
+# First characters of tokens which are operands, not operators
+operandchars = set('0123456789+-./([]<>')
+
+# Operators this module interprets
+showoperators = set(['Tj', 'TJ', "'", '"'])
+interpreted = showoperators | set(['Tf', 'Td', 'TD', 'Tm', 'T*', 'TL',
+                                     'BT', 'Do', 'cm', 'q', 'Q'])
+
+escapes = {'n': '\n', 'r': '\r', 't': '\t', 'b': '\b', 'f': '\f',
+           '\r\n': '', '\r': '', '\n': ''}
+
+unescape_sub = re.compile(r'\\([0-7]{1,3}|\r\n|.)', re.S).sub
+
+def unescape(match):
+    escape = match.group(1)
+    if escape[0] in '01234567':
+        return chr(int(escape, 8) & 255)
+    return escapes.get(escape, escape)
+
+def stringbytes(token):
+    ''' Return the bytes of a literal or hex string token.
+    '''
+    if token[0] == '(':
+        data = token[1:-1]
+        if '\\' in data:
+            data = unescape_sub(unescape, data)
+        return data
+    data = token[1:-1]
+    if not data.isalnum():
+        data = ''.join(data.split())
+    if len(data) % 2:
+        data += '0'
+    return unhexlify(data)
+
+def hexbytes(token):
+    ''' Return the bytes of a hex string in a CMap.
+    '''
+    if len(token) % 2:
+        token += '0'
+    return unhexlify(token)
+
+def utf16(data):
+    return data.decode('utf-16-be', 'replace')
+
+# Glyph names which are not made of their character's name
+glyphnames = dict(
+    space=u' ', exclam=u'!', quotedbl=u'"', numbersign=u'#', dollar=u'$',
+    percent=u'%', ampersand=u'&', quotesingle=u"'", quoteright=u'\u2019',
+    parenleft=u'(', parenright=u')', asterisk=u'*', plus=u'+', comma=u',',
+    hyphen=u'-', period=u'.', slash=u'/', colon=u':', semicolon=u';',
+    less=u'<', equal=u'=', greater=u'>', question=u'?', at=u'@',
+    bracketleft=u'[', backslash=u'\\', bracketright=u']',
+    asciicircum=u'^', underscore=u'_', grave=u'`', quoteleft=u'\u2018',
+    braceleft=u'{', bar=u'|', braceright=u'}', asciitilde=u'~',
+    quotedblleft=u'\u201c', quotedblright=u'\u201d', quotesinglbase=u'\u201a',
+    quotedblbase=u'\u201e', bullet=u'\u2022', endash=u'\u2013',
+    emdash=u'\u2014', ellipsis=u'\u2026', minus=u'\u2212', fi=u'fi',
+    fl=u'fl', ff=u'ff', ffi=u'ffi', ffl=u'ffl', germandbls=u'\xdf',
+    ae=u'\xe6', AE=u'\xc6', oe=u'\u0153', OE=u'\u0152', oslash=u'\xf8',
+    Oslash=u'\xd8', dotlessi=u'\u0131', degree=u'\xb0', copyright=u'\xa9',
+    registered=u'\xae', trademark=u'\u2122', section=u'\xa7',
+    paragraph=u'\xb6', sterling=u'\xa3', yen=u'\xa5', Euro=u'\u20ac',
+    cent=u'\xa2', multiply=u'\xd7', divide=u'\xf7', nbspace=u'\xa0',
+    zero=u'0', one=u'1', two=u'2', three=u'3', four=u'4', five=u'5',
+    six=u'6', seven=u'7', eight=u'8', nine=u'9',
+)
+
+accents = dict(acute='ACUTE', grave='GRAVE', circumflex='CIRCUMFLEX',
+               dieresis='DIAERESIS', tilde='TILDE', ring='RING ABOVE',
+               cedilla='CEDILLA', caron='CARON')
+
+def glyphchar(name):
+    ''' Return the unicode for a glyph name, or None.
+    '''
+    if name in glyphnames:
+        return glyphnames[name]
+    if len(name) == 1:
+        return unicode(name)
+    try:
+        if name[1:] in accents:
+            case = name[0].isupper() and 'CAPITAL' or 'SMALL'
+            return unicodedata.lookup('LATIN %s LETTER %s WITH %s' %
+                                      (case, name[0].upper(), accents[name[1:]]))
+        if name.startswith('uni') and len(name) == 7:
+            return unichr(int(name[3:], 16))
+        if name.startswith('u') and 5 <= len(name) <= 7:
+            return unichr(int(name[1:], 16))
+    except (ValueError, KeyError):
+        pass
+    return None
+
+# Codecs which stand in for the simple font encodings
+basecodecs = {
+    PdfName.WinAnsiEncoding: 'cp1252',
+    PdfName.MacRomanEncoding: 'mac_roman',
+    PdfName.StandardEncoding: 'cp1252',
+    PdfName.PDFDocEncoding: 'cp1252',
+}
+
+def encodingtable(encoding):
+    ''' Return a list of the unicode for each code of a simple
+        font's /Encoding.
+    '''
+    base = encoding
+    differences = None
+    if isinstance(encoding, PdfDict):
+        base = encoding.BaseEncoding
+        differences = encoding.Differences
+    codec = basecodecs.get(base, 'cp1252')
+    table = [chr(x).decode(codec, 'replace') for x in range(256)]
+    if isinstance(differences, PdfArray):
+        code = 0
+        for item in differences:
+            if item.startswith('/'):
+                char = glyphchar(item[1:])
+                if char is not None and 0 <= code < 256:
+                    table[code] = char
+                code += 1
+            else:
+                try:
+                    code = int(item)
+                except ValueError:
+                    pass
+    return table
+
+class CMap(object):
+    ''' The code space and the mappings of a /ToUnicode CMap.
+        mapping maps codes (as byte strings) to unicode.
+    '''
+
+    findsections = re.compile(
+        r'begin(codespacerange|bfchar|bfrange)(.*?)end\1', re.S).findall
+    findrange = re.compile(r'<([^>]*)>\s*<([^>]*)>\s*(?:<([^>]*)>|\[([^\]]*)\])').findall
+    findhex = re.compile(r'<([^>]*)>').findall
+
+    maxrange = 65536    # (a range can't make us build billions of codes)
+
+    def __init__(self, data):
+        self.codespace = []     # (low, high) byte strings
+        self.mapping = mapping = {}
+        for section, body in self.findsections(data):
+            if section == 'bfrange':
+                for low, high, dest, dests in self.findrange(body):
+                    self.addrange(hexbytes(low), hexbytes(high), dest, dests)
+                continue
+            values = [hexbytes(''.join(x.split())) for x in self.findhex(body)]
+            pairs = zip(values[0::2], values[1::2])
+            if section == 'codespacerange':
+                self.codespace.extend(pairs)
+            else:
+                for code, dest in pairs:
+                    mapping[code] = utf16(dest)
+
+    def addrange(self, low, high, dest, dests):
+        mapping = self.mapping
+        if len(low) != len(high):
+            return
+        size = len(low)
+        first = int(low.encode('hex') or '0', 16)
+        last = int(high.encode('hex') or '0', 16)
+        last = min(last, first + self.maxrange - 1)
+        codes = ['%0*x' % (size * 2, x) for x in range(first, last + 1)]
+        codes = [x.decode('hex') for x in codes]
+        if dests:
+            # [<dest> <dest> ...]: one destination per code
+            dests = [hexbytes(''.join(x.split()))
+                     for x in self.findhex(dests)]
+            for code, dest in zip(codes, dests):
+                mapping[code] = utf16(dest)
+            return
+        # <dest>: destinations count up from it, in the last byte
+        dest = hexbytes(''.join(dest.split()))
+        prefix, start = dest[:-2], int(dest[-2:].encode('hex') or '0', 16)
+        for offset, code in enumerate(codes):
+            value = (start + offset) & 0xffff
+            mapping[code] = utf16(prefix + chr(value >> 8) + chr(value & 255))
+
+    def lengths(self):
+        ''' The lengths in bytes of the codes, shortest first.
+        '''
+        result = list(set([len(x[0]) for x in self.codespace]))
+        if not result:
+            result = list(set([len(x) for x in self.mapping])) or [1]
+        result.sort()
+        return result
+
+def tounicode(font):
+    ''' Return the parsed /ToUnicode CMap of a font, or None.
+    '''
+    stream = font.ToUnicode
+    if not isinstance(stream, PdfDict) or stream.stream is None:
+        return None
+    cmap = stream.cmap
+    if cmap is None:
+        data = decodestream(stream)
+        cmap = CMap(data or '')
+        stream.private.cmap = cmap
+    return cmap
+
+class FontDecoder(object):
+    ''' Maps the codes of strings shown in a font to unicode.
+        Call it with the bytes of a string.
+    '''
+
+    missing = u'\ufffd'
+
+    def __init__(self, font=None):
+        if font is None:
+            font = PdfDict()
+        cmap = tounicode(font)
+        if font.Subtype == PdfName.Type0:
+            self.composite(font, cmap)
+        else:
+            self.simple(font, cmap)
+
+    def simple(self, font, cmap):
+        table = encodingtable(font.Encoding)
+        if cmap is not None:
+            for code, value in cmap.mapping.iteritems():
+                if len(code) == 1:
+                    table[ord(code)] = value
+        if [x for x in table if len(x) != 1]:
+            table = dict(enumerate(table))
+        else:
+            table = u''.join(table)
+        decode = codecs.charmap_decode
+        self.decode = lambda data: decode(data, 'replace', table)[0]
+
+    def composite(self, font, cmap):
+        encoding = font.Encoding
+        if cmap is None:
+            if isinstance(encoding, str) and (encoding.endswith('UCS2-H') or
+                    encoding.endswith('UCS2-V') or encoding.endswith('UTF16-H')
+                    or encoding.endswith('UTF16-V')):
+                self.decode = utf16
+            else:
+                # Identity and other CMaps: codes are glyph ids,
+                # which say nothing about the characters.
+                missing = self.missing
+                self.decode = lambda data: missing * (len(data) // 2)
+            return
+        get = cmap.mapping.get
+        missing = self.missing
+        lengths = cmap.lengths()
+        if len(lengths) == 1:
+            size = lengths[0]
+            def decode(data):
+                return u''.join([get(data[i:i+size], missing)
+                                 for i in xrange(0, len(data), size)])
+            self.decode = decode
+            return
+        codespace = cmap.codespace
+        def decode(data):
+            result = []
+            i, end = 0, len(data)
+            while i < end:
+                for size in lengths:
+                    code = data[i:i+size]
+                    for low, high in codespace:
+                        if len(low) == size and low <= code <= high:
+                            break
+                    else:
+                        continue
+                    break
+                else:
+                    code = data[i:i+lengths[0]]
+                result.append(get(code, missing))
+                i += len(code)
+            return u''.join(result)
+        self.decode = decode
+
+    def __call__(self, data):
+        return self.decode(data)
+
+def fontdecoder(font):
+    ''' Return the FontDecoder for a font, making it the first
+        time the font is used.
+    '''
+    if not isinstance(font, PdfDict):
+        return defaultdecoder
+    decoder = font.textdecoder
+    if decoder is None:
+        decoder = font.private.textdecoder = FontDecoder(font)
+    return decoder
+
+defaultdecoder = FontDecoder()
+
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+def multiply(m1, m2):
+    ''' Return the matrix m1 x m2 (m1 applied first).
+    '''
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (a1 * a2 + b1 * c2, a1 * b2 + b1 * d2,
+            c1 * a2 + d1 * c2, c1 * b2 + d1 * d2,
+            e1 * a2 + f1 * c2 + e2, e1 * b2 + f1 * d2 + f2)
+
+def translate(tx, ty, matrix):
+    a, b, c, d, e, f = matrix
+    return a, b, c, d, tx * a + ty * c + e, tx * b + ty * d + f
+
+class TextExtractor(object):
+    ''' Collects the text shown by content streams.
+    '''
+
+    tjspace = 200       # thousandths of an em
+
+    def __init__(self):
+        self.output = []
+        self.pending = None     # separator owed before the next text
+        self.active = set()     # ids of the form XObjects being read
+
+    def newline(self):
+        self.pending = u'\n'
+
+    def space(self):
+        if self.pending is None:
+            self.pending = u' '
+
+    def add(self, text):
+        if not text:
+            return
+        if self.pending is not None:
+            if self.output:
+                self.output.append(self.pending)
+            self.pending = None
+        self.output.append(text)
+
+    def text(self):
+        return u''.join(self.output)
+
+    def addpage(self, page):
+        contents = page.Contents
+        if contents is None:
+            contents = []
+        elif not isinstance(contents, PdfArray):
+            contents = [contents]
+        self.newline()
+        self.scan(contents, page.inheritable.Resources, IDENTITY)
+
+    def scan(self, streams, resources, ctm):
+        data = []
+        for obj in streams:
+            if isinstance(obj, PdfDict) and obj.stream is not None:
+                stream = decodestream(obj)
+                if stream is not None:
+                    data.append(stream)
+        data = '\n'.join(data)
+        if 'BI' in data:
+            data = inline_image.sub(' ', data)
+        fonts = resources and resources.Font
+        if not isinstance(fonts, PdfDict):
+            fonts = PdfDict()
+
+        tjspace = -self.tjspace
+        add = self.add
+        decode = defaultdecoder.decode
+        stack = []
+        tlm = IDENTITY          # text line matrix
+        leading = 0.0
+        lasty = None            # page y of the last text shown
+        moved = False
+        operands = []
+        push = operands.append
+        for token in findtokens(data):
+            if token[0] in operandchars or token in ('true', 'false', 'null'):
+                push(token)
+                continue
+            if token not in interpreted:
+                if token[0] != '%':
+                    del operands[:]
+                continue
+            try:
+                if token in showoperators:
+                    if token != 'Tj' and token != 'TJ':
+                        tlm = translate(0.0, -leading, tlm)
+                    a, b, c, d, e, f = ctm
+                    y = tlm[4] * b + tlm[5] * d + f
+                    if lasty is None or abs(y - lasty) > 0.5:
+                        self.newline()
+                        lasty = y
+                    elif moved:
+                        self.space()
+                    moved = False
+                    if token == 'TJ':
+                        for item in operands:
+                            first = item[0]
+                            if first == '(' or first == '<':
+                                add(decode(stringbytes(item)))
+                            elif first not in '[]' and float(item) <= tjspace:
+                                self.space()
+                    else:
+                        add(decode(stringbytes(operands[-1])))
+                elif token == 'Td' or token == 'TD':
+                    tx, ty = [float(x) for x in operands[-2:]]
+                    if token == 'TD':
+                        leading = -ty
+                    tlm = translate(tx, ty, tlm)
+                    moved = True
+                elif token == 'Tm':
+                    tlm = tuple([float(x) for x in operands[-6:]])
+                    moved = True
+                elif token == 'T*':
+                    tlm = translate(0.0, -leading, tlm)
+                elif token == 'TL':
+                    leading = float(operands[-1])
+                elif token == 'cm':
+                    ctm = multiply([float(x) for x in operands[-6:]], ctm)
+                    moved = True
+                elif token == 'q':
+                    stack.append(ctm)
+                elif token == 'Q':
+                    if stack:
+                        ctm = stack.pop()
+                elif token == 'Tf':
+                    decode = fontdecoder(fonts.get(operands[-2])).decode
+                elif token == 'BT':
+                    tlm = IDENTITY
+                elif token == 'Do':
+                    if self.draw(resources, operands[-1], ctm):
+                        lasty = None
+            except (IndexError, ValueError, TypeError):
+                # Missing or malformed operands
+                pass
+            del operands[:]
+
+    def draw(self, resources, name, ctm):
+        xobjects = resources and resources.XObject
+        xobj = isinstance(xobjects, PdfDict) and xobjects.get(name)
+        if (isinstance(xobj, PdfDict) and xobj.Subtype == PdfName.Form
+                and id(xobj) not in self.active):
+            matrix = xobj.Matrix
+            if matrix is not None:
+                try:
+                    ctm = multiply([float(x) for x in matrix], ctm)
+                except ValueError:
+                    pass
+            self.active.add(id(xobj))
+            self.scan([xobj], xobj.Resources or resources, ctm)
+            self.active.remove(id(xobj))
+            return True
+        return False
+
+def pagetext(page):
+    ''' Return the text of a page as unicode.
+    '''
+    extractor = TextExtractor()
+    extractor.addpage(page)
+    return extractor.text()
+
+def main(args=None):
+    import sys
+    from optparse import OptionParser
+    from pdfreader import PdfReader
+    parser = OptionParser(usage='%prog [options] input.pdf [page ...]')
+    parser.add_option('-o', '--output', default=None,
+                      help='write the text to a file (default: stdout)')
+    options, args = parser.parse_args(args)
+    if not args:
+        parser.error('need an input file')
+    pages = PdfReader(args[0]).pages
+    pagenums = [int(x) for x in args[1:]] or range(1, len(pages) + 1)
+    if options.output is None:
+        f = sys.stdout
+    else:
+        f = open(options.output, 'wb')
+    try:
+        for pagenum in pagenums:
+            f.write(pagetext(pages[pagenum - 1]).encode('utf-8'))
+            f.write('\n\f')
+    finally:
+        if f is not sys.stdout:
+            f.close()
+
+if __name__ == '__main__':
+    main()
@@ -19,6 +19,7 @@ except NameError:
 
 import re
 from pdfobjects import PdfString, PdfObject
+from pdferrors import PdfInvalidCharacterError, PdfUnexpectedEOFError
 
 class _PrimitiveTokens(object):
 
@@ -126,6 +127,10 @@ class _PrimitiveTokens(object):
 
 class PdfTokens(object):
 
+    # Offset of fdata in the file, when fdata is only part of it
+    # (used in error messages)
+    base = 0
+
     def __init__(self, fdata, startloc=0, strip_comments=True):
 
         def comment(token):
@@ -157,7 +162,7 @@ class PdfTokens(object):
                     if not nestlevel:
                         break
             else:
-                assert 0, "Unexpected end of token stream"
+                raise self.error(PdfUnexpectedEOFError)
             return PdfString(''.join(tokens))
 
         def hex_string(token):
@@ -198,7 +203,7 @@ class PdfTokens(object):
             return PdfObject(token)
 
         def broken(token):
-            assert 0, token
+            raise self.error(PdfInvalidCharacterError, token)
 
         dispatch = {
             '(': regular_string,
@@ -226,7 +231,6 @@ class PdfTokens(object):
             next = staticmethod(next)
 
         self.primitive = primitive = _PrimitiveTokens(fdata)
-        self.setstart = primitive.setstart
         primitive.setstart(startloc)
         self.fdata = fdata
         self.strip_comments = strip_comments
@@ -241,6 +245,21 @@ class PdfTokens(object):
         return self.primitive.floc() - sum([len(x) for x in self.tokens])
     floc = property(floc)
 
+    def setstart(self, startloc):
+        del self.tokens[:]
+        del self.primitive.tokens[:]
+        self.primitive.setstart(startloc)
+
+    def error(self, cls, *args):
+        ''' Return a pdferrors exception for the current location.
+        '''
+        if cls is PdfUnexpectedEOFError:
+            error = cls(self.fdata)
+        else:
+            error = cls(self.fdata, self.floc, *args)
+        error.base = self.base
+        return error
+
     def __iter__(self):
         return self.iterator
 
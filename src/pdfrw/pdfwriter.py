@@ -14,6 +14,14 @@ An instance of the PdfWriter class has two methods:
 and
     write(fname)
 
+If the writer is created with optimize=True, the content streams
+of each page are run through pdfoptimize as the page is added.
+If it is created with linearize=True, the file is laid out for
+"Fast Web View" (see LinearFormatObjects).
+If it is created with prune=True, each page only gets the resources
+its content streams use (see pdfprune), rather than a copy of
+everything in a shared /Resources dictionary.
+
 addpage() assumes that the pages are part of a valid
 tree/forest of PDF objects.
 '''
@@ -23,8 +31,14 @@ try:
 except NameError:
     from sets import Set as set
 
+import re
+import weakref
+import zlib
+
 from pdfobjects import PdfName, PdfArray, PdfDict, IndirectPdfDict, PdfObject, PdfString
 from pdfcompress import compress
+from pdfoptimize import optimize_page
+from pdfprune import ResourcePruner
 
 debug = False
 
@@ -69,8 +83,10 @@ class FormatObjects(object):
 
     def format_array(myarray, formatter):
         # Format array data into semi-readable ASCII
-        if sum([len(x) for x in myarray]) <= 70:
-            return formatter % ' '.join(myarray)
+        result = ' '.join(myarray)
+        if len(result) < 70 + len(myarray):
+            # (the items come to no more than 70 characters)
+            return formatter % result
         bigarray = []
         count = 1000000
         for x in myarray:
@@ -92,8 +108,12 @@ class FormatObjects(object):
         '''
         if visited is None:
             visited = set()
+        add = self.add
         if isinstance(obj, PdfArray):
-            myarray = [self.add(x, visited) for x in obj]
+            # (plain PdfObjects -- names, numbers, etc. -- are
+            # formatted as they are, without calling add())
+            myarray = [type(x) is PdfObject and not x.indirect and x or
+                       add(x, visited) for x in obj]
             return self.format_array(myarray, '[%s]')
         elif isinstance(obj, PdfDict):
             if self.compress and obj.stream:
@@ -105,7 +125,10 @@ class FormatObjects(object):
             dictkeys.sort()
             for key in dictkeys:
                 myarray.append(key)
-                myarray.append(self.add(obj[key], visited))
+                x = obj[key]
+                if type(x) is not PdfObject or x.indirect:
+                    x = add(x, visited)
+                myarray.append(x)
             result = self.format_array(myarray, '<<%s>>')
             stream = obj.stream
             if stream is not None:
@@ -151,23 +174,648 @@ class FormatObjects(object):
         f.write('trailer\n\n%s\nstartxref\n%s\n%%%%EOF\n' % (trailer, offset))
     dump = classmethod(dump)
 
+def flatpage(page, pruner=None, **kw):
+    ''' Return an indirect copy of a page with its inheritable
+        attributes (Resources, MediaBox, etc.) made explicit, so
+        that it no longer needs its original /Parent.  If a
+        ResourcePruner is given, it supplies the Resources.
+    '''
+    inheritable = page.inheritable # searches for resources
+    if pruner is None:
+        resources = inheritable.Resources
+    else:
+        resources = pruner(page)
+    return IndirectPdfDict(
+        page,
+        Resources = resources,
+        MediaBox = inheritable.MediaBox,
+        CropBox = inheritable.CropBox,
+        Rotate = inheritable.Rotate,
+        indirect = True,
+        **kw
+    )
+
+class StreamFormatObjects(FormatObjects):
+    ''' StreamFormatObjects formats objects for a PdfStreamWriter.
+        Indirect objects are written out as soon as they have
+        been formatted.  The writer remembers the number of each
+        object it has written (with a weak reference, so objects
+        which have been written can be garbage collected, and
+        objects shared by many writers do not keep them alive),
+        so shared objects are only written once per output file.
+
+        The formatted text of direct objects whose ids are in
+        the writer's frozen set is cached, so objects shared by
+        many pages (e.g. by clones of a template) are only
+        formatted once.
+    '''
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.compress = writer.compress
+        self.frozen = writer.frozen
+        self.cache = {}
+        self.objnums = {}       # id(obj) -> (reference to obj, objnum)
+
+    def add(self, obj, visited):
+        if isinstance(obj, PdfDict):
+            indirect = obj.indirect or (obj.stream is not None)
+        else:
+            indirect = getattr(obj, 'indirect', False)
+        if not indirect:
+            if id(obj) not in self.frozen:
+                return FormatObjects.add(self, obj, visited)
+            result = self.cache.get(id(obj))
+            if result is None:
+                result = FormatObjects.add(self, obj, visited)
+                self.cache[id(obj)] = result
+            return result
+
+        objnum = self.getobjnum(obj)
+        if objnum is None:
+            writer = self.writer
+            objnum = writer.reserve()
+            self.setobjnum(obj, objnum)
+            writer.writeobj(objnum, self.format_obj(obj))
+        return '%s 0 R' % objnum
+
+    def getobjnum(self, obj):
+        ''' Return the number obj was written as, or None.
+        '''
+        entry = self.objnums.get(id(obj))
+        if entry is not None and entry[0]() is obj:
+            return entry[1]
+        return None
+
+    def setobjnum(self, obj, objnum):
+        objnums = self.objnums
+        key = id(obj)
+        def forget(ref):
+            # (the object is gone, and its id may be reused)
+            if objnums.get(key, (None,))[0] is ref:
+                del objnums[key]
+        try:
+            ref = weakref.ref(obj, forget)
+        except TypeError:
+            # Strings can't be weakly referenced; they are small
+            ref = lambda: obj
+        objnums[key] = ref, objnum
+
+class PayloadFormatObjects(FormatObjects):
+    ''' PayloadFormatObjects formats a self-contained group of
+        objects with local object numbers, so that the group
+        can be built in one process and renumbered cheaply into
+        an output file in another.  References are written as
+        marker-delimited local numbers, and stream data is kept
+        apart from the formatted dictionary so that the markers
+        can never be confused with binary data.
+    '''
+
+    markers = '\x00R', '\x01R', '\x02R', '\x00\x01\x02'
+
+    def add(self, obj, visited):
+        if isinstance(obj, PdfDict):
+            indirect = obj.indirect or (obj.stream is not None)
+        else:
+            indirect = getattr(obj, 'indirect', False)
+        if not indirect:
+            return FormatObjects.add(self, obj, visited)
+
+        objid = id(obj)
+        objnum = self.indirect_dict.get(objid)
+        if objnum is None:
+            objlist = self.objlist
+            objlist.append(None)
+            objnum = self.indirect_dict[objid] = len(objlist)
+            objlist[objnum-1] = self.format_obj(obj)
+        self.refcount += 1
+        return '%s%s%s' % (self.marker, objnum, self.marker)
+
+    def format_obj(self, obj, visited=None):
+        if not isinstance(obj, PdfDict) or obj.stream is None:
+            return FormatObjects.format_obj(self, obj, visited)
+        if self.compress:
+            compress([obj])
+        header = PdfDict()
+        dict.update(header, obj)
+        return FormatObjects.format_obj(self, header, visited), obj.stream
+
+    def format(cls, roots, compress=True, aliases=()):
+        ''' Format every object reachable from the indirect objects
+            in roots.  Returns (objects, rootnums), where objects
+            is a list of (parts, stream) tuples for local object
+            numbers 1..n.  parts alternates literal text and local
+            object numbers.
+
+            aliases, if given, are objects that should be written
+            as references to the corresponding root instead -- e.g.
+            the original pages of flattened page copies, so that
+            an annotation's /P does not drag in the original page.
+        '''
+        for marker in cls.markers:
+            self = cls()
+            self.compress = compress
+            self.marker = marker
+            self.indirect_dict = indirect_dict = {}
+            self.objlist = objlist = []
+            self.refcount = 0
+            rootnums = []
+            for root in roots:
+                objlist.append(None)
+                rootnums.append(len(objlist))
+                indirect_dict[id(root)] = len(objlist)
+            for alias, objnum in zip(aliases, rootnums):
+                indirect_dict.setdefault(id(alias), objnum)
+            for root, objnum in zip(roots, rootnums):
+                objlist[objnum-1] = self.format_obj(root)
+            objects = []
+            found = 0
+            splitter = re.compile('%s(\\d+)%s' % (marker, marker)).split
+            for obj in objlist:
+                header, stream = isinstance(obj, tuple) and obj or (obj, None)
+                parts = splitter(header)
+                found += len(parts) // 2
+                parts[1::2] = [int(x) for x in parts[1::2]]
+                objects.append((parts, stream))
+            if found == self.refcount:
+                return objects, rootnums
+        raise ValueError('Cannot find a free reference marker')
+    format = classmethod(format)
+
+def nbits(value):
+    ''' Number of bits needed to hold a non-negative integer.
+    '''
+    return value and len(bin(value)) - 2 or 0
+
+class BitWriter(object):
+    ''' Packs unsigned integers, most significant bit first, for
+        the hint tables of a linearized file.
+    '''
+
+    def __init__(self):
+        self.data = []
+        self.value = 0
+        self.bits = 0
+
+    def write(self, value, bits):
+        self.value = (self.value << bits) | value
+        self.bits += bits
+        while self.bits >= 8:
+            self.bits -= 8
+            self.data.append(chr((self.value >> self.bits) & 0xff))
+            self.value &= (1 << self.bits) - 1
+
+    def writeall(self, values, bits):
+        ''' Write a sequence of values, then pad to a byte boundary
+            (as each item of a hint table entry must be).
+        '''
+        for value in values:
+            self.write(value, bits)
+        self.flush()
+
+    def flush(self):
+        if self.bits:
+            self.write(0, 8 - self.bits)
+
+    def getvalue(self):
+        self.flush()
+        return ''.join(self.data)
+
+class LinearFormatObjects(PayloadFormatObjects):
+    ''' LinearFormatObjects writes a linearized ("Fast Web View")
+        file, laid out as described in Annex F of the PDF
+        reference, so that a viewer reading the file over byte
+        range requests can show the first page as soon as it
+        has the first page section:
+
+            header
+            linearization parameter dictionary
+            first-page cross-reference table and trailer
+            catalog and the document level objects it uses
+            primary hint stream
+            first page, and everything it uses
+            each other page, followed by the objects only it uses
+            objects shared by several pages
+            everything else (page tree, info dictionary, ...)
+            main cross-reference table and trailer
+
+        Objects are numbered so that the first-page table covers
+        the high object numbers and the main table the low ones.
+        Every shared object is its own group in the shared object
+        hint table.  Like qpdf, the page offset hint table gives
+        each page's length as its content stream length.
+    '''
+
+    def layout(cls, trailer, compress):
+        ''' Format every object, and sort them into the sections
+            of a linearized file.  Returns (objects, sections,
+            trailernum) where sections is a dict of lists of local
+            object numbers, and sections['pages'] holds one list
+            per page other than the first.
+        '''
+        catalog = trailer.Root
+        treenodes = []
+        pages = []
+        pending = [catalog.Pages]
+        while pending:
+            node = pending.pop(0)
+            if node.Type == PdfName.Pages:
+                treenodes.append(node)
+                pending[:0] = list(node.Kids)
+            else:
+                pages.append(node)
+        header = PdfDict(trailer)
+        header.Size = header.Prev = None
+        header.indirect = True
+        extras = [x for x in trailer.itervalues()
+                  if getattr(x, 'indirect', False) and x is not catalog]
+        roots = [header, catalog] + treenodes + pages + extras
+        objects, rootnums = cls.format(roots, compress)
+        trailernum, catalognum = rootnums[:2]
+        treenums = rootnums[2:2+len(treenodes)]
+        pagenums = rootnums[2+len(treenodes):2+len(treenodes)+len(pages)]
+
+        refs = [None] + [set(parts[1::2]) for parts, stream in objects]
+        stops = set([trailernum, catalognum] + treenums + pagenums)
+
+        def reach(start):
+            result = set([start])
+            pending = [start]
+            while pending:
+                for objnum in refs[pending.pop()]:
+                    if objnum not in result and objnum not in stops:
+                        result.add(objnum)
+                        pending.append(objnum)
+            return result
+
+        docobjs = reach(catalognum)
+        firstreach = reach(pagenums[0]) - docobjs
+        firstpage = [pagenums[0]] + sorted(firstreach - set(pagenums[:1]))
+        fullreaches = [reach(x) - docobjs for x in pagenums[1:]]
+        reaches = [x - firstreach for x in fullreaches]
+        owners = {}
+        for objs in reaches:
+            for objnum in objs:
+                owners[objnum] = owners.get(objnum, 0) + 1
+        otherpages = []
+        for pagenum, objs in zip(pagenums[1:], reaches):
+            private = [x for x in objs if owners[x] == 1 and x != pagenum]
+            otherpages.append([pagenum] + sorted(private))
+        shared = sorted([x for x, count in owners.iteritems() if count > 1])
+        placed = set(docobjs) | firstreach | set(shared)
+        for objs in otherpages:
+            placed.update(objs)
+        placed.add(trailernum)
+        others = [x for x in range(1, len(objects) + 1) if x not in placed]
+        docobjs = [catalognum] + sorted(docobjs - set([catalognum]))
+        sections = dict(doc=docobjs, firstpage=firstpage, pages=otherpages,
+                        shared=shared, others=others, reaches=fullreaches)
+        return objects, sections, trailernum
+    layout = classmethod(layout)
+
+    def hintstream(pageinfo, sharedinfo, firstshared):
+        ''' Build the primary hint stream.  pageinfo is a list of
+            (offset, length, nobjects, sharedids) for each page,
+            sharedinfo a list of shared object group lengths, and
+            firstshared (objnum, offset, nfirstpage) describes the
+            shared objects section.  Offsets are as if the hint
+            stream were not in the file.
+        '''
+        w = BitWriter()
+        nobjects = [x[2] for x in pageinfo]
+        lengths = [x[1] for x in pageinfo]
+        sharedids = [x[3] for x in pageinfo]
+        allids = [y for x in sharedids for y in x]
+        minobjects, minlength = min(nobjects), min(lengths)
+        objectbits = nbits(max(nobjects) - minobjects)
+        lengthbits = nbits(max(lengths) - minlength)
+        countbits = nbits(max([len(x) for x in sharedids]))
+        idbits = nbits(max(allids + [0]))
+        w.write(minobjects, 32)
+        w.write(pageinfo[0][0], 32)
+        w.write(objectbits, 16)
+        w.write(minlength, 32)
+        w.write(lengthbits, 16)
+        w.write(0, 32)              # least content stream offset
+        w.write(0, 16)
+        w.write(minlength, 32)      # least content stream length
+        w.write(lengthbits, 16)
+        w.write(countbits, 16)
+        w.write(idbits, 16)
+        w.write(0, 16)              # numerator bits
+        w.write(1, 16)              # denominator
+        w.writeall([x - minobjects for x in nobjects], objectbits)
+        w.writeall([x - minlength for x in lengths], lengthbits)
+        w.writeall([len(x) for x in sharedids], countbits)
+        w.writeall(allids, idbits)
+        w.flush()                   # numerators (all zero bits)
+        w.flush()                   # content stream offsets
+        w.writeall([x - minlength for x in lengths], lengthbits)
+        pagetable = w.getvalue()
+
+        w = BitWriter()
+        objnum, offset, nfirst = firstshared
+        minlength = min(sharedinfo)
+        lengthbits = nbits(max(sharedinfo) - minlength)
+        w.write(objnum, 32)
+        w.write(offset, 32)
+        w.write(nfirst, 32)
+        w.write(len(sharedinfo), 32)
+        w.write(0, 16)              # one object per group
+        w.write(minlength, 32)
+        w.write(lengthbits, 16)
+        w.writeall([x - minlength for x in sharedinfo], lengthbits)
+        w.writeall([0] * len(sharedinfo), 1)    # no MD5 signatures
+        data = zlib.compress(pagetable + w.getvalue())
+        return '<</Filter /FlateDecode /Length %d /S %d>>' % (
+                    len(data), len(pagetable)), data
+    hintstream = staticmethod(hintstream)
+
+    def dump(cls, f, trailer, version='1.3', compress=True):
+        objects, sections, trailernum = cls.layout(trailer, compress)
+        docobjs = sections['doc']
+        firstpage = sections['firstpage']
+        otherpages = sections['pages']
+        shared = sections['shared']
+
+        # Number the objects after the first page section from 1,
+        # and the first page section after them.
+        lowobjs = [y for x in otherpages for y in x] + shared + sections['others']
+        renumber = {}
+        for objnum in lowobjs:
+            renumber[objnum] = len(renumber) + 1
+        firstnum = len(lowobjs) + 1
+        linnum = firstnum
+        for objnum in docobjs:
+            renumber[objnum] = len(renumber) + 2
+        hintnum = len(renumber) + 2
+        for objnum in firstpage:
+            renumber[objnum] = len(renumber) + 3
+        size = len(renumber) + 3
+
+        def objtext(objnum):
+            parts, stream = objects[objnum-1]
+            parts = parts[:]
+            parts[1::2] = ['%s 0 R' % renumber[x] for x in parts[1::2]]
+            text = ''.join(parts)
+            if stream is None:
+                return '%s 0 obj\n%s\nendobj\n' % (renumber[objnum], text)
+            return '%s 0 obj\n%s\nstream\n%s\nendstream\nendobj\n' % (
+                        renumber[objnum], text, stream)
+
+        header = '%%PDF-%s\n%%\xe2\xe3\xcf\xd3\n' % version
+        doctext = [objtext(x) for x in docobjs]
+        firsttext = [objtext(x) for x in firstpage]
+        pagetexts = [[objtext(y) for y in x] for x in otherpages]
+        sharedtext = [objtext(x) for x in shared]
+        othertext = [objtext(x) for x in sections['others']]
+
+        lintemplate = ('%s 0 obj\n<</Linearized 1 /L %%010d /H [%%010d %%010d]'
+                       ' /O %s /E %%010d /N %s /T %%010d>>\nendobj\n' % (
+                       linnum, renumber[firstpage[0]], len(otherpages) + 1))
+        parts = objects[trailernum-1][0][:]
+        parts[1::2] = ['%s 0 R' % renumber[x] for x in parts[1::2]]
+        trailertext = ''.join(parts)[:-2] + ' /Prev %%010d /Size %s>>' % size
+        xref1template = 'xref\n%s %s\n%s%%s' % (firstnum, size - firstnum,
+                                                 '%010d 00000 n\r\n' * (size - firstnum))
+        xref1tail = 'trailer\n\n%s\nstartxref\n0\n%%%%EOF\n' % trailertext
+        lintext = lintemplate % (0, 0, 0, 0, 0)
+        xref1len = len(xref1template % ((0,) * (size - firstnum) + ('',))) + \
+                   len(xref1tail % 0)
+
+        def offsets(start, texts):
+            result = []
+            for text in texts:
+                result.append(start)
+                start += len(text)
+            return result, start
+
+        # Lay the file out without the hint stream, which is where
+        # the hint tables want their offsets measured from.
+        docstart = len(header) + len(lintext) + xref1len
+        docoffsets, hintoffset = offsets(docstart, doctext)
+        firstoffsets, pagestart = offsets(hintoffset, firsttext)
+        pageinfo = [(firstoffsets[0], pagestart - firstoffsets[0],
+                     len(firstpage), [])]
+        sharedids = dict([(x, i) for i, x in enumerate(firstpage)])
+        for i, objnum in enumerate(shared):
+            sharedids[objnum] = len(firstpage) + i
+        pageoffsets = []
+        for objs, texts, reached in zip(otherpages, pagetexts,
+                                        sections['reaches']):
+            start = pagestart
+            offs, pagestart = offsets(start, texts)
+            pageoffsets.extend(offs)
+            ids = sorted([sharedids[x] for x in reached if x in sharedids])
+            pageinfo.append((start, pagestart - start, len(objs), ids))
+        sharedoffsets, otherstart = offsets(pagestart, sharedtext)
+        sharedinfo = [len(x) for x in firsttext + sharedtext]
+        firstshared = (shared and renumber[shared[0]] or 0,
+                       shared and sharedoffsets[0] or 0, len(firstpage))
+        hintdict, hintdata = cls.hintstream(pageinfo, sharedinfo, firstshared)
+        hinttext = '%s 0 obj\n%s\nstream\n%s\nendstream\nendobj\n' % (
+                        hintnum, hintdict, hintdata)
+
+        # Now shift everything after the hint stream along.
+        hintlen = len(hinttext)
+        firstoffsets = [x + hintlen for x in firstoffsets]
+        pageoffsets = [x + hintlen for x in pageoffsets]
+        sharedoffsets = [x + hintlen for x in sharedoffsets]
+        otheroffsets, xrefoffset = offsets(otherstart + hintlen, othertext)
+        firstend = firstoffsets[-1] + len(firsttext[-1])
+
+        mainxref = ['xref\n0 %s\n' % firstnum, '%010d %05d f\r\n' % (0, 65535)]
+        mainxref.extend(['%010d 00000 n\r\n' % x for x in
+                         pageoffsets + sharedoffsets + otheroffsets])
+        mainxref.append('trailer\n\n<</Size %s>>\nstartxref\n%s\n%%%%EOF\n' % (
+                            firstnum, len(header) + len(lintext)))
+        mainxref = ''.join(mainxref)
+        filelen = xrefoffset + len(mainxref)
+        firstxref = ([len(header)] + docoffsets + [hintoffset] +
+                     firstoffsets)
+        xref1 = xref1template % tuple(firstxref + [xref1tail % xrefoffset])
+        lintext = lintemplate % (filelen, hintoffset, hintlen, firstend,
+                                 xrefoffset + len('xref\n0 %s\n' % firstnum))
+        assert len(lintext) + len(xref1) == docstart - len(header)
+
+        f.write(header)
+        f.write(lintext)
+        f.write(xref1)
+        for text in doctext:
+            f.write(text)
+        f.write(hinttext)
+        for texts in [firsttext] + pagetexts + [sharedtext, othertext]:
+            for text in texts:
+                f.write(text)
+        f.write(mainxref)
+    dump = classmethod(dump)
+
+def serialise(pages, compress=True, prune=False, **kw):
+    ''' Serialise a list of pages (and everything they reference)
+        into a compact, picklable payload suitable for
+        PdfStreamWriter.addpayload().  Keywords (e.g. Parent)
+        are set on the flattened copy of each page.  If prune
+        is set, unused resources are left out.
+    '''
+    pruner = prune and ResourcePruner() or None
+    return PayloadFormatObjects.format(
+                [flatpage(x, pruner, **kw) for x in pages], compress, pages)
+
+class PdfStreamWriter(object):
+    ''' PdfStreamWriter writes a PDF file incrementally.  Unlike
+        PdfWriter, which builds the whole object tree and writes it
+        in one go, each page (and anything it references that has
+        not already been written) is formatted and sent to disk
+        when it is added, so memory use does not grow with the
+        size of the output.
+
+        frozen may be a set (or dict) of the ids of direct objects
+        which will not change while the writer is open, such as
+        the objects of a pdfclone Template; their formatting is
+        cached.
+
+        Usage:
+            writer = PdfStreamWriter(fname)
+            writer.addpage(page)        # or addpages(), addpayload()
+            writer.close()
+    '''
+
+    def __init__(self, fname, version='1.3', compress=True, optimize=False,
+                 precision=3, prune=False, frozen=()):
+        self.optimize = optimize
+        self.frozen = frozen
+        self.pruner = prune and ResourcePruner() or None
+        self.precision = precision
+        self.preexisting = preexisting = hasattr(fname, 'write')
+        self.f = preexisting and fname or open(fname, 'wb')
+        self.compress = compress
+        self.formatter = StreamFormatObjects(self)
+        header = '%%PDF-%s\n%%\xe2\xe3\xcf\xd3\n' % version
+        self.f.write(header)
+        self.offset = len(header)
+        self.offsets = [None]
+        self.pagerefs = []
+        self.pagesref = '%s 0 R' % self.reserve()
+
+    def reserve(self):
+        ''' Reserve and return the next object number.
+        '''
+        offsets = self.offsets
+        offsets.append(None)
+        return len(offsets) - 1
+
+    def writeobj(self, objnum, text, stream=None):
+        ''' Write preformatted object text (and optional stream
+            data) out under a previously reserved object number.
+        '''
+        if stream is None:
+            objstr = '%s 0 obj\n%s\nendobj\n' % (objnum, text)
+        else:
+            objstr = '%s 0 obj\n%s\nstream\n%s\nendstream\nendobj\n' % (
+                        objnum, text, stream)
+        self.offsets[objnum] = self.offset
+        self.offset += len(objstr)
+        self.f.write(objstr)
+
+    def addobj(self, obj):
+        ''' Write an object (and anything it references) and
+            return the formatted object or reference to it.
+        '''
+        return self.formatter.add(obj, set())
+
+    def addpage(self, page):
+        assert page.Type == PdfName.Page
+        if self.optimize:
+            optimize_page(page, self.precision)
+        flat = flatpage(page, self.pruner, Parent=PdfObject(self.pagesref))
+        # Annotations refer to the original page with /P, so it
+        # is written as a reference to the flattened copy.
+        formatter = self.formatter
+        objnum = self.reserve()
+        if formatter.getobjnum(page) is None:
+            formatter.setobjnum(page, objnum)
+        formatter.setobjnum(flat, objnum)
+        self.writeobj(objnum, formatter.format_obj(flat))
+        self.pagerefs.append('%s 0 R' % objnum)
+        return self
+
+    def addpages(self, pagelist):
+        for page in pagelist:
+            self.addpage(page)
+        return self
+
+    def addpayload(self, payload):
+        ''' Add pages serialised by serialise() (possibly in
+            another process).  The pages must have been serialised
+            with Parent set to this writer's pagesref.
+        '''
+        objects, pagenums = payload
+        base = len(self.offsets) - 1
+        for parts, stream in objects:
+            parts = parts[:]
+            parts[1::2] = ['%s 0 R' % (x + base) for x in parts[1::2]]
+            self.writeobj(self.reserve(), ''.join(parts), stream)
+        self.pagerefs.extend(['%s 0 R' % (x + base) for x in pagenums])
+        return self
+
+    def close(self, **catalog):
+        ''' Write the page tree, catalog, cross-reference
+            table and trailer.  Keywords are added to the catalog.
+        '''
+        pagerefs = self.pagerefs
+        pages = PdfDict(
+            Type = PdfName.Pages,
+            Count = PdfObject(len(pagerefs)),
+            Kids = PdfArray([PdfObject(x) for x in pagerefs]),
+        )
+        formatter = self.formatter
+        self.writeobj(int(self.pagesref.split()[0]), formatter.format_obj(pages))
+        root = IndirectPdfDict(Type=PdfName.Catalog,
+                               Pages=PdfObject(self.pagesref), **catalog)
+        root = PdfObject(self.addobj(root))
+        trailer = PdfDict(Root=root, Size=PdfObject(len(self.offsets)))
+
+        f = self.f
+        f.write('xref\n0 %s\n' % len(self.offsets))
+        f.write('%010d %05d f\r\n' % (0, 65535))
+        for offset in self.offsets[1:]:
+            if offset is None:
+                f.write('%010d %05d f\r\n' % (0, 0))
+            else:
+                f.write('%010d %05d n\r\n' % (offset, 0))
+        f.write('trailer\n\n%s\nstartxref\n%s\n%%%%EOF\n' % (
+                    formatter.format_obj(trailer), self.offset))
+        if not self.preexisting:
+            f.close()
+
 class PdfWriter(object):
 
     _trailer = None
 
-    def __init__(self, version='1.3', compress=True):
+    def __init__(self, version='1.3', compress=True, optimize=False,
+                 precision=3, prune=False, linearize=False):
         self.pagearray = PdfArray()
+        self.linearize = linearize
+        self.pruner = prune and ResourcePruner() or None
         self.compress = compress
         self.version = version
+        self.optimize = optimize
+        self.precision = precision
 
     def addpage(self, page):
         self._trailer = None
         assert page.Type == PdfName.Page
+        if self.optimize:
+            optimize_page(page, self.precision)
         inheritable = page.inheritable # searches for resources
+        if self.pruner is None:
+            resources = inheritable.Resources
+        else:
+            resources = self.pruner(page)
         self.pagearray.append(
             IndirectPdfDict(
                 page,
-                Resources = inheritable.Resources,
+                Resources = resources,
                 MediaBox = inheritable.MediaBox,
                 CropBox = inheritable.CropBox,
                 Rotate = inheritable.Rotate,
@@ -217,7 +865,8 @@ class PdfWriter(object):
         # file object.
         preexisting = hasattr(fname, 'write')
         f = preexisting and fname or open(fname, 'wb')
-        FormatObjects.dump(f, trailer, self.version, self.compress)
+        formatter = self.linearize and LinearFormatObjects or FormatObjects
+        formatter.dump(f, trailer, self.version, self.compress)
         if not preexisting:
             f.close()
 
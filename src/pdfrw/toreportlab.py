@@ -35,7 +35,8 @@ Notes:
         new PDF, but not so good if you are modifying
         objects for different pages.  Then you
         need to do your own deep copying (of circular
-        structures).  You're on your own.
+        structures).  pdfclone makes copies which share
+        whatever has not been modified.
 
     2) ReportLab seems weird about FormXObjects.
        They pass around a partial name instead of the
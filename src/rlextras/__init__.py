@@ -0,0 +1,6 @@
+"""Reusable helpers for the Reportlab demonstrations.
+
+The numbered scripts in the folder above are meant to be read from top to
+bottom. Anything which is worth importing from more than one of them lives in
+this package instead.
+"""
@@ -0,0 +1,131 @@
+"""Conditional formatting ("heatmaps") for Table styles.
+
+02_01_tables.py used to add one BACKGROUND command per cell, working out each
+colour separately with colors.linearlyInterpolatedColor. For a big table that
+means hundreds of thousands of style commands for Table to apply. Instead,
+heatmap_commands() takes a whole column or matrix of numbers at once, works
+out all of the colours together (with NumPy, if it is installed), and joins
+neighbouring cells of the same colour into a single command covering a range
+of cells.
+
+Values are snapped to one of a number of levels (256 by default, which is as
+fine as an 8 bit colour channel) so that nearly equal values share a colour.
+
+It can be used with the streaming tables in rlextras.streamtable too, e.g.:
+
+    chunk_style=lambda chunk: heatmap_commands(
+        [[int(row[1]), int(row[2])] for row in chunk], (1, 1), vmin=0, vmax=1000)
+"""
+from reportlab.lib import colors
+from reportlab.platypus import TableStyle
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _levels_numpy(values, vmin, vmax, levels):
+    data = numpy.asarray(values, dtype=float)
+    if data.ndim == 1:
+        data = data.reshape(-1, 1)
+    if vmin is None:
+        vmin = data.min()
+    if vmax is None:
+        vmax = data.max()
+    span = float(vmax - vmin) or 1.0
+    scaled = numpy.clip((data - vmin) / span, 0, 1)
+    return numpy.rint(scaled * (levels - 1)).astype(int)
+
+
+def _column_runs_numpy(level_matrix):
+    rows = level_matrix.shape[0]
+    for col in range(level_matrix.shape[1]):
+        column = level_matrix[:, col]
+        starts = numpy.concatenate(([0], numpy.flatnonzero(numpy.diff(column)) + 1))
+        ends = numpy.concatenate((starts[1:], [rows])) - 1
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            yield col, start, end, int(column[start])
+
+
+def _levels_python(values, vmin, vmax, levels):
+    matrix = [isinstance(row, (list, tuple)) and list(row) or [row]
+              for row in values]
+    flat = [float(x) for row in matrix for x in row]
+    if vmin is None:
+        vmin = min(flat)
+    if vmax is None:
+        vmax = max(flat)
+    span = float(vmax - vmin) or 1.0
+    def level(x):
+        scaled = min(max((float(x) - vmin) / span, 0), 1)
+        return int(round(scaled * (levels - 1)))
+    return [[level(x) for x in row] for row in matrix]
+
+
+def _column_runs_python(level_matrix):
+    if not level_matrix:
+        return
+    for col in range(len(level_matrix[0])):
+        start = 0
+        column = [row[col] for row in level_matrix]
+        for row in range(1, len(column) + 1):
+            if row == len(column) or column[row] != column[start]:
+                yield col, start, row - 1, column[start]
+                start = row
+
+
+def heatmap_commands(values, first_cell=(0, 0), low=colors.white,
+                     high=colors.red, vmin=None, vmax=None, levels=256,
+                     command='BACKGROUND'):
+    """Return TableStyle commands colouring a block of table cells by value.
+
+    values is a column (list of numbers) or a matrix (list of rows), and
+    first_cell is the (column, row) of the table cell holding values[0][0].
+    Values at or below vmin get the low colour, at or above vmax the high
+    colour (by default the smallest and largest values). No values, as in an
+    empty chunk from rlextras.streamtable, need no commands. levels must be
+    at least 2, for the low and high colours.
+    """
+    if levels < 2:
+        raise ValueError("levels must be at least 2, not %r" % (levels,))
+    if not len(values):
+        return []
+    if numpy is not None:
+        level_matrix = _levels_numpy(values, vmin, vmax, levels)
+        runs = _column_runs_numpy(level_matrix)
+        used = numpy.unique(level_matrix).tolist()
+    else:
+        level_matrix = _levels_python(values, vmin, vmax, levels)
+        runs = list(_column_runs_python(level_matrix))
+        used = sorted(set([run[3] for run in runs]))
+
+    # one colour per level actually used
+    low_rgb, high_rgb = low.rgb(), high.rgb()
+    palette = {}
+    for level in used:
+        t = level / float(levels - 1)
+        palette[level] = colors.Color(*[a + (b - a) * t
+                                        for a, b in zip(low_rgb, high_rgb)])
+
+    # Join runs which have the same rows and colour in neighbouring columns
+    # into rectangles.
+    blocks = []
+    open_blocks = {}
+    for col, start, end, level in runs:
+        block = open_blocks.get((start, end, level))
+        if block is not None and block[1] == col - 1:
+            block[1] = col
+        else:
+            block = open_blocks[start, end, level] = [col, col, start, end, level]
+            blocks.append(block)
+
+    x, y = first_cell
+    return [(command, (x + c0, y + r0), (x + c1, y + r1), palette[level])
+            for c0, c1, r0, r1, level in blocks]
+
+
+def heatmap_style(values, base_commands=(), first_cell=(0, 0), **kw):
+    """Return a TableStyle made of base_commands plus a heatmap."""
+    return TableStyle(list(base_commands) +
+                      heatmap_commands(values, first_cell, **kw))
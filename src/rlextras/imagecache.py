@@ -0,0 +1,174 @@
+"""A content-addressed cache for JPEG images.
+
+canvas.drawImage and the Image flowable remember images by file name, one
+document at a time, and (with rl_config.useA85, the default in older versions)
+re-encode JPEG data as ASCII85 text. When the same photographs appear
+thousands of times in many documents, this module does better:
+
+- The width, height and colour space are read from the JPEG header. The
+  image is never decoded.
+
+- The compressed DCT data goes into the PDF exactly as it is in the file.
+
+- Images are identified by a hash of their contents, so the same photograph
+  under two file names is stored once per document.
+
+- The prepared image XObject is kept for the life of the process, and its
+  data is shared by every document which draws it.
+
+Use draw_image() in place of canvas.drawImage(), and CachedImage in place of
+the Image flowable. Files which are not JPEGs are passed on to drawImage.
+"""
+import copy
+import hashlib
+import os
+import struct
+
+from reportlab.pdfbase import pdfdoc
+from reportlab.pdfgen.canvas import aspectRatioFix
+from reportlab.platypus import Flowable
+
+# SOFn markers which carry the image size (baseline, extended, progressive)
+sof_markers = (0xC0, 0xC1, 0xC2)
+# markers which stand alone, without a length
+standalone_markers = (0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7,
+                      0xD8)
+
+colour_spaces = {1: 'DeviceGray', 3: 'DeviceRGB', 4: 'DeviceCMYK'}
+
+
+def jpeg_info(data):
+    """Return (width, height, components, adobe) from the header of a JPEG
+    held in a string, or None if it isn't a JPEG we can pass through. adobe
+    is true if there is an Adobe APP14 segment (CMYK data is then inverted).
+    """
+    if data[:2] != '\xff\xd8':
+        return None
+    adobe = False
+    pos = 2
+    end = len(data) - 4
+    while pos < end:
+        if data[pos] != '\xff':
+            return None
+        marker = ord(data[pos + 1])
+        if marker == 0xFF:  # padding
+            pos += 1
+            continue
+        if marker in standalone_markers:
+            pos += 2
+            continue
+        length, = struct.unpack_from('>H', data, pos + 2)
+        if marker in sof_markers:
+            precision, height, width, components = struct.unpack_from(
+                '>BHHB', data, pos + 4)
+            if precision != 8 or components not in colour_spaces:
+                return None
+            return width, height, components, adobe
+        if marker == 0xEE and data[pos + 4:pos + 9] == 'Adobe':
+            adobe = True
+        if marker == 0xDA:  # start of scan before any size
+            return None
+        pos += 2 + length
+    return None
+
+
+class CachedJPEG(object):
+    def __init__(self, data, digest):
+        info = jpeg_info(data)
+        if info is None:
+            raise ValueError("not a baseline or progressive 8 bit JPEG")
+        self.width, self.height, components, adobe = info
+        self.name = 'jpeg_' + digest
+        # a prepared image XObject, shared by every document
+        xobject = self.xobject = pdfdoc.PDFImageXObject(self.name)
+        xobject.width, xobject.height = self.width, self.height
+        xobject.bitsPerComponent = 8
+        xobject.colorSpace = colour_spaces[components]
+        xobject._dotrans = int(components == 4 and adobe)
+        xobject._filters = ('DCTDecode',)
+        xobject.streamContent = data
+        xobject.mask = None
+
+
+# Content hash -> CachedJPEG (or None for files which aren't usable JPEGs)
+_by_digest = {}
+# File name -> (modification time, size, content hash)
+_by_file_name = {}
+
+
+def load_jpeg(file_name):
+    """Return the CachedJPEG for a file, or None if it is not a JPEG."""
+    stat = os.stat(file_name)
+    key = stat.st_mtime, stat.st_size
+    known = _by_file_name.get(file_name)
+    if known is not None and known[:2] == key:
+        return _by_digest[known[2]]
+    data = open(file_name, 'rb').read()
+    digest = hashlib.sha1(data).hexdigest()
+    if digest not in _by_digest:
+        try:
+            _by_digest[digest] = CachedJPEG(data, digest)
+        except ValueError:
+            _by_digest[digest] = None
+    _by_file_name[file_name] = key + (digest,)
+    return _by_digest[digest]
+
+
+def image_size(file_name):
+    """Return the size of an image in pixels, from the header if it is a
+    JPEG."""
+    image = load_jpeg(file_name)
+    if image is None:
+        from reportlab.lib.utils import ImageReader
+        return ImageReader(file_name).getSize()
+    return image.width, image.height
+
+
+def draw_image(canvas, file_name, x, y, width=None, height=None,
+               preserveAspectRatio=False, anchor='c'):
+    """Like canvas.drawImage, but for cached JPEGs. Returns the size of the
+    image in pixels."""
+    image = load_jpeg(file_name)
+    if image is None:
+        return canvas.drawImage(file_name, x, y, width, height,
+                                preserveAspectRatio=preserveAspectRatio,
+                                anchor=anchor)
+    doc = canvas._doc
+    regName = doc.getXObjectName(image.name)
+    if doc.idToObject.get(regName, None) is None:
+        # Reportlab marks each object with its name in the document, so
+        # every document gets its own shallow copy. The image data itself is
+        # shared, not copied.
+        xobject = copy.copy(image.xobject)
+        doc.Reference(xobject, regName)
+        doc.addForm(image.name, xobject)
+
+    x, y, width, height, scaled = aspectRatioFix(
+        preserveAspectRatio, anchor, x, y, width, height,
+        image.width, image.height)
+    canvas._currentPageHasImages = 1
+    canvas.saveState()
+    canvas.translate(x, y)
+    canvas.scale(width, height)
+    canvas._code.append("/%s Do" % regName)
+    canvas.restoreState()
+    canvas._formsinuse.append(image.name)
+    return image.width, image.height
+
+
+class CachedImage(Flowable):
+    """An image flowable which draws with draw_image(). As with Image, the
+    size defaults to one point per pixel."""
+    def __init__(self, filename, width=None, height=None):
+        Flowable.__init__(self)
+        self.filename = filename
+        pixel_width, pixel_height = image_size(filename)
+        self.drawWidth = width or pixel_width
+        self.drawHeight = height or pixel_height
+
+    def wrap(self, availWidth, availHeight):
+        return self.drawWidth, self.drawHeight
+
+    def draw(self):
+        draw_image(self.canv, self.filename, 0, 0,
+                   self.drawWidth, self.drawHeight)
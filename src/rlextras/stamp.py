@@ -0,0 +1,57 @@
+"""Record a drawing once, and place it as many times as you like.
+
+Drawing the same thing over and over (a marker, a logo, a footer) repeats all
+of its drawing operations in the content stream every time. A Stamp records
+the drawing once, on a scratch canvas, and turns the result into a Form XObject
+with pdfrw's pagexobj. Placing the stamp then only costs a transformation and
+a Do operator, and the stamp's content is stored once per document (makerl
+keeps track of which documents already have it).
+
+    def marker(c):
+        c.setFillColorRGB(1, 0, 0)
+        c.drawCentredString(0, -10, '^')
+
+    arrow = Stamp(marker, bbox=(-5, -12, 5, 0))
+    arrow.place(canvas, x, y)
+"""
+from cStringIO import StringIO
+
+from reportlab.pdfgen.canvas import Canvas
+
+from pdfrw import PdfReader
+from pdfrw.buildxobj import pagexobj
+from pdfrw.toreportlab import makerl
+
+
+class Stamp(object):
+    """A drawing recorded once as a Form XObject.
+
+    draw is called once with a canvas whose origin is the stamp's origin.
+    bbox is the (left, bottom, right, top) of everything it draws, relative
+    to that origin; anything outside it is clipped.
+    """
+    def __init__(self, draw, bbox):
+        x0, y0, x1, y1 = bbox
+        self.bbox = bbox
+        buf = StringIO()
+        canvas = Canvas(buf, pagesize=(x1 - x0, y1 - y0))
+        canvas.translate(-x0, -y0)
+        draw(canvas)
+        canvas.showPage()
+        canvas.save()
+        page = PdfReader(fdata=buf.getvalue(), decompress=False).pages[0]
+        self.xobj = pagexobj(page)
+
+    def place(self, canvas, x=0, y=0, scale=1, angle=0):
+        """Draw the stamp with its origin at (x, y)."""
+        x0, y0 = self.bbox[:2]
+        name = makerl(canvas, self.xobj)
+        canvas.saveState()
+        canvas.translate(x, y)
+        if angle:
+            canvas.rotate(angle)
+        if scale != 1:
+            canvas.scale(scale, scale)
+        canvas.translate(x0, y0)
+        canvas.doForm(name)
+        canvas.restoreState()
@@ -0,0 +1,142 @@
+"""Streaming CSV-to-table reports.
+
+02_01_tables.py reads the whole CSV file into a list and lets PLATYPUS lay out
+one big Table, which is fine for a few hundred rows but not for a million.
+This module reads the rows lazily instead, and draws one page-sized Table at a
+time straight on to a canvas:
+
+- Column widths and the row height are fixed up front, so
+  Table never has to measure the cells, and the number of rows which fit on a
+  page is known before the rows are read.
+
+- Each chunk gets a copy of the header row, and is thrown
+  away as soon as it has been drawn.
+
+- A canvas keeps every finished page in memory until it
+  is saved, so the report is written in parts of a few hundred pages which are
+  then joined with pdfrw's merge tool.
+
+Usage: python -m rlextras.streamtable input.csv output.pdf
+"""
+import csv
+import os
+import shutil
+import tempfile
+
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import Table, TableStyle
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib import colors
+
+from pdfrw.pdfmerge import mergepdfs
+
+# The same look as the table in 02_01_tables.py. Row 0 is the header of every
+# chunk.
+default_style = [('LINEABOVE', (0,0), (-1,0), 2, colors.green),
+                 ('LINEBELOW', (0,0), (-1,0), 2, colors.green),
+                 ('LINEBELOW', (0,1), (-1,-1), 0.25, colors.black),
+                 ('LINEBELOW', (0,-1), (-1,-1), 2, colors.green),
+                 ('ALIGN', (1,1), (-1,-1), 'RIGHT')]
+
+
+def csv_rows(file_name):
+    """Lazily yield the rows of a CSV file."""
+    f = open(file_name, 'rb')
+    try:
+        for row in csv.reader(f):
+            yield row
+    finally:
+        f.close()
+
+
+def chunks(rows, size):
+    """Yield lists of up to size rows."""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class StreamingTableReport(object):
+    """Draws an iterable of rows as a table spanning as many pages as needed.
+
+    chunk_style, if given, is called with each chunk of rows (without the
+    header) and returns extra TableStyle commands for it. Row 0 of a chunk is
+    the header, so data row i of the chunk is table row i + 1.
+    """
+    def __init__(self, colWidths=None, rowHeight=18, style=default_style,
+                 chunk_style=None, pagesize=A4, margin=20*mm,
+                 pages_per_part=200):
+        self.colWidths = colWidths
+        self.rowHeight = rowHeight
+        self.style = list(style)
+        self.chunk_style = chunk_style
+        self.pagesize = pagesize
+        self.margin = margin
+        self.pages_per_part = pages_per_part
+
+    def rows_per_page(self):
+        frame_height = self.pagesize[1] - 2 * self.margin
+        return int(frame_height // self.rowHeight) - 1  # leave room for header
+
+    def draw_chunk(self, canvas, header, chunk):
+        data = [header] + chunk
+        style = self.style
+        if self.chunk_style is not None:
+            style = style + list(self.chunk_style(chunk))
+        table = Table(data, colWidths=self.colWidths,
+                      rowHeights=[self.rowHeight] * len(data),
+                      style=TableStyle(style))
+        width, height = table.wrapOn(canvas, self.pagesize[0], self.pagesize[1])
+        table.drawOn(canvas, self.margin, self.pagesize[1] - self.margin - height)
+        canvas.showPage()
+
+    def build(self, rows, output, header=None):
+        rows = iter(rows)
+        if header is None:
+            header = rows.next()
+        if self.colWidths is None:
+            frame_width = self.pagesize[0] - 2 * self.margin
+            self.colWidths = [frame_width / len(header)] * len(header)
+
+        part_folder = tempfile.mkdtemp()
+        parts = []
+        canvas = None
+        try:
+            for page, chunk in enumerate(chunks(rows, self.rows_per_page())):
+                if page % self.pages_per_part == 0:
+                    if canvas is not None:
+                        canvas.save()
+                    parts.append(os.path.join(part_folder,
+                                              "part%06d.pdf" % len(parts)))
+                    canvas = Canvas(parts[-1], pagesize=self.pagesize)
+                self.draw_chunk(canvas, header, chunk)
+            if canvas is None:
+                # no rows at all; just draw the header
+                parts.append(os.path.join(part_folder, "part000000.pdf"))
+                canvas = Canvas(parts[-1], pagesize=self.pagesize)
+                self.draw_chunk(canvas, header, [])
+            canvas.save()
+            if len(parts) == 1:
+                shutil.copyfile(parts[0], output)
+            else:
+                mergepdfs(parts, output, processes=1)
+        finally:
+            shutil.rmtree(part_folder, ignore_errors=True)
+        return output
+
+
+def csv_report(csv_file_name, output, **kw):
+    return StreamingTableReport(**kw).build(csv_rows(csv_file_name), output)
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m rlextras.streamtable input.csv output.pdf")
+    csv_report(sys.argv[1], sys.argv[2])
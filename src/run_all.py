@@ -1,12 +1,170 @@
 """Run all Python scripts...
 
 This script will run all of the other python scripts located in the same
-folder as itself. Use this to generated all of the example PDF files in order.
+folder as itself. Use this to generate all of the example PDF files.
+
+Scripts which do not depend on each other are run at the same time, up to one
+per CPU (use -j to change this). A script is only run once everything it
+depends on has finished, and is skipped altogether if the PDF files it makes
+are newer than all of its inputs (use -f to force a full rebuild).
+99_Self_Document.py embeds all of the other PDF files, so it always runs last.
+
+The wall clock time and CPU time used by each script are reported as it
+finishes.
 """
 import os
-import subprocess
+import re
+import sys
+import time
+from optparse import OptionParser
+from subprocess import Popen
+
+try:
+    from multiprocessing import cpu_count
+except ImportError:
+    def cpu_count():
+        return 1
+
+# Extra dependencies which can't be found by reading the scripts. The special
+# value "*" means "every other script".
+DEPENDS = {"99_Self_Document.py": "*"}
+
+# Quoted strings in a script which name a file, e.g. "02_03_tables.pdf"
+filename_pattern = re.compile(r"""["']([\w.-]+\.\w+)["']""")
+
+
+def find_scripts():
+    return sorted([f for f in os.listdir(".")
+                   if f.endswith(".py")
+                   and f != "run_all.py"])
+
+
+def read_targets(script):
+    """Return the (inputs, outputs) of a script, found by looking for file
+    names in its source code. Any PDF file it mentions is an output; anything
+    else that exists here or in the images folder is an input."""
+    inputs = [script]
+    outputs = []
+    for name in filename_pattern.findall(open(script).read()):
+        if name.endswith(".pdf"):
+            outputs.append(name)
+        elif os.path.exists(name):
+            inputs.append(name)
+        elif os.path.exists(os.path.join("images", name)):
+            inputs.append(os.path.join("images", name))
+    return inputs, outputs
+
+
+class Job(object):
+    def __init__(self, script):
+        self.script = script
+        self.inputs, self.outputs = read_targets(script)
+        self.depends = []
+        self.process = None
+        self.status = None
+
+    def up_to_date(self):
+        if not self.outputs:
+            return False
+        try:
+            oldest_output = min([os.path.getmtime(f) for f in self.outputs])
+        except OSError:
+            return False  # an output is missing
+        newest_input = max([os.path.getmtime(f) for f in self.inputs])
+        return oldest_output > newest_input
+
+
+def make_jobs(scripts):
+    jobs = dict([(script, Job(script)) for script in scripts])
+    for script, depends in DEPENDS.items():
+        if script not in jobs:
+            continue
+        job = jobs[script]
+        if depends == "*":
+            depends = [s for s in scripts if s != script]
+        job.depends = [jobs[s] for s in depends if s in jobs]
+        # A script which documents others reads their inputs and outputs.
+        for dependency in job.depends:
+            job.inputs.extend(dependency.inputs + dependency.outputs)
+    for job in jobs.values():
+        if job.script in DEPENDS:
+            continue
+        # Any other script which reads a PDF made by another script depends
+        # on that script.
+        for other in jobs.values():
+            if other is not job and set(other.outputs) & set(job.inputs):
+                job.depends.append(other)
+    return [jobs[script] for script in scripts]
+
+
+def report(job, wall, cpu):
+    print "%-40s %-8s wall %6.2fs  cpu %6.2fs" % (job.script, job.status,
+                                                  wall, cpu)
+
+
+def run(jobs, processes, force=False):
+    waiting = list(jobs)
+    running = {}
+    failed = False
+    while waiting or running:
+        # Start everything that is ready, up to the process limit.
+        progress = False
+        for job in waiting[:]:
+            if len(running) >= processes:
+                break
+            if [d for d in job.depends if d.status is None]:
+                continue
+            waiting.remove(job)
+            progress = True
+            if [d for d in job.depends if d.status == "failed"]:
+                job.status = "failed"
+                report(job, 0, 0)
+                continue
+            if not force and job.up_to_date():
+                job.status = "skipped"
+                report(job, 0, 0)
+                continue
+            job.start = time.time()
+            # (keep the Popen, or subprocess may reap the script
+            # behind our back when the next one is started)
+            job.process = Popen([sys.executable, job.script])
+            running[job.process.pid] = job
+
+        if not running:
+            if not progress:
+                print "Circular dependencies:", [j.script for j in waiting]
+                return False
+            continue
+
+        # Wait for any one script to finish, and find out how much CPU
+        # time it used.
+        pid, exitcode, usage = os.wait4(-1, 0)
+        cpu = usage.ru_utime + usage.ru_stime
+        job = running.pop(pid, None)
+        if job is None:
+            continue
+        if os.WIFSIGNALED(exitcode):
+            job.process.returncode = -os.WTERMSIG(exitcode)
+        else:
+            job.process.returncode = os.WEXITSTATUS(exitcode)
+        job.status = exitcode and "failed" or "built"
+        failed = failed or bool(exitcode)
+        report(job, time.time() - job.start, cpu)
+    return not failed
+
+
+def main():
+    parser = OptionParser(usage="%prog [options]")
+    parser.add_option("-j", "--processes", type="int", default=cpu_count(),
+                      help="number of scripts to run at once")
+    parser.add_option("-f", "--force", action="store_true", default=False,
+                      help="run every script, even if it is up to date")
+    options, args = parser.parse_args()
+    start = time.time()
+    ok = run(make_jobs(find_scripts()), max(options.processes, 1),
+             options.force)
+    print "Total wall time %.2fs" % (time.time() - start)
+    sys.exit(not ok)
 
-for filename in sorted([f for f in os.listdir(".")
-                        if f.endswith(".py")
-                        and f != "run_all.py"]): 
-    subprocess.Popen("python " + filename, shell=True)
+if __name__ == "__main__":
+    main()